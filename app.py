@@ -1,21 +1,142 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request, g
+import hmac
 import json
 import random
 from datetime import datetime, timedelta
 from utils.discord_logger import DiscordLogger
-from utils.llm_utils import get_llm_completion
+from utils.llm_dispatcher import LLMDispatcher, DispatcherBusy, PendingJobs
+from utils.llm_usage import UsageLedger, BudgetPolicy, BudgetExceeded
+from utils.telemetry import TelemetryState
+from utils.telemetry_recorder import TelemetryRecorder, TelemetryReplay
+from utils.scenario import ScenarioSource
+from utils.metrics import REGISTRY, Counter, Histogram, record_cache
+from utils.profiler import RequestProfiler
+from utils.geology import GeologySubsystem, synthetic_readings
+from utils.position_filter import METERS_PER_DEGREE, PositionKalmanFilter, PositionTracker
+from utils.fleet import AssetRegistry, EV_SCHEMA, PR_SCHEMA, LTV_SCHEMA
+from utils.timeline import MissionScheduler, ConsumableMonitor
+from utils.assets import StaticAssets, PageCache, REVALIDATE, build_version, cached_response, data_version
+from utils.llm_utils import PROVIDER_KEYS, get_client
+from utils.startup import Readiness
 from dotenv import load_dotenv
+import atexit
+import itertools
+import math
 import os
+import time
 
 app = Flask(__name__)
 discord_logger = DiscordLogger()
 load_dotenv()
 
+# Shared telemetry state, optionally recorded to disk or fed from a recording
+telemetry_state = TelemetryState()
+telemetry_recorder = None
+telemetry_replay = None
+telemetry_scenario = None
+
+# Mission assets. EV1 mirrors the shared telemetry state; every asset can be
+# fed through POST /api/assets/<id> and serves mock data until a feed arrives.
+# EV1 counts as fed while a source runs or after a recent POST.
+PRIMARY_ASSET = 'EV1'
+fleet = AssetRegistry()
+fleet.register('EV1', 'EV1', EV_SCHEMA)
+fleet.register('EV2', 'EV2', EV_SCHEMA)
+fleet.register('PR', 'Pressurized Rover', PR_SCHEMA)
+fleet.register('LTV', 'Lunar Terrain Vehicle', LTV_SCHEMA)
+telemetry_state.subscribe(fleet.mirror(PRIMARY_ASSET, fed=telemetry_state.has_source))
+
+# Every new EV position is Kalman-filtered once and added to the breadcrumb trail
+# The filter's fix noise has to match the feed or real moves get gated out: the
+# mock feed scatters fixes uniformly over +/-0.001 deg (about 64 m standard
+# deviation), while recorded and synthetic feeds are GPS-like
+MOCK_POSITION_STD = 0.002 / math.sqrt(12) * METERS_PER_DEGREE
+position_std = os.getenv('POSITION_STD_M') or (
+    8.0 if os.getenv('TELEMETRY_REPLAY_PATH') or os.getenv('TELEMETRY_SCENARIO_SEED') else MOCK_POSITION_STD
+)
+position_tracker = PositionTracker(PositionKalmanFilter(position_std=float(position_std)))
+telemetry_state.subscribe(position_tracker)
+# The other assets' trails are built from the positions POSTed for them
+asset_trackers = {asset.id: PositionTracker() for asset in fleet if asset.id != PRIMARY_ASSET}
+asset_trackers[PRIMARY_ASSET] = position_tracker
+
 # Configure Jinja2
 app.jinja_env.filters['tojson'] = json.dumps
 app.jinja_env.trim_blocks = True
 app.jinja_env.lstrip_blocks = True
 
+# CSS/JS are served content-hashed from /assets with immutable caching. Page
+# shells are cached per (template, data version) and revalidated with ETags;
+# live values are hydrated by the data APIs.
+static_assets = StaticAssets(os.path.join(app.root_path, 'static'))
+page_cache = PageCache(build_version(os.path.join(app.root_path, 'templates'), static_assets.root))
+app.jinja_env.globals['asset_url'] = static_assets.url
+
+def render_page(template, version=None, context=dict, log=None):
+    """
+    Serve a page shell from the page cache.
+
+    Args:
+        template (str): Template name
+        version: Version of the data the page renders (None if it renders no live data)
+        context (callable): Returns the template context; only called when the shell is rendered
+        log (str): Info message for Discord when the page is actually served, so
+            revalidations (304s and HEAD checks) aren't logged
+    """
+    etag = page_cache.etag(template, version)
+    if request.if_none_match.contains(etag):
+        record_cache('page_cache', True)
+        return cached_response(request, None, etag, 'text/html', REVALIDATE)
+    etag, variants = page_cache.get(template, version, shell_renderer(template, context))
+    if log and request.method == 'GET':
+        discord_logger.send_log(log, "info")
+    return cached_response(request, variants, etag, 'text/html', REVALIDATE)
+
+def shell_renderer(template, context=dict):
+    """render(etag) callback for PageCache.get."""
+    return lambda page_etag: render_template(template, page_etag=page_etag, **context())
+
+# Request metrics, exposed at /metrics
+HTTP_REQUESTS = Counter('suits_http_requests_total', 'HTTP requests by endpoint, method and status', ['endpoint', 'method', 'status'])
+HTTP_LATENCY = Histogram('suits_http_request_seconds', 'HTTP request latency by endpoint', ['endpoint', 'method'])
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Label by route rule rather than path so IDs in URLs don't explode cardinality
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    return response
+
+# Token usage and cost per model and chat session, with per-session budgets
+llm_usage = UsageLedger.from_env()
+llm_budget = BudgetPolicy.from_env(llm_usage)
+
+# LLM calls go through the dispatcher for rate limiting, priority and failover
+llm_dispatcher = LLMDispatcher.from_env(ledger=llm_usage)
+# Chat requests return a job ID at once and the client polls for the result
+chat_jobs = PendingJobs()
+# Crew displays authenticate with CREW_API_TOKEN (X-Crew-Token) to be served
+# first; every other caller is dispatched at ground priority
+CREW_API_TOKEN = os.getenv('CREW_API_TOKEN', '')
+
+def chat_priority():
+    """Dispatch priority of the current request, from its credentials rather than anything it claims."""
+    token = request.headers.get('X-Crew-Token')
+    if CREW_API_TOKEN and token and hmac.compare_digest(token.encode('utf-8'), CREW_API_TOKEN.encode('utf-8')):
+        return 'crew'
+    return 'ground'
+
+# Opt-in request profiling (only registered when PROFILE_SECRET is set)
+request_profiler = RequestProfiler()
+request_profiler.init_app(app)
+
 # Add custom filters
 @app.template_filter('lower')
 def lower_filter(s):
@@ -25,7 +146,26 @@ def lower_filter(s):
 def round_filter(value):
     return round(float(value))
 
-discord_logger.send_log("Application starting up...", "info")
+MISSION_WAYPOINTS = [
+    {'name': 'Base Camp', 'lat': 29.5584, 'lng': -95.0930},
+    {'name': 'Collection Site A', 'lat': 29.5590, 'lng': -95.0935},
+    {'name': 'Collection Site B', 'lat': 29.5580, 'lng': -95.0925}
+]
+
+# EVA plan: each task's duration estimate in seconds and the tasks it waits for
+MISSION_PLAN = [
+    {'id': 'egress', 'name': 'UIA Egress', 'duration': 900},
+    {'id': 'nav_geology', 'name': 'Navigate to Geology Site', 'duration': 900, 'depends': ['egress']},
+    {'id': 'geology', 'name': 'Geologic Sampling', 'duration': 2700, 'depends': ['nav_geology']},
+    {'id': 'nav_ltv', 'name': 'Navigate to LTV', 'duration': 600, 'depends': ['egress']},
+    {'id': 'ltv_repair', 'name': 'LTV Repair', 'duration': 2400, 'depends': ['nav_ltv']},
+    {'id': 'return', 'name': 'Return to PR', 'duration': 1200, 'depends': ['geology', 'ltv_repair']},
+    {'id': 'ingress', 'name': 'Ingress', 'duration': 900, 'depends': ['return']}
+]
+
+# The timeline is recomputed only when a task or consumable projection changes
+mission_scheduler = MissionScheduler(MISSION_PLAN)
+mission_scheduler.start_task('egress', 0)
 
 # Enhanced Mock data generators
 def generate_mock_vitals():
@@ -53,16 +193,54 @@ def generate_mock_location():
         'heading': random.randint(0, 359),
         'altitude': round(random.uniform(0, 10), 2),
         'speed': round(random.uniform(0, 2), 2),
-        'waypoints': [
-            {'name': 'Base Camp', 'lat': 29.5584, 'lng': -95.0930},
-            {'name': 'Collection Site A', 'lat': 29.5590, 'lng': -95.0935},
-            {'name': 'Collection Site B', 'lat': 29.5580, 'lng': -95.0925}
-        ],
+        'waypoints': MISSION_WAYPOINTS,
         'last_updated': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
     discord_logger.send_log(f"Generated location: {location}", "debug")
     return location
 
+# Geology: XRF readings are classified into the sample catalog. Until the
+# spectrometer is connected the catalog is seeded with synthetic readings.
+SAMPLE_BAGS = 30
+geology_subsystem = GeologySubsystem()
+for _status, _sample in zip(itertools.cycle(['Analyzed', 'Stored', 'In Analysis']),
+                            synthetic_readings(int(os.getenv('GEOLOGY_SEED_SAMPLES', '6')))):
+    _sample['status'] = _status
+    geology_subsystem.ingest([_sample])
+
+# Live telemetry: served from the active source or POSTed feed, otherwise generated and published
+def primary_fed():
+    return telemetry_state.has_source() or fleet.get(PRIMARY_ASSET).is_fed(fleet.feed_timeout)
+
+def current_vitals():
+    if primary_fed():
+        return telemetry_state.snapshot()['vitals'] or {}
+    vitals = generate_mock_vitals()
+    telemetry_state.publish(vitals=vitals)
+    return vitals
+
+def current_location():
+    if primary_fed():
+        location = {**(telemetry_state.snapshot()['location'] or {}), 'waypoints': MISSION_WAYPOINTS}
+    else:
+        location = generate_mock_location()
+        telemetry_state.publish(location=location)
+    return smoothed_location(location)
+
+def smoothed_location(location):
+    """Overlay the Kalman-filtered position, speed and heading on a raw location reading."""
+    estimate = position_tracker.estimate()
+    if estimate is None:
+        return location
+    return {
+        **location,
+        'latitude': estimate['latitude'],
+        'longitude': estimate['longitude'],
+        'speed': round(estimate['speed'], 2),
+        'heading': int(round(estimate['heading'])) % 360,
+        'accuracy': round(estimate['accuracy'], 1)
+    }
+
 def generate_mock_procedures():
     procedures = {
         'current_procedure': {
@@ -83,23 +261,33 @@ def generate_mock_procedures():
     }
     return procedures
 
-def generate_mock_geology_data():
+def sample_summary(sample):
+    return {
+        'id': sample['id'],
+        'type': sample['type'],
+        'status': sample['status'],
+        'confidence': sample['confidence'],
+        'odd_score': sample['odd_score'],
+        'odd': sample['odd']
+    }
+
+def current_geology_data():
+    recent = geology_subsystem.catalog.recent(12)
+    latest = recent[0] if recent else None
     geology_data = {
         'current_sample': {
-            'id': f'SAMPLE-{random.randint(100, 999)}',
-            'type': random.choice(['Basalt', 'Breccia', 'Regolith']),
-            'mass': round(random.uniform(0.1, 2.0), 2),
-            'location': {'lat': 29.5584, 'lng': -95.0930},
-            'collection_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        },
-        'collected_samples': [
-            {'id': 'SAMPLE-101', 'type': 'Basalt', 'status': 'Analyzed'},
-            {'id': 'SAMPLE-102', 'type': 'Regolith', 'status': 'Stored'},
-            {'id': 'SAMPLE-103', 'type': 'Breccia', 'status': 'In Analysis'}
-        ],
+            'id': latest['id'],
+            'type': latest['type'],
+            'confidence': latest['confidence'],
+            'mass': latest['mass'],
+            'location': {'lat': round(latest['lat'], 6), 'lng': round(latest['lng'], 6)},
+            'collection_time': latest['collection_time']
+        } if latest else None,
+        'collected_samples': [sample_summary(sample) for sample in recent],
+        'samples_of_interest': [sample_summary(sample) for sample in geology_subsystem.catalog.samples_of_interest(3)],
         'equipment_status': {
             'xrf_device': 'Operational',
-            'sample_bags': 15,
+            'sample_bags': max(0, SAMPLE_BAGS - len(geology_subsystem.catalog)),
             'collection_tools': 'All Available'
         }
     }
@@ -119,41 +307,42 @@ def generate_mock_alerts():
     }
     return {k: [v for v in vs if v is not None] for k, vs in alerts.items()}
 
-def generate_mock_timeline():
-    current_time = datetime.now()
-    timeline = {
-        'mission_time': '02:30:00',
-        'events': [
-            {
-                'time': (current_time - timedelta(minutes=30)).strftime("%H:%M"),
-                'event': 'Started EVA',
-                'status': 'Completed'
-            },
-            {
-                'time': (current_time + timedelta(minutes=30)).strftime("%H:%M"),
-                'event': 'Sample Collection',
-                'status': 'Upcoming'
-            },
-            {
-                'time': (current_time + timedelta(hours=1)).strftime("%H:%M"),
-                'event': 'Return to Base',
-                'status': 'Scheduled'
-            }
-        ],
-        'remaining_time': '01:30:00'
-    }
-    return timeline
+def alerts_version(alerts_data):
+    """
+    Page cache version of the alert state: which alerts are active, not when they
+    were raised, so the shell only changes (and clients only reload) when an
+    alert is raised or cleared.
+    """
+    return data_version({level: [(alert['type'], alert['message']) for alert in items] for level, items in alerts_data.items()})
+
+def current_mission_time():
+    if telemetry_state.has_source():
+        return telemetry_state.snapshot()['mission_time']
+    return telemetry_state.mission_time()
+
+def current_timeline():
+    now = current_mission_time()
+    mission_scheduler.advance(now)
+    return mission_scheduler.plan(now)
+
+# Page shell contexts (live values are hydrated by the data APIs)
+def navigation_context():
+    return {'location_data': {'waypoints': MISSION_WAYPOINTS}}
+
+def geology_context():
+    return {'geology_data': current_geology_data()}
+
+def timeline_context():
+    return {'timeline_data': current_timeline()}
 
 # Routes
 @app.route('/')
 def index():
-    discord_logger.send_log('Homepage accessed', "info")
-    return render_template('index.html')
+    return render_page('index.html', log='Homepage accessed')
 
 @app.route('/chat')
 def chat():
-    discord_logger.send_log('Chat interface accessed', "info")
-    return render_template('chat.html')
+    return render_page('chat.html', log='Chat interface accessed')
 
 @app.route('/verify-password', methods=['POST'])
 def verify_password():
@@ -166,21 +355,18 @@ def verify_password():
 
 @app.route('/vitals')
 def vitals():
-    discord_logger.send_log('Vitals page accessed', "info")
-    return render_template('vitals.html', vitals_data=generate_mock_vitals())
+    return render_page('vitals.html', log='Vitals page accessed')
 
 @app.route('/navigation')
 def navigation():
-    discord_logger.send_log('Navigation page accessed', "info")
-    return render_template('navigation.html', location_data=generate_mock_location())
+    return render_page('navigation.html', context=navigation_context, log='Navigation page accessed')
 
 @app.route('/procedures')
 def procedures():
     try:
-        discord_logger.send_log('Procedures page accessed', "info")
         procedures_data = generate_mock_procedures()
-        discord_logger.send_log(f'Generated procedures data: {procedures_data}', "debug")
-        return render_template('procedures.html', procedures_data=procedures_data)
+        return render_page('procedures.html', data_version(procedures_data), lambda: {'procedures_data': procedures_data},
+                           log=f'Procedures page accessed with {procedures_data}')
     except Exception as e:
         error_msg = f"Error in procedures route: {str(e)}"
         discord_logger.send_log(error_msg, "error")
@@ -189,10 +375,7 @@ def procedures():
 @app.route('/geology')
 def geology():
     try:
-        discord_logger.send_log('Geology page accessed', "info")
-        geology_data = generate_mock_geology_data()
-        discord_logger.send_log(f'Generated geology data: {geology_data}', "debug")
-        return render_template('geology.html', geology_data=geology_data)
+        return render_page('geology.html', geology_subsystem.catalog.version, geology_context, log='Geology page accessed')
     except Exception as e:
         error_msg = f"Error in geology route: {str(e)}"
         discord_logger.send_log(error_msg, "error")
@@ -200,47 +383,128 @@ def geology():
 
 @app.route('/alerts')
 def alerts():
-    discord_logger.send_log('Alerts page accessed', "info")
-    return render_template('alerts.html', alerts_data=generate_mock_alerts())
+    alerts_data = generate_mock_alerts()
+    return render_page('alerts.html', alerts_version(alerts_data), lambda: {'alerts_data': alerts_data},
+                       log='Alerts page accessed')
 
 @app.route('/timeline')
 def timeline():
     try:
-        discord_logger.send_log('Timeline page accessed', "info")
-        timeline_data = generate_mock_timeline()
-        discord_logger.send_log(f'Generated timeline data: {timeline_data}', "debug")
-        return render_template('timeline.html', timeline_data=timeline_data)
+        mission_scheduler.advance(current_mission_time())
+        return render_page('timeline.html', mission_scheduler.version, timeline_context, log='Timeline page accessed')
     except Exception as e:
         error_msg = f"Error in timeline route: {str(e)}"
         discord_logger.send_log(error_msg, "error")
         return render_template('error.html', error=error_msg), 500
 
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    response = static_assets.response(request, filename)
+    if response is None:
+        return jsonify({"error": f"Asset {filename} not found"}), 404
+    return response
+
 # API endpoints
-@app.route('/api/vitals')
-def get_vitals():
-    discord_logger.send_log('Vitals data requested', "info")
+def asset_group_response(asset_id, group):
+    """Latest readings for one group ('vitals', 'location', 'systems') of an asset."""
+    asset = fleet.get(asset_id)
+    if asset is None or group not in asset.schema.groups:
+        return jsonify({"error": f"Asset {asset_id} has no {group} telemetry"}), 404
+    if asset_id == PRIMARY_ASSET:
+        if group == 'location':
+            # Filtered position with the mission waypoints
+            return jsonify(current_location())
+        current_vitals()
+    elif not asset.is_fed(fleet.feed_timeout):
+        asset.mock()
+    return Response(asset.json(group), mimetype='application/json')
+
+@app.route('/api/vitals', defaults={'asset_id': PRIMARY_ASSET})
+@app.route('/api/assets/<asset_id>/vitals')
+def get_vitals(asset_id):
     try:
-        vitals = generate_mock_vitals()
-        return jsonify(vitals)
+        return asset_group_response(asset_id, 'vitals')
     except Exception as e:
         error_msg = f"Error generating vitals data: {str(e)}"
         discord_logger.send_log(error_msg, "error")
         return jsonify({"error": error_msg}), 500
 
-@app.route('/api/location')
-def get_location():
-    discord_logger.send_log('Location data requested', "info")
+@app.route('/api/location', defaults={'asset_id': PRIMARY_ASSET})
+@app.route('/api/assets/<asset_id>/location')
+def get_location(asset_id):
     try:
-        location = generate_mock_location()
-        return jsonify(location)
+        return asset_group_response(asset_id, 'location')
     except Exception as e:
         error_msg = f"Error generating location data: {str(e)}"
         discord_logger.send_log(error_msg, "error")
         return jsonify({"error": error_msg}), 500
 
+@app.route('/api/assets/<asset_id>/systems')
+def get_systems(asset_id):
+    try:
+        return asset_group_response(asset_id, 'systems')
+    except Exception as e:
+        error_msg = f"Error generating systems data: {str(e)}"
+        discord_logger.send_log(error_msg, "error")
+        return jsonify({"error": error_msg}), 500
+
+@app.route('/api/assets')
+def list_assets():
+    return jsonify([asset.describe() for asset in fleet])
+
+@app.route('/api/assets/<asset_id>', methods=['GET', 'POST'])
+def asset_telemetry(asset_id):
+    """GET all groups of an asset's latest record; POST {"<group>": {...}, "mission_time": s} to feed it."""
+    try:
+        asset = fleet.get(asset_id)
+        if asset is None:
+            return jsonify({"error": f"Unknown asset {asset_id}"}), 404
+        if request.method == 'POST':
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                return jsonify({"error": "Expected a JSON object of readings by group"}), 400
+            groups = {group: data.get(group) for group in asset.schema.groups if data.get(group) is not None}
+            for group, readings in groups.items():
+                asset.schema.parse(group, readings)
+            if asset_id == PRIMARY_ASSET:
+                # Goes through the shared state so the recorder and position filter see it.
+                # A partial update is merged into the current reading first, as the
+                # asset record would, so subscribers always get every field.
+                current = telemetry_state.snapshot()
+                merged = {group: {**(current.get(group) or {}), **groups[group]}
+                          for group in ('vitals', 'location') if group in groups}
+                telemetry_state.publish(vitals=merged.get('vitals'), location=merged.get('location'),
+                                        mission_time=data.get('mission_time'))
+                asset.mark_fed()
+            else:
+                asset.update(groups, data.get('mission_time'))
+                location = groups.get('location', {})
+                if 'latitude' in location and 'longitude' in location:
+                    asset_trackers[asset_id].update(location, data.get('mission_time'))
+        return jsonify({'id': asset.id, 'name': asset.name, 'kind': asset.schema.kind,
+                        **{group: asset.to_dict(group) for group in asset.schema.groups}})
+    except ValueError as e:
+        return jsonify({"error": f"Invalid telemetry for {asset_id}: {str(e)}"}), 400
+    except Exception as e:
+        error_msg = f"Error handling asset telemetry: {str(e)}"
+        discord_logger.send_log(error_msg, "error")
+        return jsonify({"error": error_msg}), 500
+
+@app.route('/api/location/track', defaults={'asset_id': PRIMARY_ASSET})
+@app.route('/api/assets/<asset_id>/location/track')
+def get_location_track(asset_id):
+    try:
+        tracker = asset_trackers.get(asset_id)
+        if tracker is None:
+            return jsonify({"error": f"Asset {asset_id} has no location track"}), 404
+        return jsonify({'track': tracker.track(request.args.get('tolerance', type=float))})
+    except Exception as e:
+        error_msg = f"Error generating location track: {str(e)}"
+        discord_logger.send_log(error_msg, "error")
+        return jsonify({"error": error_msg}), 500
+
 @app.route('/api/procedures')
 def get_procedures():
-    discord_logger.send_log('Procedures data requested', "info")
     try:
         procedures = generate_mock_procedures()
         return jsonify(procedures)
@@ -251,18 +515,65 @@ def get_procedures():
 
 @app.route('/api/geology')
 def get_geology():
-    discord_logger.send_log('Geology data requested', "info")
     try:
-        geology = generate_mock_geology_data()
+        geology = current_geology_data()
         return jsonify(geology)
     except Exception as e:
         error_msg = f"Error generating geology data: {str(e)}"
         discord_logger.send_log(error_msg, "error")
         return jsonify({"error": error_msg}), 500
 
+@app.route('/api/geology/xrf', methods=['POST'])
+def ingest_xrf():
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Expected a JSON object with 'composition' or 'readings'"}), 400
+        readings = data.get('readings') or [data]
+        samples = geology_subsystem.ingest(readings)
+        odd = [sample['id'] for sample in samples if sample['odd']]
+        if odd:
+            discord_logger.send_log(f'Look-ODD: {len(odd)} sample(s) of interest: {odd[:5]}', "info")
+        return jsonify({'samples': samples})
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        return jsonify({"error": f"Invalid XRF reading: {str(e)}"}), 400
+    except Exception as e:
+        error_msg = f"Error ingesting XRF readings: {str(e)}"
+        discord_logger.send_log(error_msg, "error")
+        return jsonify({"error": error_msg}), 500
+
+@app.route('/api/geology/samples')
+def get_geology_samples():
+    try:
+        args = request.args
+        if args.get('interest'):
+            return jsonify(geology_subsystem.catalog.samples_of_interest(args.get('limit', 5, type=int)))
+        radius = args.get('radius', type=float)
+        if radius is not None and not (0 <= radius < float('inf')):
+            return jsonify({"error": "radius must be a non-negative number of metres"}), 400
+        samples = geology_subsystem.catalog.query(
+            rock_type=args.get('type'),
+            start=args.get('since', type=float),
+            end=args.get('until', type=float),
+            lat=args.get('lat', type=float),
+            lng=args.get('lng', type=float),
+            radius=radius
+        )
+        return jsonify(samples[:args.get('limit', 100, type=int)])
+    except Exception as e:
+        error_msg = f"Error querying geology samples: {str(e)}"
+        discord_logger.send_log(error_msg, "error")
+        return jsonify({"error": error_msg}), 500
+
+@app.route('/api/geology/samples/<sample_id>')
+def get_geology_sample(sample_id):
+    sample = geology_subsystem.catalog.get(sample_id)
+    if sample is None:
+        return jsonify({"error": f"Unknown sample {sample_id}"}), 404
+    return jsonify(sample)
+
 @app.route('/api/alerts')
 def get_alerts():
-    discord_logger.send_log('Alerts data requested', "info")
     try:
         alerts = generate_mock_alerts()
         return jsonify(alerts)
@@ -273,43 +584,262 @@ def get_alerts():
 
 @app.route('/api/timeline')
 def get_timeline():
-    discord_logger.send_log('Timeline data requested', "info")
     try:
-        timeline = generate_mock_timeline()
-        return jsonify(timeline)
+        now = current_mission_time()
+        mission_scheduler.advance(now)
+        # Cached serialisation with the clock fields spliced in
+        return Response(mission_scheduler.plan_json(now), mimetype='application/json')
     except Exception as e:
         error_msg = f"Error generating timeline data: {str(e)}"
         discord_logger.send_log(error_msg, "error")
         return jsonify({"error": error_msg}), 500
 
+@app.route('/api/timeline/tasks/<task_id>', methods=['POST'])
+def update_timeline_task(task_id):
+    """Procedure updates: {"action": "start"|"complete", "time": mission seconds, "duration": seconds}"""
+    try:
+        if task_id not in {task['id'] for task in MISSION_PLAN}:
+            return jsonify({"error": f"Unknown task {task_id}"}), 404
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({"error": "Expected a JSON object"}), 400
+        try:
+            at = float(data.get('time', current_mission_time()))
+            duration = None if data.get('duration') is None else float(data['duration'])
+        except (TypeError, ValueError):
+            return jsonify({"error": "time and duration must be numbers of seconds"}), 400
+        if not 0 <= at < float('inf') or (duration is not None and not 0 <= duration < float('inf')):
+            return jsonify({"error": "time and duration must be non-negative numbers of seconds"}), 400
+        if duration is not None:
+            mission_scheduler.update_duration(task_id, duration)
+        if data.get('action') == 'start':
+            mission_scheduler.start_task(task_id, at)
+        elif data.get('action') == 'complete':
+            mission_scheduler.complete_task(task_id, at)
+        elif data.get('action') is not None:
+            return jsonify({"error": f"Unknown action {data['action']}"}), 400
+        discord_logger.send_log(f"Timeline task {task_id} updated: {data}", "info")
+        return jsonify(current_timeline())
+    except Exception as e:
+        error_msg = f"Error updating timeline task: {str(e)}"
+        discord_logger.send_log(error_msg, "error")
+        return jsonify({"error": error_msg}), 500
+
+@app.route('/api/replay', methods=['GET', 'POST'])
+def replay_control():
+    if telemetry_replay is None:
+        return jsonify({"error": "No telemetry replay configured"}), 404
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            if 'speed' in data:
+                telemetry_replay.set_speed(float(data['speed']))
+            if 'mission_time' in data:
+                telemetry_replay.seek(float(data['mission_time']))
+            if data.get('action') == 'start':
+                telemetry_replay.start()
+            elif data.get('action') == 'stop':
+                telemetry_replay.stop()
+        return jsonify({
+            'path': telemetry_replay.path,
+            'running': telemetry_replay.is_running(),
+            'speed': telemetry_replay.speed,
+            'position': telemetry_replay.position(),
+            'duration': telemetry_replay.duration(),
+            'records': len(telemetry_replay)
+        })
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid replay control: {str(e)}"}), 400
+    except Exception as e:
+        error_msg = f"Error controlling telemetry replay: {str(e)}"
+        discord_logger.send_log(error_msg, "error")
+        return jsonify({"error": error_msg}), 500
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz')
+def healthz():
+    # Liveness only: the process is up and serving requests
+    return jsonify({'status': 'ok', 'uptime': readiness.snapshot()['uptime']})
+
+@app.route('/readyz')
+def readyz():
+    status = readiness.snapshot()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/api/usage')
+def llm_usage_summary():
+    try:
+        return jsonify(llm_usage.snapshot(sessions=request.args.get('sessions') == '1'))
+    except Exception as e:
+        error_msg = f"Error getting LLM usage: {str(e)}"
+        discord_logger.send_log(error_msg, "error")
+        return jsonify({"error": error_msg}), 500
+
+@app.route('/api/usage/<session>')
+def llm_session_usage(session):
+    return jsonify(llm_usage.session(session).to_dict())
+
 # Remove all socket events and replace with HTTP endpoint
 @app.route('/api/chat', methods=['POST'])
 def chat_message():
+    reservation = None
     try:
         data = request.get_json()
         message = data['message']
         model = data.get('model', 'gpt-4o')
         messages = data.get('messages', [{'role': 'user', 'content': message}])
+        priority = chat_priority()
+        session = data.get('session') or request.headers.get('X-Session-ID') or 'anonymous'
+        
+        # Apply the session budget before anything is sent
+        model, messages, adjustments, reservation = llm_budget.plan(session, model, messages)
+        if adjustments:
+            discord_logger.send_log(f'Chat session {session} over budget threshold: {", ".join(adjustments)}', "info")
         
-        discord_logger.send_log(f'Processing chat message with model {model}', "info")
+        discord_logger.send_log(f'Processing {priority} chat message with model {model}', "info")
         
-        success, response = get_llm_completion(messages, model=model)
-        if success:
-            discord_logger.send_log('Successfully generated AI response', "info")
-            return jsonify({'response': response})
-        else:
-            error_msg = f"Failed to generate AI response: {response}"
-            discord_logger.send_log(error_msg, "error")
-            return jsonify({'response': "Sorry, I encountered an error processing your request."}), 500
+        future = llm_dispatcher.submit(messages, model=model, priority=priority, session=session,
+                                       reservation=reservation)
+        future.add_done_callback(log_chat_result)
+        job_id = chat_jobs.add(future, session=session, adjustments=adjustments)
+        return jsonify({'job': job_id, 'status': 'pending'}), 202, {'Location': f'/api/chat/{job_id}', 'Retry-After': '1'}
+    except BudgetExceeded as e:
+        discord_logger.send_log(f'Chat request rejected: {str(e)}', "warning")
+        return jsonify({'response': "This chat session has reached its usage budget."}), 429
+    except DispatcherBusy as e:
+        discord_logger.send_log('Chat request rejected: LLM dispatcher queue full', "warning")
+        return jsonify({'response': "The assistant is busy right now, please try again shortly."}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
+        llm_usage.release(reservation)
         error_msg = f"Error in chat message handling: {str(e)}"
         discord_logger.send_log(error_msg, "error")
         return jsonify({'response': "An unexpected error occurred."}), 500
 
+def log_chat_result(future):
+    success, response, model_used = future.result()
+    if success:
+        discord_logger.send_log(f'Successfully generated AI response with {model_used}', "info")
+    else:
+        discord_logger.send_log(f"Failed to generate AI response: {response}", "error")
+
+@app.route('/api/chat/<job_id>')
+def chat_result(job_id):
+    job = chat_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f"Unknown chat job {job_id}"}), 404
+    future, info = job
+    if not future.done():
+        return jsonify({'job': job_id, 'status': 'pending'}), 202, {'Retry-After': '1'}
+    success, response, model_used = future.result()
+    if not success:
+        return jsonify({'job': job_id, 'status': 'failed',
+                        'response': "Sorry, I encountered an error processing your request."}), 500
+    return jsonify({
+        'job': job_id,
+        'status': 'done',
+        'response': response,
+        'model': model_used,
+        'adjustments': info['adjustments'],
+        'usage': llm_usage.session(info['session']).to_dict()
+    })
+
+def warm_page_cache():
+    """Render the page shells whose data version is known before the first request."""
+    pages = [
+        ('index.html', None, dict),
+        ('chat.html', None, dict),
+        ('vitals.html', None, dict),
+        ('navigation.html', None, navigation_context),
+        ('geology.html', geology_subsystem.catalog.version, geology_context),
+        ('timeline.html', mission_scheduler.version, timeline_context),
+    ]
+    with app.test_request_context('/'):
+        for template, version, context in pages:
+            page_cache.get(template, version, shell_renderer(template, context))
+    return f"{len(pages)} page shells rendered"
+
+def warm_llm_client(provider):
+    # Imports the provider SDK and builds its client, the slow part of the first chat request
+    get_client(provider)
+
+def warm_discord():
+    if not discord_logger.test_connection():
+        raise RuntimeError("Discord webhook test failed")
+
+# Dependencies warmed up in the background once the app starts; see /readyz
+readiness = Readiness()
+readiness.add('page_cache', warm_page_cache)
+for _provider, _key in PROVIDER_KEYS.items():
+    readiness.add(f'llm_{_provider}', lambda provider=_provider: warm_llm_client(provider),
+                  required=False, enabled=bool(os.getenv(_key)))
+readiness.add('discord', warm_discord, required=False, enabled=bool(discord_logger.webhook_url))
+
+_started = False
+
+def create_app():
+    """
+    Start the application's services and return the Flask app.
+
+    Importing this module only builds in-memory state; nothing touches the
+    network, starts threads or opens files for writing until this is called.
+    It starts telemetry recording/replay and the usage ledger, then returns
+    at once while the page cache, LLM clients and Discord webhook warm up
+    in the background. Safe to call more than once, e.g. from a WSGI server
+    as `app:create_app()`.
+
+    Returns:
+        Flask: The application
+    """
+    global telemetry_recorder, telemetry_replay, telemetry_scenario, _started
+    if _started:
+        return app
+    _started = True
+
+    discord_logger.send_log("Application starting up...", "info")
+
+    if os.getenv('TELEMETRY_RECORD_PATH'):
+        telemetry_recorder = TelemetryRecorder(os.getenv('TELEMETRY_RECORD_PATH'))
+        telemetry_state.subscribe(telemetry_recorder)
+        atexit.register(telemetry_recorder.close)
+        discord_logger.send_log(f"Recording telemetry to {telemetry_recorder.path}", "info")
+
+    # Consumable projections only make sense for a consistent feed; mock
+    # readings are independent random draws and would make the limits thrash
+    if os.getenv('TELEMETRY_REPLAY_PATH') or os.getenv('TELEMETRY_SCENARIO_SEED'):
+        telemetry_state.subscribe(ConsumableMonitor(mission_scheduler))
+
+    if os.getenv('TELEMETRY_REPLAY_PATH'):
+        telemetry_replay = TelemetryReplay(
+            telemetry_state,
+            os.getenv('TELEMETRY_REPLAY_PATH'),
+            speed=float(os.getenv('TELEMETRY_REPLAY_SPEED', '1')),
+            loop=os.getenv('TELEMETRY_REPLAY_LOOP', '').lower() in ('1', 'true', 'yes'),
+        ).start()
+        discord_logger.send_log(f"Replaying telemetry from {telemetry_replay.path}", "info")
+
+    if os.getenv('TELEMETRY_SCENARIO_SEED') and telemetry_replay is None:
+        telemetry_scenario = ScenarioSource(
+            telemetry_state,
+            seed=int(os.getenv('TELEMETRY_SCENARIO_SEED')),
+            hours=float(os.getenv('TELEMETRY_SCENARIO_HOURS', '2')),
+            rate=float(os.getenv('TELEMETRY_SCENARIO_RATE', '10')),
+            waypoints=MISSION_WAYPOINTS + [MISSION_WAYPOINTS[0]],
+            speed=float(os.getenv('TELEMETRY_SCENARIO_SPEED', '1')),
+        ).start()
+        discord_logger.send_log(f"Playing synthetic EVA scenario with {len(telemetry_scenario.faults)} injected faults", "info")
+
+    llm_usage.start()
+    atexit.register(llm_usage.stop)
+    readiness.start()
+    atexit.register(readiness.stop)
+    return app
+
 if __name__ == '__main__':
     try:
-        discord_logger.send_log("Testing Discord connection...", "info")
-        discord_logger.test_connection()
+        create_app()
         discord_logger.send_log("Starting web server...", "info")
         app.run(host='0.0.0.0', port=80)
     except Exception as e:
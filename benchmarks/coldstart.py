@@ -0,0 +1,62 @@
+import subprocess
+import sys
+import time
+
+import requests
+
+from benchmarks.common import summarize
+from benchmarks.load import ROOT, _free_port
+
+# Fresh process to first answered request, in milliseconds (p95 over the runs)
+COLD_START_TARGET_MS = 1500.0
+
+IMPORT_SCRIPT = "import time; started = time.perf_counter(); import app; print(time.perf_counter() - started)"
+
+def _poll(url, deadline, process):
+    """Wait until `url` answers 200; returns the monotonic time it did."""
+    session = requests.Session()
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App server exited with code {process.returncode}")
+        try:
+            if session.get(url, timeout=1).status_code == 200:
+                return time.monotonic()
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{url} did not answer in time")
+
+def run_cold_start(env, runs=5, timeout=30.0):
+    """
+    Measure how quickly a fresh app process becomes usable.
+
+    Each run times `import app` in a new interpreter, then starts the app
+    server (benchmarks.serve) and times the first /healthz response and
+    the first 200 from /readyz, all from process launch.
+
+    Returns:
+        dict: {'import', 'first_response', 'ready'} -> summary in milliseconds
+    """
+    samples = {'import': [], 'first_response': [], 'ready': []}
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_SCRIPT],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        samples['import'].append(float(output.strip().splitlines()[-1]))
+
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        launched = time.monotonic()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.serve', str(port)],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            deadline = launched + timeout
+            samples['first_response'].append(_poll(f"{url}/healthz", deadline, process) - launched)
+            samples['ready'].append(_poll(f"{url}/readyz", deadline, process) - launched)
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+    return {phase: summarize(values, scale=1e3) for phase, values in samples.items()}
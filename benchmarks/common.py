@@ -0,0 +1,61 @@
+import os
+import resource
+import sys
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize(samples, scale=1.0):
+    """
+    Summarize latency samples.
+
+    Args:
+        samples (list): Durations in seconds
+        scale (float): Multiplier applied to the reported values (1e3 for ms, 1e6 for us)
+
+    Returns:
+        dict: count, mean, p50, p95, p99 and max
+    """
+    values = sorted(samples)
+    if not values:
+        return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values) * scale,
+        'p50': percentile(values, 0.50) * scale,
+        'p95': percentile(values, 0.95) * scale,
+        'p99': percentile(values, 0.99) * scale,
+        'max': values[-1] * scale,
+    }
+
+def rss_mb(pid=None):
+    """Current resident set size in MB (Linux /proc), falling back to this process's peak RSS."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def benchmark_env(stub_url):
+    """Environment that points the app's LLM providers and Discord webhook at the stub server."""
+    env = dict(os.environ)
+    env.update({
+        'OPENAI_API_KEY': env.get('BENCH_OPENAI_API_KEY', 'bench'),
+        'ANTHROPIC_API_KEY': env.get('BENCH_ANTHROPIC_API_KEY', 'bench'),
+        'PERPLEXITY_API_KEY': env.get('BENCH_PERPLEXITY_API_KEY', 'bench'),
+        'OPENAI_BASE_URL': f"{stub_url}/v1",
+        'ANTHROPIC_BASE_URL': stub_url,
+        'PERPLEXITY_BASE_URL': stub_url,
+        'WEBHOOK_URL': f"{stub_url}/webhook",
+        'CHAT_PASSWORD': 'bench',
+    })
+    return env
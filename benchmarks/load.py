@@ -0,0 +1,186 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from benchmarks.common import rss_mb, summarize
+
+# Page -> what its script polls, as in static/js/*.js: [(kind, path, interval in seconds)].
+# 'api' GETs a JSON endpoint; 'revalidate' is page-refresh.js's HEAD with
+# If-None-Match, followed by a full page load when the page has changed.
+POLLED_PAGES = {
+    '/vitals': [('api', '/api/vitals', 1.0)],
+    '/navigation': [('api', '/api/location', 1.0), ('api', '/api/location/track', 60.0)],
+    '/alerts': [('revalidate', '/alerts', 1.0)],
+    '/timeline': [('api', '/api/timeline', 1.0), ('revalidate', '/timeline', 5.0)],
+    '/procedures': [('revalidate', '/procedures', 5.0)],
+    '/geology': [('revalidate', '/geology', 5.0)],
+}
+CHAT_MODELS = ('gpt-4o', 'claude-3-haiku-20240307', 'sonar')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_app_server(env, timeout=30):
+    """
+    Start the app in a subprocess so the load driver doesn't share its GIL.
+
+    Returns:
+        tuple: (subprocess.Popen, base URL)
+    """
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.serve', str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App server exited with code {process.returncode}")
+        try:
+            requests.get(f"{url}/api/procedures", timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("App server did not start in time")
+
+class LoadDriver:
+    """
+    Simulate dashboard tabs polling the app at their real per-tab rates.
+
+    Each tab loads its page once, then makes the requests its script does
+    (POLLED_PAGES) on their intervals, divided by `time_scale`. Revalidation
+    HEADs are recorded as 'HEAD <page>' and reload the page when it changed.
+    Chat tabs post to /api/chat every `chat_interval` seconds.
+
+    Args:
+        url (str): Base URL of the running app
+        tabs_per_page (int): Concurrent tabs per dashboard page
+        chat_tabs (int): Concurrent chat tabs
+        time_scale (float): Poll this many times faster than the real dashboards
+        chat_interval (float): Seconds between chat messages per chat tab
+    """
+
+    def __init__(self, url, tabs_per_page=2, chat_tabs=1, time_scale=1.0, chat_interval=20.0):
+        self.url = url
+        self.tabs_per_page = tabs_per_page
+        self.chat_tabs = chat_tabs
+        self.time_scale = time_scale
+        self.chat_interval = chat_interval
+        self.samples = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _record(self, route, elapsed, ok):
+        with self._lock:
+            self.samples.setdefault(route, []).append(elapsed)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def _request(self, session, method, path, route=None, **kwargs):
+        route = route or path
+        started = time.perf_counter()
+        try:
+            response = session.request(method, f"{self.url}{path}", timeout=30, **kwargs)
+            ok = response.status_code < 500
+        except requests.RequestException:
+            response, ok = None, False
+        self._record(route, time.perf_counter() - started, ok)
+        return response
+
+    def _load_page(self, session, page):
+        response = self._request(session, 'GET', page)
+        return response.headers.get('ETag') if response is not None else None
+
+    def _poll_tab(self, page, polls):
+        session = requests.Session()
+        etag = self._load_page(session, page)
+        now = time.monotonic()
+        # (next due time, interval, kind, path) per poll, all starting at once
+        schedule = [[now, interval / self.time_scale, kind, path] for kind, path, interval in polls]
+        while not self._stop.is_set():
+            entry = min(schedule, key=lambda e: e[0])
+            delay = entry[0] - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            entry[0] += entry[1]
+            _, _, kind, path = entry
+            if kind == 'api':
+                self._request(session, 'GET', path)
+                continue
+            response = self._request(session, 'HEAD', path, route=f'HEAD {path}',
+                                     headers={'If-None-Match': etag} if etag else {})
+            if response is not None and response.status_code == 200:
+                etag = self._load_page(session, page)
+
+    def _chat_tab(self, index):
+        session = requests.Session()
+        self._request(session, 'GET', '/chat')
+        interval = self.chat_interval / self.time_scale
+        turn = 0
+        while not self._stop.wait(interval if turn else 0):
+            model = CHAT_MODELS[(index + turn) % len(CHAT_MODELS)]
+            response = self._request(session, 'POST', '/api/chat', json={'message': 'Status check', 'model': model})
+            # Poll the job like the chat page does; polls are recorded under one route
+            while response is not None and response.status_code == 202 and not self._stop.wait(0.5):
+                job = response.json()['job']
+                response = self._request(session, 'GET', f'/api/chat/{job}', route='/api/chat/<job>')
+            turn += 1
+
+    def run(self, duration):
+        """Drive load for `duration` seconds and return per-route summaries."""
+        threads = []
+        for page, polls in POLLED_PAGES.items():
+            for _ in range(self.tabs_per_page):
+                threads.append(threading.Thread(target=self._poll_tab, args=(page, polls), daemon=True))
+        for index in range(self.chat_tabs):
+            threads.append(threading.Thread(target=self._chat_tab, args=(index,), daemon=True))
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        self._stop.set()
+        for thread in threads:
+            thread.join(timeout=35)
+        elapsed = time.perf_counter() - started
+
+        routes = {route: summarize(samples, scale=1e3) for route, samples in self.samples.items()}
+        total = sum(summary['count'] for summary in routes.values())
+        return {
+            'routes': routes,
+            'errors': dict(self.errors),
+            'requests': total,
+            'throughput_rps': total / elapsed if elapsed else 0.0,
+        }
+
+def run_load(env, duration=30.0, tabs_per_page=2, chat_tabs=1, time_scale=1.0, url=None):
+    """
+    Run the load driver against `url`, or against a freshly started app subprocess.
+
+    Returns:
+        dict: Load summary with per-route latency in ms, throughput and server RSS
+    """
+    process = None
+    if url is None:
+        process, url = start_app_server(env)
+    try:
+        driver = LoadDriver(url, tabs_per_page=tabs_per_page, chat_tabs=chat_tabs, time_scale=time_scale)
+        result = driver.run(duration)
+        if process is not None:
+            result['server_rss_mb'] = rss_mb(process.pid)
+        return result
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
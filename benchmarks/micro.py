@@ -0,0 +1,70 @@
+import time
+
+from benchmarks.common import summarize
+
+def _measure(function, iterations, warmup=50):
+    for _ in range(warmup):
+        function()
+    samples = []
+    clock = time.perf_counter
+    for _ in range(iterations):
+        started = clock()
+        function()
+        samples.append(clock() - started)
+    result = summarize(samples, scale=1e6)
+    result['ops_per_sec'] = iterations / sum(samples) if sum(samples) else 0.0
+    return result
+
+def run_micro(iterations=2000):
+    """
+    Time the data generators, page serving and jsonify paths in-process.
+
+    Pages are measured the way they are served: 'page_<template>' goes
+    through render_page (a page cache hit, as for every request after the
+    first), and 'render_<template>' renders the shell as on a cache miss.
+
+    Expects the benchmark environment (see benchmarks.common.benchmark_env)
+    to be applied before the app is imported.
+
+    Returns:
+        dict: {benchmark name: summary in microseconds plus ops_per_sec}
+    """
+    import app as app_module
+    from flask import jsonify
+
+    flask_app = app_module.app
+    generators = {
+        'vitals': app_module.generate_mock_vitals,
+        'location': app_module.generate_mock_location,
+        'procedures': app_module.generate_mock_procedures,
+        'geology': app_module.current_geology_data,
+        'alerts': app_module.generate_mock_alerts,
+        'timeline': app_module.current_timeline,
+    }
+    procedures = app_module.generate_mock_procedures()
+    alerts = app_module.generate_mock_alerts()
+    # template -> (data version, context), as the page routes pass them to render_page
+    pages = {
+        'vitals.html': (None, dict),
+        'navigation.html': (None, app_module.navigation_context),
+        'procedures.html': (app_module.data_version(procedures), lambda: {'procedures_data': procedures}),
+        'geology.html': (app_module.geology_subsystem.catalog.version, app_module.geology_context),
+        'alerts.html': (app_module.alerts_version(alerts), lambda: {'alerts_data': alerts}),
+        'timeline.html': (app_module.mission_scheduler.version, app_module.timeline_context),
+        'index.html': (None, dict),
+        'chat.html': (None, dict),
+    }
+
+    results = {}
+    for name, generator in generators.items():
+        results[f"generate_{name}"] = _measure(generator, iterations)
+
+    with flask_app.test_request_context('/'):
+        for name, generator in generators.items():
+            data = generator()
+            results[f"jsonify_{name}"] = _measure(lambda: jsonify(data), iterations)
+        for template, (version, context) in pages.items():
+            results[f"page_{template}"] = _measure(lambda: app_module.render_page(template, version, context), iterations)
+            render = app_module.shell_renderer(template, context)
+            results[f"render_{template}"] = _measure(lambda: render('benchmark'), iterations)
+    return results
@@ -0,0 +1,167 @@
+"""
+Benchmark runner for the SUITS web app.
+
+    python -m benchmarks.run                     # micro + load, compare to baseline
+    python -m benchmarks.run --save-baseline     # record the current numbers as the baseline
+    python -m benchmarks.run --load --duration 60 --time-scale 10 --llm-latency 2
+    python -m benchmarks.run --cold-start --runs 10  # process launch to first response / ready
+
+LLM providers and the Discord webhook are replaced by a local stub server
+with configurable latency. Exits non-zero when any gated metric regresses
+past the tolerance, or when cold start misses its target.
+"""
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.common import benchmark_env, rss_mb
+from benchmarks.coldstart import COLD_START_TARGET_MS
+from benchmarks.stubs import StubServer
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# Only these statistics fail the run; p99 and max are reported but too noisy to gate on by default
+GATED = ('p50', 'p95', 'throughput_rps', 'ops_per_sec', 'rss_mb')
+HIGHER_IS_BETTER = ('throughput_rps', 'ops_per_sec')
+# Routes hit fewer times than this (e.g. one page load per tab) are reported but not compared
+MIN_SAMPLES = 30
+
+def flatten(micro, load, cold=None):
+    """Flatten results into {'micro.<bench>.<stat>' / 'load.<route>.<stat>' / 'cold.<phase>.<stat>': value}."""
+    metrics = {}
+    for name, summary in (micro or {}).items():
+        for stat in ('p50', 'p95', 'p99', 'ops_per_sec'):
+            suffix = '' if stat == 'ops_per_sec' else '_us'
+            metrics[f"micro.{name}.{stat}{suffix}"] = summary[stat]
+    if micro:
+        metrics['micro.process.rss_mb'] = rss_mb()
+    if load:
+        for route, summary in load['routes'].items():
+            if summary['count'] < MIN_SAMPLES:
+                continue
+            for stat in ('p50', 'p95', 'p99'):
+                metrics[f"load.{route}.{stat}_ms"] = summary[stat]
+        metrics['load.all.throughput_rps'] = load['throughput_rps']
+        if 'server_rss_mb' in load:
+            metrics['load.server.rss_mb'] = load['server_rss_mb']
+    for phase, summary in (cold or {}).items():
+        for stat in ('p50', 'p95', 'max'):
+            metrics[f"cold.{phase}.{stat}_ms"] = summary[stat]
+    return metrics
+
+def compare(metrics, baseline, tolerance, strict=False):
+    """
+    Compare metrics against a baseline.
+
+    Returns:
+        list: (key, baseline, current, change) for every regression
+    """
+    regressions = []
+    for key, current in sorted(metrics.items()):
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        stat = key.rsplit('.', 1)[1]
+        if not strict and not stat.startswith(GATED):
+            continue
+        change = (current - previous) / previous
+        worse = -change if stat.startswith(HIGHER_IS_BETTER) else change
+        if worse > tolerance:
+            regressions.append((key, previous, current, change))
+    return regressions
+
+def print_load(load):
+    print(f"{'route':<20}  {'count':>7}  {'p50 ms':>9}  {'p95 ms':>9}  {'p99 ms':>9}  {'errors':>6}")
+    for route, summary in sorted(load['routes'].items()):
+        print(f"{route:<20}  {summary['count']:>7}  {summary['p50']:9.2f}  {summary['p95']:9.2f}  "
+              f"{summary['p99']:9.2f}  {load['errors'].get(route, 0):>6}")
+    print(f"{load['requests']} requests, {load['throughput_rps']:.1f} req/s\n")
+
+def print_report(metrics, baseline):
+    width = max((len(key) for key in metrics), default=10)
+    print(f"{'metric':<{width}}  {'current':>12}  {'baseline':>12}  {'change':>8}")
+    for key, value in sorted(metrics.items()):
+        previous = baseline.get(key)
+        change = f"{(value - previous) / previous:+.1%}" if previous else ''
+        previous = f"{previous:12.2f}" if previous is not None else f"{'-':>12}"
+        print(f"{key:<{width}}  {value:12.2f}  {previous}  {change:>8}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run SUITS micro-benchmarks and load tests")
+    parser.add_argument('--micro', action='store_true', help="Run only the micro-benchmarks")
+    parser.add_argument('--load', action='store_true', help="Run only the load test")
+    parser.add_argument('--cold-start', action='store_true', help="Run only the cold-start measurement")
+    parser.add_argument('--runs', type=int, default=5, help="App launches for the cold-start measurement")
+    parser.add_argument('--cold-start-target', type=float, default=COLD_START_TARGET_MS,
+                        help="Maximum p95 ms from process launch to first response")
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--duration', type=float, default=30.0, help="Load test length in seconds")
+    parser.add_argument('--tabs', type=int, default=2, help="Browser tabs per dashboard page")
+    parser.add_argument('--chat-tabs', type=int, default=1)
+    parser.add_argument('--time-scale', type=float, default=1.0, help="Poll N times faster than real dashboards")
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    parser.add_argument('--discord-latency', type=float, default=0.1)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--url', help="Load test an already running app instead of starting one")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed fractional regression")
+    parser.add_argument('--strict', action='store_true', help="Also gate on p99")
+    args = parser.parse_args(argv)
+    selected = args.micro or args.load or args.cold_start
+    run_micro_bench = args.micro or not selected
+    run_load_test = args.load or not selected
+    run_cold_start = args.cold_start or not selected
+
+    stubs = StubServer(args.llm_latency, args.discord_latency, args.jitter).start()
+    env = benchmark_env(stubs.url)
+    try:
+        micro = load = cold = None
+        if run_micro_bench:
+            # The app reads its provider URLs at import time, so apply the stub env first
+            os.environ.update(env)
+            from benchmarks.micro import run_micro
+            micro = run_micro(args.iterations)
+        if run_load_test:
+            from benchmarks.load import run_load
+            load = run_load(env, args.duration, args.tabs, args.chat_tabs, args.time_scale, args.url)
+            print_load(load)
+        if run_cold_start:
+            from benchmarks.coldstart import run_cold_start as measure_cold_start
+            cold = measure_cold_start(env, args.runs)
+    finally:
+        stubs.stop()
+
+    metrics = flatten(micro, load, cold)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    print_report(metrics, baseline)
+
+    missed_target = cold is not None and cold['first_response']['p95'] > args.cold_start_target
+    if missed_target:
+        print(f"\nCOLD START first response p95 {cold['first_response']['p95']:.0f} ms "
+              f"exceeds the {args.cold_start_target:.0f} ms target")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump({**baseline, **metrics}, file, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        return 1 if missed_target else 0
+    if not baseline:
+        # Passing without comparing anything would hide regressions on a fresh checkout
+        print(f"\nNo baseline at {args.baseline}; record one on the reference machine with --save-baseline")
+        return 2
+
+    regressions = compare(metrics, baseline, args.tolerance, args.strict)
+    if regressions:
+        print(f"\n{len(regressions)} REGRESSION(S) beyond {args.tolerance:.0%}:")
+        for key, previous, current, change in regressions:
+            print(f"  REGRESSION {key}: {previous:.2f} -> {current:.2f} ({change:+.1%})")
+        return 1
+    print(f"\nNo regressions beyond {args.tolerance:.0%}")
+    return 1 if missed_target else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
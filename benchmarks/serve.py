@@ -0,0 +1,11 @@
+import sys
+
+from werkzeug.serving import make_server
+
+if __name__ == "__main__":
+    import app
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 5050
+    server = make_server('127.0.0.1', port, app.create_app(), threaded=True)
+    print(f"Serving on http://127.0.0.1:{port}", flush=True)
+    server.serve_forever()
@@ -0,0 +1,105 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI/Perplexity, Anthropic and Discord webhook endpoints with injected latency."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _delay(self, latency):
+        jitter = self.server.jitter
+        time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+
+    def _reply(self, status, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        with self.server.lock:
+            self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+
+        if self.path.endswith('/chat/completions'):
+            self._delay(self.server.llm_latency)
+            self._reply(200, {
+                'id': 'chatcmpl-bench',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': payload.get('model', 'stub'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': 'Stub response.'},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {'prompt_tokens': 12, 'completion_tokens': 3, 'total_tokens': 15}
+            })
+        elif self.path.endswith('/messages'):
+            self._delay(self.server.llm_latency)
+            self._reply(200, {
+                'id': 'msg_bench',
+                'type': 'message',
+                'role': 'assistant',
+                'model': payload.get('model', 'stub'),
+                'content': [{'type': 'text', 'text': 'Stub response.'}],
+                'stop_reason': 'end_turn',
+                'stop_sequence': None,
+                'usage': {'input_tokens': 12, 'output_tokens': 3}
+            })
+        elif self.path.startswith('/webhook'):
+            self._delay(self.server.discord_latency)
+            self._reply(204)
+        else:
+            self._reply(404, {'error': 'unknown stub endpoint'})
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The app subprocess is killed mid-request at the end of a run; that's expected
+        pass
+
+class StubServer:
+    """
+    Stub LLM provider and Discord webhook server running on a background thread.
+
+    Args:
+        llm_latency (float): Seconds each completion takes
+        discord_latency (float): Seconds each webhook POST takes
+        jitter (float): Uniform +/- jitter added to every delay
+    """
+
+    def __init__(self, llm_latency=0.5, discord_latency=0.1, jitter=0.0, host='127.0.0.1', port=0):
+        self.httpd = _QuietServer((host, port), StubHandler)
+        self.httpd.llm_latency = llm_latency
+        self.httpd.discord_latency = discord_latency
+        self.httpd.jitter = jitter
+        self.httpd.hits = {}
+        self.httpd.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="StubServer", daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def hits(self):
+        return dict(self.httpd.hits)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
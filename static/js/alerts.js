@@ -0,0 +1,8 @@
+// Reload when the alert list changes; poll every second for critical alerts
+reloadOnChange(1000);
+
+// Play sound for critical alerts
+if (document.getElementById('critical-alerts')) {
+    const alertSound = new Audio('/static/alert.mp3');
+    alertSound.play();
+}
@@ -0,0 +1,152 @@
+const loginForm = document.getElementById('login-form');
+const loginSection = document.getElementById('login-section');
+const chatSection = document.getElementById('chat-section');
+const chatForm = document.getElementById('chat-form');
+const messageInput = document.getElementById('message-input');
+const chatMessages = document.getElementById('chat-messages');
+const modelSelector = document.getElementById('model-selector');
+const loadingIndicator = document.getElementById('loading-indicator');
+const sendButton = document.getElementById('send-button');
+const historyToggle = document.getElementById('history-toggle');
+let messageHistory = [];
+
+// Usage and budgets are tracked per browser tab
+let sessionId = sessionStorage.getItem('chat-session');
+if (!sessionId) {
+    sessionId = (crypto.randomUUID ? crypto.randomUUID() : String(Date.now()) + Math.random().toString(16).slice(2));
+    sessionStorage.setItem('chat-session', sessionId);
+}
+
+// Configure marked with syntax highlighting
+marked.setOptions({
+    highlight: function(code, language) {
+        if (language && hljs.getLanguage(language)) {
+            return hljs.highlight(code, { language: language }).value;
+        }
+        return hljs.highlightAuto(code).value;
+    },
+    breaks: true
+});
+
+loginForm.addEventListener('submit', async (e) => {
+    e.preventDefault();
+    const password = document.getElementById('password').value;
+
+    const response = await fetch('/verify-password', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ password })
+    });
+
+    if (response.ok) {
+        loginSection.style.display = 'none';
+        chatSection.style.display = 'block';
+    } else {
+        alert('Incorrect password');
+    }
+});
+
+chatForm.addEventListener('submit', async (e) => {
+    e.preventDefault();
+    const message = messageInput.value.trim();
+    if (message) {
+        const selectedModel = modelSelector.value;
+        appendMessage('user', message);
+
+        // Show loading indicator and disable input
+        loadingIndicator.style.display = 'block';
+        messageInput.disabled = true;
+        sendButton.disabled = true;
+
+        // Prepare messages for the API
+        let messages;
+        if (historyToggle.checked && messageHistory.length > 0) {
+            messages = messageHistory.concat([{ role: 'user', content: message }]);
+        } else {
+            messages = [{ role: 'user', content: message }];
+        }
+
+        try {
+            let response = await fetch('/api/chat', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    message: message,
+                    model: selectedModel,
+                    messages: messages,
+                    session: sessionId
+                })
+            });
+
+            let data = await response.json();
+            // The reply is produced in the background; poll the job until it finishes
+            while (response.status === 202) {
+                await new Promise(resolve => setTimeout(resolve, 500));
+                response = await fetch(`/api/chat/${data.job}`);
+                data = await response.json();
+            }
+            appendMessage('ai', data.response, data.model || selectedModel);
+
+            // Update message history if enabled
+            if (historyToggle.checked) {
+                messageHistory.push(
+                    { role: 'user', content: message },
+                    { role: 'assistant', content: data.response }
+                );
+            }
+        } catch (error) {
+            appendMessage('ai', 'Sorry, an error occurred while processing your request.', 'error');
+            console.error('Error:', error);
+        } finally {
+            // Hide loading indicator and re-enable input
+            loadingIndicator.style.display = 'none';
+            messageInput.disabled = false;
+            sendButton.disabled = false;
+            messageInput.value = '';
+            messageInput.focus();
+        }
+    }
+});
+
+// Add event listener for history toggle
+historyToggle.addEventListener('change', () => {
+    if (!historyToggle.checked) {
+        messageHistory = [];
+    }
+});
+
+function appendMessage(sender, content, model = null) {
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `message ${sender}-message`;
+
+    // Create text content with markdown rendering for AI messages
+    const textDiv = document.createElement('div');
+    if (sender === 'ai') {
+        textDiv.innerHTML = marked.parse(content);
+    } else {
+        textDiv.textContent = content;
+    }
+    messageDiv.appendChild(textDiv);
+
+    // Add model indicator for AI messages
+    if (sender === 'ai' && model) {
+        const modelIndicator = document.createElement('div');
+        modelIndicator.className = 'model-indicator';
+        modelIndicator.textContent = model;
+        messageDiv.appendChild(modelIndicator);
+    }
+
+    chatMessages.appendChild(messageDiv);
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+
+    // Initialize syntax highlighting for code blocks
+    if (sender === 'ai') {
+        messageDiv.querySelectorAll('pre code').forEach((block) => {
+            hljs.highlightBlock(block);
+        });
+    }
+}
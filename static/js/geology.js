@@ -0,0 +1,2 @@
+// Reload when the sample catalog changes; poll every 5 seconds
+reloadOnChange(5000);
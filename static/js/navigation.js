@@ -0,0 +1,128 @@
+// ?asset=EV2 (or PR, LTV) shows another asset; the default is the primary EV
+const assetId = new URLSearchParams(window.location.search).get('asset');
+const telemetryUrl = assetId ? `/api/assets/${encodeURIComponent(assetId)}/location` : '/api/location';
+const trackUrl = `${telemetryUrl}/track`;
+
+// Waypoints are part of the page shell; the live position is hydrated from /api/location
+const mapElement = document.getElementById('map');
+const waypoints = JSON.parse(mapElement.dataset.waypoints);
+const start = waypoints.length ? [waypoints[0].lat, waypoints[0].lng] : [0, 0];
+
+// Initialize map with dark theme
+const map = L.map('map').setView(start, 18);
+L.tileLayer('https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png', {
+    attribution: '© OpenStreetMap contributors, © CARTO',
+    maxZoom: 20
+}).addTo(map);
+
+// Create custom icon for current position
+const positionIcon = L.divIcon({
+    className: 'custom-div-icon',
+    html: "<div style='background-color: #105bd8; width: 15px; height: 15px; border-radius: 50%; border: 2px solid white;'></div>",
+    iconSize: [15, 15],
+    iconAnchor: [7, 7]
+});
+
+// Add current position marker
+const positionMarker = L.marker(start, {
+    icon: positionIcon
+}).addTo(map);
+
+// Add accuracy circle
+const accuracyCircle = L.circle(start, {
+    color: '#105bd8',
+    fillColor: '#105bd8',
+    fillOpacity: 0.1,
+    radius: 10,
+    weight: 1
+}).addTo(map);
+
+// Breadcrumb trail of the filtered track. Live positions are appended between
+// periodic reloads of the server's compressed trail, and the client-side part
+// is capped so a long EVA doesn't grow the polyline without bound.
+const TRAIL_RELOAD_MS = 60000;
+const MAX_LIVE_POINTS = 300;
+const breadcrumbs = L.polyline([], { color: '#fc3d21', weight: 2, opacity: 0.7 }).addTo(map);
+let liveTrail = [];
+let serverTrail = [];
+
+function loadTrack() {
+    fetch(trackUrl)
+        .then(response => response.json())
+        .then(data => {
+            serverTrail = data.track.map(point => [point.lat, point.lng]);
+            liveTrail = [];
+            breadcrumbs.setLatLngs(serverTrail);
+        });
+}
+
+function appendToTrail(latLng) {
+    liveTrail.push(latLng);
+    if (liveTrail.length > MAX_LIVE_POINTS) {
+        liveTrail = liveTrail.slice(-MAX_LIVE_POINTS);
+        breadcrumbs.setLatLngs(serverTrail.concat(liveTrail));
+    } else {
+        breadcrumbs.addLatLng(latLng);
+    }
+}
+
+loadTrack();
+setInterval(loadTrack, TRAIL_RELOAD_MS);
+
+// Add waypoint markers
+const waypointIcon = L.divIcon({
+    className: 'custom-div-icon',
+    html: "<div style='background-color: #28a745; width: 12px; height: 12px; border-radius: 50%; border: 2px solid white;'></div>",
+    iconSize: [12, 12],
+    iconAnchor: [6, 6]
+});
+
+waypoints.forEach(waypoint => {
+    L.marker([waypoint.lat, waypoint.lng], {
+        icon: waypointIcon
+    })
+    .bindPopup(waypoint.name)
+    .addTo(map);
+});
+
+function centerMapOn(lat, lng) {
+    map.setView([lat, lng], 18, {
+        animate: true,
+        duration: 1
+    });
+}
+
+function updateLocation() {
+    fetch(telemetryUrl)
+        .then(response => response.json())
+        .then(data => {
+            // Update text values
+            document.getElementById('latitude').textContent = data.latitude.toFixed(4);
+            document.getElementById('longitude').textContent = data.longitude.toFixed(4);
+            document.getElementById('heading').textContent = data.heading;
+            document.getElementById('altitude').textContent = data.altitude.toFixed(2);
+            document.getElementById('speed').textContent = data.speed.toFixed(2);
+            document.getElementById('last-updated').textContent = data.last_updated;
+
+            // Update map markers
+            const newLatLng = [data.latitude, data.longitude];
+            positionMarker.setLatLng(newLatLng);
+            accuracyCircle.setLatLng(newLatLng);
+            if (data.accuracy) {
+                accuracyCircle.setRadius(data.accuracy);
+            }
+            appendToTrail(newLatLng);
+
+            // Optional: keep map centered on current position
+            map.panTo(newLatLng, {
+                animate: true,
+                duration: 1
+            });
+        });
+}
+
+// Initial update
+updateLocation();
+
+// Poll for updates every second
+setInterval(updateLocation, 1000);
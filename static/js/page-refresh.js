@@ -0,0 +1,19 @@
+// Revalidate the page shell with its ETag and reload only when the server
+// reports new content. An unchanged page costs one empty 304 response.
+function reloadOnChange(interval) {
+    const etag = document.querySelector('meta[name="page-etag"]');
+    if (!etag) {
+        return;
+    }
+    setInterval(() => {
+        fetch(window.location.pathname, {
+            method: 'HEAD',
+            cache: 'no-store',
+            headers: { 'If-None-Match': etag.content }
+        }).then(response => {
+            if (response.status === 200) {
+                location.reload();
+            }
+        });
+    }, interval);
+}
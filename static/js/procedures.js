@@ -0,0 +1,2 @@
+// Reload when the procedure state changes; poll every 5 seconds
+reloadOnChange(5000);
@@ -0,0 +1,15 @@
+function updateTimeline() {
+    fetch('/api/timeline')
+        .then(response => response.json())
+        .then(data => {
+            document.getElementById('mission-time').textContent = data.mission_time;
+            document.getElementById('remaining-time').textContent = data.remaining_time;
+        });
+}
+
+// Initial update
+updateTimeline();
+
+// Poll the clock every second; reload when the plan itself changes
+setInterval(updateTimeline, 1000);
+reloadOnChange(5000);
@@ -0,0 +1,100 @@
+// ?asset=EV2 (or PR, LTV) shows another asset; the default is the primary EV
+const assetId = new URLSearchParams(window.location.search).get('asset');
+const telemetryUrl = assetId ? `/api/assets/${encodeURIComponent(assetId)}/vitals` : '/api/vitals';
+
+// Initialize charts
+const chartConfig = {
+    type: 'line',
+    data: {
+        labels: Array(20).fill(''),
+        datasets: [{
+            data: Array(20).fill(null),
+            borderColor: '#105bd8',
+            borderWidth: 2,
+            tension: 0.4,
+            fill: false
+        }]
+    },
+    options: {
+        responsive: true,
+        plugins: { legend: { display: false } },
+        scales: {
+            x: { display: false },
+            y: { display: false }
+        },
+        animation: false
+    }
+};
+
+const charts = {
+    heartRate: new Chart(document.getElementById('heart-rate-chart'), {...chartConfig}),
+    o2: new Chart(document.getElementById('o2-chart'), {...chartConfig}),
+    pressure: new Chart(document.getElementById('pressure-chart'), {...chartConfig}),
+    co2: new Chart(document.getElementById('co2-chart'), {...chartConfig})
+};
+
+// Update function for charts
+function updateChart(chart, value) {
+    chart.data.datasets[0].data.push(value);
+    chart.data.datasets[0].data.shift();
+    chart.update();
+}
+
+function updateVitals() {
+    fetch(telemetryUrl)
+        .then(response => response.json())
+        .then(data => {
+            // Update values
+            document.getElementById('heart-rate').textContent = data.heart_rate;
+            document.getElementById('blood-pressure').textContent = data.blood_pressure;
+            document.getElementById('o2-saturation').textContent = data.o2_saturation;
+            document.getElementById('suit-pressure').textContent = data.suit_pressure;
+            document.getElementById('battery-level').textContent = data.battery_level;
+            document.getElementById('co2-level').textContent = data.co2_level;
+            document.getElementById('temperature').textContent = data.temperature;
+            document.getElementById('humidity').textContent = data.humidity;
+            document.getElementById('fan-speed').textContent = data.fan_speed;
+            document.getElementById('last-updated').textContent = data.last_updated;
+
+            // Update battery progress bar
+            document.getElementById('battery-progress').style.width = `${data.battery_level}%`;
+
+            // Update charts
+            updateChart(charts.heartRate, data.heart_rate);
+            updateChart(charts.o2, data.o2_saturation);
+            updateChart(charts.pressure, data.suit_pressure);
+            updateChart(charts.co2, data.co2_level);
+
+            // Check for warnings
+            const cards = {
+                'heart-rate-card': data.heart_rate < 60 || data.heart_rate > 100,
+                'blood-pressure-card': false, // Add your own logic
+                'o2-card': data.o2_saturation < 95,
+                'pressure-card': data.suit_pressure < 3.8 || data.suit_pressure > 4.2,
+                'battery-card': data.battery_level < 20,
+                'co2-card': data.co2_level > 3,
+                'temp-card': data.temperature < 97 || data.temperature > 100,
+                'humidity-card': data.humidity < 30 || data.humidity > 70,
+                'fan-card': data.fan_speed < 1800
+            };
+
+            // Apply warning classes
+            for (const [id, warning] of Object.entries(cards)) {
+                const card = document.getElementById(id);
+                card.classList.toggle('warning', warning);
+                card.classList.toggle('critical', warning && (
+                    data.battery_level < 10 ||
+                    data.o2_saturation < 90 ||
+                    data.co2_level > 5 ||
+                    data.temperature > 101 ||
+                    data.temperature < 96
+                ));
+            }
+        });
+}
+
+// Initial update
+updateVitals();
+
+// Poll for updates every second
+setInterval(updateVitals, 1000);
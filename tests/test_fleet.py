@@ -0,0 +1,29 @@
+import pytest
+
+from utils.fleet import EV_SCHEMA, Asset
+
+def test_invalid_reading_leaves_the_record_unchanged():
+    asset = Asset('EV2', 'EV2', EV_SCHEMA)
+    asset.update({'vitals': {'heart_rate': 70, 'blood_pressure': '120/80'}})
+    version = asset.version
+    with pytest.raises(ValueError):
+        asset.update({'vitals': {'heart_rate': 90, 'co2_level': 'high'}})
+    assert asset.version == version
+    assert asset.to_dict('vitals')['heart_rate'] == 70
+    assert asset.to_dict('vitals')['blood_pressure'] == '120/80'
+
+def test_mock_records_do_not_count_as_fed():
+    asset = Asset('EV2', 'EV2', EV_SCHEMA)
+    asset.mock()
+    assert not asset.is_fed(5)
+    asset.update({'vitals': {'heart_rate': 70}})
+    assert asset.is_fed(5)
+
+@pytest.mark.parametrize('value', ['inf', '-inf', 'nan', 1e400, float('nan')])
+def test_non_finite_readings_are_rejected(value):
+    asset = Asset('EV2', 'EV2', EV_SCHEMA)
+    with pytest.raises(ValueError, match='heart_rate'):
+        asset.update({'vitals': {'heart_rate': value}})
+    with pytest.raises(ValueError):
+        asset.update({'vitals': {'blood_pressure': f'{value}/80'}})
+    assert asset.json('vitals')
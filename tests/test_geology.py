@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+import pytest
+
+from utils.geology import (
+    ELEMENTS, REFERENCE_LIBRARY, GeologySubsystem, SampleCatalog, XRFClassifier, composition_vector, synthetic_readings
+)
+from utils.telemetry import METERS_PER_DEGREE
+
+def test_composition_vector_rejects_unknown_and_missing_oxides():
+    composition = dict(zip(ELEMENTS, range(len(ELEMENTS))))
+    assert composition_vector(composition) == [float(v) for v in range(len(ELEMENTS))]
+    with pytest.raises(ValueError, match='P2O3'):
+        composition_vector({**composition, 'P2O3': 0.1})
+    del composition['MnO']
+    with pytest.raises(ValueError, match='MnO'):
+        composition_vector(composition)
+
+def test_other_defaults_to_remainder():
+    composition = {element: 10.0 for element in ELEMENTS[:-1]}
+    assert composition_vector(composition)[-1] == pytest.approx(10.0)
+
+def test_near_matches_linear_scan():
+    subsystem = GeologySubsystem()
+    subsystem.ingest(synthetic_readings(200, rng=np.random.default_rng(1)))
+    catalog = subsystem.catalog
+    for radius in (0, 10, 50, 150, 1e4):
+        expected = sorted(
+            s['id'] for s in catalog.in_time_range()
+            if np.hypot((s['lat'] - 29.5584) * METERS_PER_DEGREE,
+                        (s['lng'] + 95.0930) * METERS_PER_DEGREE * np.cos(np.radians(29.5584))) <= radius
+        )
+        assert sorted(s['id'] for s in catalog.near(29.5584, -95.0930, radius)) == expected
+
+def test_near_cost_is_bounded_for_huge_radius():
+    catalog = SampleCatalog()
+    catalog.add({'id': 'a', 'type': 'Anorthosite', 'lat': 29.5584, 'lng': -95.0930, 'timestamp': 1.0})
+    started = time.perf_counter()
+    assert [s['id'] for s in catalog.near(29.5584, -95.0930, 1e9)] == ['a']
+    assert time.perf_counter() - started < 0.1
+
+def test_classify_recovers_reference_types_and_flags_outliers():
+    classifier = XRFClassifier()
+    means = [REFERENCE_LIBRARY[rock_type][0] for rock_type in classifier.types]
+    result = classifier.classify(means)
+    assert list(result['type']) == classifier.types
+    assert np.allclose(result['distance'], 0)
+    assert not result['odd'].any()
+    outlier = np.array(REFERENCE_LIBRARY['Anorthosite'][0]) + np.array([-10, 8, -15, 20, 1, 10, -8, 3, 2, 0])
+    assert classifier.classify([outlier])['odd'][0]
+
+def test_type_filter_uses_the_type_index_and_keeps_query_order():
+    catalog = SampleCatalog()
+    for index, (rock_type, metres) in enumerate([('Anorthosite', 30), ('Mare Basalt', 5), ('Anorthosite', 10)]):
+        catalog.add({'id': f's{index}', 'type': rock_type, 'lat': 29.5584 + metres / METERS_PER_DEGREE,
+                     'lng': -95.0930, 'timestamp': float(index)})
+    assert [s['id'] for s in catalog.query(rock_type='Anorthosite')] == ['s0', 's2']
+    assert [s['id'] for s in catalog.query(rock_type='Anorthosite', start=1.0)] == ['s2']
+    assert [s['id'] for s in catalog.query(rock_type='Anorthosite', lat=29.5584, lng=-95.0930, radius=50)] == ['s2', 's0']
+    assert [s['id'] for s in catalog.query(rock_type='Anorthosite', lat=29.5584, lng=-95.0930, radius=20)] == ['s2']
+    assert catalog.query(rock_type='KREEP Breccia') == []
+
+def test_readings_without_a_position_are_rejected():
+    subsystem = GeologySubsystem()
+    reading = synthetic_readings(1, rng=np.random.default_rng(2))[0]
+    del reading['lat']
+    with pytest.raises(ValueError, match='lat'):
+        subsystem.ingest([reading])
+    assert len(subsystem.catalog) == 0
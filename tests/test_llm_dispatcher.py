@@ -0,0 +1,175 @@
+import threading
+import time
+
+import pytest
+
+from utils.llm_dispatcher import DispatcherBusy, LLMDispatcher, PendingJobs
+from utils.llm_usage import UsageLedger
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+def wait_for_in_flight(dispatcher, provider='openai'):
+    deadline = time.monotonic() + 5
+    while dispatcher._in_flight[provider] == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+def make_dispatcher(completion, concurrency=1, **kwargs):
+    limits = {provider: (concurrency, 1000.0, 1000) for provider in ('openai', 'anthropic', 'perplexity')}
+    kwargs.setdefault('base_delay', 0.001)
+    kwargs.setdefault('max_delay', 0.005)
+    return LLMDispatcher(limits=limits, completion=completion, **kwargs)
+
+def test_retries_retryable_errors_on_the_same_model():
+    calls = []
+
+    def completion(messages, model, raise_errors, timeout=None):
+        calls.append(model)
+        if len(calls) < 3:
+            raise ProviderError(503)
+        return True, "ok"
+
+    dispatcher = make_dispatcher(completion, max_retries=2)
+    assert dispatcher.complete("hi", model="gpt-4o", timeout=5) == (True, "ok", "gpt-4o")
+    assert calls == ["gpt-4o"] * 3
+
+def test_fails_over_once_retries_are_exhausted():
+    calls = []
+
+    def completion(messages, model, raise_errors, timeout=None):
+        calls.append(model)
+        if model == "gpt-4o":
+            raise ProviderError(503)
+        return True, f"from {model}"
+
+    dispatcher = make_dispatcher(completion, failover_models=['claude-3-haiku-20240307'], max_retries=1)
+    assert dispatcher.complete("hi", model="gpt-4o", timeout=5) == \
+        (True, "from claude-3-haiku-20240307", "claude-3-haiku-20240307")
+    assert calls == ["gpt-4o", "gpt-4o", "claude-3-haiku-20240307"]
+
+def test_client_errors_fail_without_failover():
+    calls = []
+
+    def completion(messages, model, raise_errors, timeout=None):
+        calls.append(model)
+        raise ProviderError(400)
+
+    dispatcher = make_dispatcher(completion, failover_models=['claude-3-haiku-20240307'])
+    success, response, model = dispatcher.complete("hi", model="gpt-4o", timeout=5)
+    assert not success and "400" in response
+    assert calls == ["gpt-4o"]
+
+def test_provider_calls_get_the_time_left_and_overruns_fail_at_the_deadline():
+    release = threading.Event()
+    timeouts = []
+
+    def completion(messages, model, raise_errors, timeout=None):
+        timeouts.append(timeout)
+        release.wait(5)  # a provider call that ignores its timeout
+        return True, "late"
+
+    dispatcher = make_dispatcher(completion)
+    started = time.monotonic()
+    future = dispatcher.submit("hi", model="gpt-4o", timeout=0.2)
+    success, response, _ = future.result(timeout=2)
+    assert time.monotonic() - started < 1
+    assert not success and "timed out" in response
+    assert 0 < timeouts[0] <= 0.2
+    release.set()
+
+def test_fails_when_every_model_is_exhausted():
+    def completion(messages, model, raise_errors, timeout=None):
+        raise ProviderError(503)
+
+    dispatcher = make_dispatcher(completion, failover_models=['claude-3-haiku-20240307'], max_retries=1)
+    success, response, model = dispatcher.complete("hi", model="gpt-4o", timeout=5)
+    assert not success
+    assert model == 'claude-3-haiku-20240307'
+    assert "503" in response
+
+def test_crew_requests_are_served_before_ground_requests():
+    release = threading.Event()
+    order = []
+
+    def completion(messages, model, raise_errors, timeout=None):
+        if messages == "blocker":
+            release.wait(5)
+        else:
+            order.append(messages)
+        return True, messages
+
+    dispatcher = make_dispatcher(completion)
+    blocker = dispatcher.submit("blocker", model="gpt-4o")
+    # The single openai slot is busy, so these queue up behind it
+    wait_for_in_flight(dispatcher)
+    futures = [dispatcher.submit(f"ground-{i}", model="gpt-4o", priority='ground') for i in range(3)]
+    futures.append(dispatcher.submit("crew", model="gpt-4o", priority='crew'))
+    release.set()
+    for future in [blocker] + futures:
+        future.result(timeout=5)
+    assert order == ["crew", "ground-0", "ground-1", "ground-2"]
+
+def test_full_queue_is_rejected():
+    release = threading.Event()
+
+    def completion(messages, model, raise_errors, timeout=None):
+        release.wait(5)
+        return True, "ok"
+
+    dispatcher = make_dispatcher(completion, queue_size=1)
+    dispatcher.submit("first", model="gpt-4o")
+    wait_for_in_flight(dispatcher)
+    dispatcher.submit("queued", model="gpt-4o")
+    with pytest.raises(DispatcherBusy):
+        dispatcher.submit("rejected", model="gpt-4o")
+    release.set()
+
+def test_pending_jobs_returns_futures_by_id():
+    release = threading.Event()
+
+    def completion(messages, model, raise_errors, timeout=None):
+        release.wait(5)
+        return True, "ok"
+
+    dispatcher = make_dispatcher(completion)
+    jobs = PendingJobs()
+    job_id = jobs.add(dispatcher.submit("hi", model="gpt-4o"), session='s1')
+    future, info = jobs.get(job_id)
+    assert info == {'session': 's1'}
+    assert not future.done()
+    release.set()
+    assert future.result(timeout=5) == (True, "ok", "gpt-4o")
+    assert jobs.get('unknown') is None
+
+def test_failover_never_costs_more_than_the_requested_model():
+    dispatcher = make_dispatcher(lambda *args, **kwargs: (True, "ok"),
+                                 failover_models=['claude-3-sonnet-20240229', 'gpt-4o', 'sonar-pro'])
+    # Budget downgrade to gpt-4o-mini: sonnet and sonar-pro have no step that cheap
+    assert dispatcher.models_for('gpt-4o-mini') == ['gpt-4o-mini']
+    assert dispatcher.models_for('gpt-4o') == ['gpt-4o', 'claude-3-haiku-20240307', 'sonar']
+    assert dispatcher.models_for('claude-3-opus-20240229') == ['claude-3-opus-20240229', 'gpt-4o', 'sonar-pro']
+
+def test_reservation_is_settled_by_the_recorded_call_or_released():
+    ledger = UsageLedger()
+    dispatcher = make_dispatcher(lambda messages, model, raise_errors, timeout=None: (True, "ok"), ledger=ledger)
+    reservation = ledger.reserve('s1', 5000, 0.5)
+    assert dispatcher.submit("hi", model="gpt-4o", session='s1', reservation=reservation).result(5)[0]
+    assert reservation.settled and ledger.committed('s1') == (0, 0.0)
+
+    release = threading.Event()
+
+    def blocking(messages, model, raise_errors, timeout=None):
+        release.wait(5)
+        return True, "ok"
+
+    dispatcher = make_dispatcher(blocking, queue_size=1, ledger=ledger)
+    dispatcher.submit("first", model="gpt-4o")
+    wait_for_in_flight(dispatcher)
+    dispatcher.submit("queued", model="gpt-4o")
+    rejected = ledger.reserve('s1', 5000, 0.5)
+    with pytest.raises(DispatcherBusy):
+        dispatcher.submit("rejected", model="gpt-4o", session='s1', reservation=rejected)
+    assert rejected.settled and ledger.committed('s1') == (0, 0.0)
+    release.set()
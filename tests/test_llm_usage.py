@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+from utils.llm_usage import (COMPLETION_RESERVE, BudgetExceeded, BudgetPolicy, UsageLedger, estimate_tokens,
+                             request_cost)
+
+def usage(prompt, completion, cached=0):
+    return {'prompt_tokens': prompt, 'completion_tokens': completion, 'cached_tokens': cached}
+
+def message(role, tokens):
+    # estimate_tokens counts four characters per token plus four per message
+    return {'role': role, 'content': 'x' * 4 * (tokens - 4)}
+
+def test_downgrades_once_the_threshold_is_reached():
+    ledger = UsageLedger()
+    policy = BudgetPolicy(ledger, session_tokens=10000, downgrade_at=0.8)
+    ledger.record('gpt-4o', 's1', usage(7000, 500), 1.0)
+
+    model, _, adjustments, reservation = policy.plan('s1', 'gpt-4o', [message('user', 10)])
+    assert model == 'gpt-4o' and adjustments == []
+    ledger.release(reservation)
+
+    ledger.record('gpt-4o', 's1', usage(400, 100), 1.0)
+    model, _, adjustments, _ = policy.plan('s1', 'gpt-4o', [message('user', 10)])
+    assert model == 'gpt-4o-mini'
+    assert adjustments == ["downgraded gpt-4o -> gpt-4o-mini"]
+
+def test_downgrades_when_the_next_request_would_overrun_the_cost_budget():
+    ledger = UsageLedger()
+    messages = [message('user', 2000)]
+    next_request = request_cost('gpt-4o', estimate_tokens(messages), COMPLETION_RESERVE)
+    policy = BudgetPolicy(ledger, session_cost=next_request * 2, downgrade_at=1.0)
+    ledger.record('gpt-4o', 's1', usage(0, 1600), 1.0)
+
+    # Well under the downgrade threshold, but the estimated cost doesn't fit in what is left
+    model, _, adjustments, _ = policy.plan('s1', 'gpt-4o', messages)
+    assert model == 'gpt-4o-mini'
+    assert adjustments == ["downgraded gpt-4o -> gpt-4o-mini"]
+
+def test_rejects_a_session_with_no_budget_left():
+    ledger = UsageLedger()
+    policy = BudgetPolicy(ledger, session_tokens=1000)
+    ledger.record('gpt-4o', 's1', usage(900, 100), 1.0)
+    with pytest.raises(BudgetExceeded):
+        policy.plan('s1', 'gpt-4o', [message('user', 10)])
+    # Other sessions are unaffected
+    assert policy.plan('s2', 'gpt-4o', [message('user', 10)])[0] == 'gpt-4o'
+
+def test_queued_requests_count_against_the_budget_until_recorded():
+    ledger = UsageLedger()
+    policy = BudgetPolicy(ledger, session_tokens=4 * (10 + COMPLETION_RESERVE))
+    messages = [message('user', 10)]
+
+    reservations = [policy.plan('s1', 'gpt-4o', messages)[3] for _ in range(4)]
+    with pytest.raises(BudgetExceeded):
+        policy.plan('s1', 'gpt-4o', messages)
+
+    # Settling replaces the estimate with what the call actually used
+    ledger.record('gpt-4o', 's1', usage(10, 20), 1.0, reservation=reservations[0])
+    ledger.release(reservations[1])
+    ledger.release(reservations[1])
+    assert ledger.committed('s1')[0] == 30 + 2 * (10 + COMPLETION_RESERVE)
+    assert policy.plan('s1', 'gpt-4o', messages)[0] == 'gpt-4o'
+
+def test_no_reservation_without_a_budget():
+    ledger = UsageLedger()
+    assert BudgetPolicy(ledger).plan('s1', 'gpt-4o', [message('user', 10)])[3] is None
+    assert ledger.committed('s1') == (0, 0.0)
+
+def test_trim_keeps_system_messages_and_the_last_message():
+    messages = [message('system', 100), message('user', 100), message('assistant', 100),
+                message('user', 100), message('user', 100)]
+    kept, dropped = BudgetPolicy.trim(messages, 250)
+    assert dropped == 3
+    assert kept == [messages[0], messages[-1]]
+
+    # Even when that doesn't fit
+    kept, dropped = BudgetPolicy.trim(messages, 10)
+    assert kept == [messages[0], messages[-1]]
+
+def test_plan_trims_to_the_remaining_tokens():
+    ledger = UsageLedger()
+    policy = BudgetPolicy(ledger, max_context_tokens=250)
+    messages = [message('system', 100), message('user', 100), message('user', 100)]
+    _, kept, adjustments, _ = policy.plan('s1', 'gpt-4o', messages)
+    assert kept == [messages[0], messages[2]]
+    assert adjustments == ["trimmed 1 earlier messages"]
+
+def test_flush_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'usage' / 'llm_usage.json')
+    ledger = UsageLedger(path)
+    ledger.record('gpt-4o', 's1', usage(3000, 200, cached=1000), 1.5)
+    ledger.record('gpt-4o', 's1', None, 0.5, success=False)
+    ledger.flush()
+
+    restored = UsageLedger(path)
+    assert restored.snapshot() == ledger.snapshot()
+    session = restored.session('s1')
+    assert (session.calls, session.errors, session.tokens) == (2, 1, 3200)
+
+def test_corrupt_usage_file_starts_an_empty_ledger(tmp_path):
+    path = tmp_path / 'llm_usage.json'
+    path.write_text('{"models": {"gpt-4o": ')
+    ledger = UsageLedger(str(path))
+    assert ledger.snapshot() == {'models': {}, 'context_latency': {}, 'sessions': {}}
+
+    path.write_text(json.dumps([1, 2, 3]))
+    assert ledger.load() is False
+
+    ledger.record('gpt-4o', 's1', usage(10, 10), 0.1)
+    ledger.flush()
+    assert UsageLedger(str(path)).session('s1').tokens == 20
+
+def test_least_recently_active_sessions_are_evicted():
+    ledger = UsageLedger(max_sessions=2)
+    for session in ('s1', 's2', 's1', 's3'):
+        ledger.record('gpt-4o', session, usage(10, 10), 0.1)
+    assert list(ledger.snapshot()['sessions']) == ['s1', 's3']
+    assert ledger.session('s2').calls == 0
+    # Model totals keep everything
+    assert ledger.snapshot()['models']['gpt-4o']['calls'] == 4
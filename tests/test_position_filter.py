@@ -0,0 +1,91 @@
+import math
+
+import numpy as np
+
+from utils.position_filter import BreadcrumbTrail, PositionKalmanFilter, douglas_peucker
+from utils.telemetry import METERS_PER_DEGREE
+
+LAT, LNG = 29.5584, -95.0930
+
+def north_of(lat, metres):
+    return lat + metres / METERS_PER_DEGREE
+
+def distance_m(estimate, lat, lng):
+    dy = (estimate['latitude'] - lat) * METERS_PER_DEGREE
+    dx = (estimate['longitude'] - lng) * METERS_PER_DEGREE * math.cos(math.radians(lat))
+    return math.hypot(dx, dy)
+
+def test_recovers_from_a_real_jump_while_stationary():
+    # 10 Hz, speed 0: the velocity updates keep the covariance tight, which
+    # used to make the gate reject every fix after a jump indefinitely
+    kalman = PositionKalmanFilter()
+    t = 0.0
+    for _ in range(600):
+        kalman.update(LAT, LNG, speed=0.0, heading=0.0, timestamp=t)
+        t += 0.1
+    jumped = north_of(LAT, 60)
+    for _ in range(20):
+        estimate = kalman.update(jumped, LNG, speed=0.0, heading=0.0, timestamp=t)
+        t += 0.1
+    assert kalman.resets == 1
+    assert distance_m(estimate, jumped, LNG) < 5
+    assert estimate['accuracy'] <= 8.0
+
+def test_single_outlier_is_rejected():
+    kalman = PositionKalmanFilter()
+    t = 0.0
+    for _ in range(100):
+        kalman.update(LAT, LNG, speed=0.0, heading=0.0, timestamp=t)
+        t += 0.1
+    kalman.update(north_of(LAT, 60), LNG, speed=0.0, heading=0.0, timestamp=t)
+    estimate = kalman.update(LAT, LNG, speed=0.0, heading=0.0, timestamp=t + 0.1)
+    assert kalman.rejected == 1
+    assert kalman.resets == 0
+    assert distance_m(estimate, LAT, LNG) < 1
+
+def test_clock_going_backwards_restarts_in_place():
+    kalman = PositionKalmanFilter()
+    kalman.update(LAT, LNG, timestamp=100.0)
+    estimate = kalman.update(north_of(LAT, 500), LNG, timestamp=0.0)
+    assert distance_m(estimate, north_of(LAT, 500), LNG) < 1e-6
+
+def deviation(point, path):
+    """Distance in metres from a point to the nearest segment of a polyline."""
+    best = float('inf')
+    for (ax, ay, *_), (bx, by, *_) in zip(path, path[1:]):
+        dx, dy = bx - ax, by - ay
+        t = 0.0 if dx == dy == 0 else max(0.0, min(1.0, ((point[0] - ax) * dx + (point[1] - ay) * dy) / (dx * dx + dy * dy)))
+        best = min(best, math.hypot(point[0] - ax - t * dx, point[1] - ay - t * dy))
+    return best
+
+def random_walk(n, seed=4):
+    rng = np.random.default_rng(seed)
+    heading = np.cumsum(rng.normal(0, 0.2, n))
+    east, north = np.cumsum(np.sin(heading)), np.cumsum(np.cos(heading))
+    return [(float(e), float(nn), float(t)) for t, (e, nn) in enumerate(zip(east, north))]
+
+def test_douglas_peucker_keeps_endpoints_and_stays_within_tolerance():
+    points = random_walk(500)
+    simplified = douglas_peucker(points, 2.0)
+    assert simplified[0] == points[0] and simplified[-1] == points[-1]
+    assert len(simplified) < len(points) / 4
+    assert max(deviation(p, simplified) for p in points) <= 2.0 + 1e-9
+    assert douglas_peucker(points[:2], 2.0) == points[:2]
+
+def test_breadcrumb_trail_stays_within_tolerance_of_every_fix():
+    trail = BreadcrumbTrail(tolerance=2.0)
+    points = random_walk(2000)
+    for point in points:
+        trail.add(*point)
+    path = trail.path()
+    assert path[0] == points[0] and path[-1] == points[-1]
+    assert len(path) < len(points) / 4
+    assert max(deviation(p, path) for p in points) <= 2.0 + 1e-9
+
+def test_breadcrumb_window_cap_bounds_a_straight_walk():
+    trail = BreadcrumbTrail(tolerance=2.0, max_window=64)
+    for index in range(1000):
+        trail.add(index * 0.5, 0.0, index)
+    # Nothing strays from the line, so only the window cap commits points
+    assert len(trail.path()) <= 1000 // 64 + 2
+    assert trail.received == 1000
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from utils.scenario import FAULT_TYPES, generate_scenario
+
+def test_same_seed_gives_the_same_timeline():
+    first, first_faults = generate_scenario(seed=7, hours=0.5, start_time=0)
+    second, second_faults = generate_scenario(seed=7, hours=0.5, start_time=0)
+    other, _ = generate_scenario(seed=8, hours=0.5, start_time=0)
+    assert first.tobytes() == second.tobytes()
+    assert first_faults == second_faults
+    assert not np.array_equal(first['heart_rate'], other['heart_rate'])
+
+def test_samples_are_continuous_through_stops_and_faults():
+    faults = [{'type': kind, 'start': 600.0 + 900 * i, 'duration': 400.0} for i, kind in enumerate(sorted(FAULT_TYPES))]
+    records, _ = generate_scenario(seed=3, hours=1.5, faults=faults, dwell=300, start_time=0)
+    assert (records['speed'] == 0).any()
+    # Largest change between 0.1 s samples
+    assert np.abs(np.diff(records['heart_rate'])).max() < 5
+    assert np.abs(np.diff(records['co2_level'])).max() < 0.2
+    assert np.abs(np.diff(records['bp_systolic'])).max() < 5
+    assert (np.diff(records['o2_storage']) <= 0).all()
+    assert (np.diff(records['battery_level']) <= 0).all()
+
+@pytest.mark.parametrize('waypoints', [
+    [{'lat': 29.5584, 'lng': -95.0930}],
+    [{'lat': 29.5584, 'lng': -95.0930}, {'lat': 29.5584, 'lng': -95.0930}],
+])
+def test_rejects_paths_without_two_distinct_waypoints(waypoints):
+    with pytest.raises(ValueError):
+        generate_scenario(seed=1, hours=0.1, waypoints=waypoints)
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from utils.startup import Readiness
+
+def flaky(failures):
+    calls = []
+
+    def warm():
+        calls.append(time.monotonic())
+        if len(calls) <= failures:
+            raise ConnectionError("unreachable")
+        return "warm"
+    return warm, calls
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+def test_ready_once_required_dependencies_are_warm():
+    readiness = Readiness()
+    readiness.add('cache', lambda: "3 pages")
+    readiness.add('optional', flaky(10)[0], required=False)
+    readiness.add('unconfigured', flaky(10)[0], required=False, enabled=False)
+    assert not readiness.ready()
+
+    readiness.start()
+    assert readiness.wait(5)
+    snapshot = readiness.snapshot()
+    assert snapshot['ready']
+    assert snapshot['dependencies']['cache']['status'] == 'ready'
+    assert snapshot['dependencies']['cache']['detail'] == "3 pages"
+    assert snapshot['dependencies']['optional']['status'] == 'failed'
+    assert snapshot['dependencies']['unconfigured'] == {
+        'status': 'disabled', 'required': False, 'detail': None, 'seconds': None, 'attempts': 0
+    }
+    readiness.stop()
+
+def test_failed_warm_up_is_retried_with_backoff():
+    warm, calls = flaky(3)
+    readiness = Readiness(retry_delay=0.01, max_retry_delay=0.02)
+    readiness.add('cache', warm).start()
+    assert readiness.wait(5)
+    assert not readiness.ready()
+    assert readiness.snapshot()['dependencies']['cache']['detail'] == "unreachable"
+
+    assert wait_until(readiness.ready)
+    assert readiness.snapshot()['dependencies']['cache']['attempts'] == 4
+    gaps = [later - earlier for earlier, later in zip(calls, calls[1:])]
+    assert gaps[0] >= 0.01 and min(gaps[1:]) >= 0.02
+
+def test_stop_ends_retries():
+    warm, calls = flaky(1000)
+    readiness = Readiness(retry_delay=0.01, max_retry_delay=0.01)
+    readiness.add('cache', warm).start()
+    assert wait_until(lambda: len(calls) >= 2)
+    readiness.stop()
+    time.sleep(0.05)
+    attempts = len(calls)
+    time.sleep(0.05)
+    assert len(calls) == attempts
+
+def test_uptime_counts_from_start():
+    readiness = Readiness()
+    time.sleep(0.05)
+    readiness.start()
+    assert readiness.snapshot()['uptime'] < 0.05
+
+@pytest.fixture
+def client(monkeypatch):
+    app = pytest.importorskip('app')
+    monkeypatch.setattr(app, 'readiness', Readiness(retry_delay=0.01))
+    return app, app.app.test_client()
+
+def test_healthz_is_ok_before_dependencies_are_ready(client):
+    app, test_client = client
+    app.readiness.add('cache', flaky(1000)[0])
+    response = test_client.get('/healthz')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ok'
+    assert test_client.get('/readyz').status_code == 503
+
+def test_readyz_recovers_after_a_failed_warm_up(client):
+    app, test_client = client
+    app.readiness.add('cache', flaky(2)[0])
+    app.readiness.add('discord', flaky(1000)[0], required=False).start()
+    assert app.readiness.wait(5)
+    response = test_client.get('/readyz')
+    assert response.status_code == 503
+    assert response.get_json()['dependencies']['cache']['status'] == 'failed'
+
+    assert wait_until(app.readiness.ready)
+    response = test_client.get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json()['dependencies']['discord']['status'] == 'failed'
+    app.readiness.stop()
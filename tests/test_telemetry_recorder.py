@@ -0,0 +1,127 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from utils.telemetry import TELEMETRY_FIELDS, TelemetryState
+from utils.telemetry_recorder import (
+    INDEX_STRIDE, TelemetryRecorder, TelemetryReplay, read_header, record_dtype, write_header
+)
+
+def make_snapshot(index):
+    return {
+        'mission_time': index * 0.5,
+        'wall_time': 1_700_000_000.0 + index * 0.5,
+        'vitals': {
+            'heart_rate': 70 + index % 20,
+            'blood_pressure': f"{110 + index % 10}/{75 + index % 5}",
+            'battery_level': 100 - index % 50,
+            'o2_storage': 90.5,
+        },
+        'location': {'latitude': 29.5584 + index * 1e-6, 'longitude': -95.0930, 'heading': index % 360},
+    }
+
+def record(path, count, start=0):
+    recorder = TelemetryRecorder(str(path))
+    for index in range(start, start + count):
+        recorder.record(make_snapshot(index))
+    recorder.close()
+    return recorder
+
+def test_round_trip(tmp_path):
+    path = tmp_path / 'eva.tlm'
+    record(path, 10)
+    replay = TelemetryReplay(TelemetryState(), str(path))
+
+    assert len(replay) == 10
+    snapshot = replay.snapshot_at(3)
+    expected = make_snapshot(3)
+    assert snapshot['mission_time'] == expected['mission_time']
+    assert snapshot['vitals']['heart_rate'] == expected['vitals']['heart_rate']
+    assert snapshot['vitals']['blood_pressure'] == expected['vitals']['blood_pressure']
+    assert snapshot['vitals']['o2_storage'] == 90.5
+    assert snapshot['location']['latitude'] == pytest.approx(expected['location']['latitude'])
+    assert 'speed' not in snapshot['location']  # never reported, stored as NaN
+
+def test_torn_record_is_dropped_on_reopen(tmp_path):
+    path = tmp_path / 'eva.tlm'
+    recorder = record(path, 5)
+    with open(path, 'ab') as file:
+        file.write(b'\x01' * (recorder.dtype.itemsize // 2))
+
+    recorder = record(path, 3, start=5)
+    assert recorder.count == 8
+    with open(path, 'rb') as file:
+        header_length, _ = read_header(file)
+    assert os.path.getsize(path) == header_length + 8 * recorder.dtype.itemsize
+
+    replay = TelemetryReplay(TelemetryState(), str(path))
+    assert len(replay) == 8
+    assert [replay.mission_time_at(i) for i in range(8)] == [i * 0.5 for i in range(8)]
+
+def test_reopen_rejects_a_different_schema(tmp_path):
+    path = tmp_path / 'eva.tlm'
+    record(path, 1)
+    with open(path, 'r+b') as file:
+        file.seek(16)
+        header = file.read(200).replace(b'"heart_rate", "<f4"', b'"heart_rate", "<f8"')
+        file.seek(16)
+        file.write(header)
+    with pytest.raises(ValueError):
+        TelemetryRecorder(str(path))
+
+def test_seek_uses_sparse_index(tmp_path):
+    path = tmp_path / 'eva.tlm'
+    count = INDEX_STRIDE * 4 + 17
+    record(path, count)
+    replay = TelemetryReplay(TelemetryState(), str(path))
+
+    assert len(replay.index) == 5
+    for mission_time in (-1.0, 0.0, 0.25, 127.9, 128.0, 300.3, (count - 1) * 0.5):
+        expected = next(i for i in range(count) if replay.mission_time_at(i) >= mission_time)
+        assert replay.index_at(mission_time) == expected
+    assert replay.index_at(count) == count
+
+    replay.seek(200.0)
+    assert replay.position() == 200.0
+    replay.seek(count)
+    assert replay.position() is None
+
+def test_replays_recording_with_older_schema(tmp_path):
+    # Recordings made before o2_storage was added have one column fewer
+    path = tmp_path / 'old.tlm'
+    fields = [field for field in TELEMETRY_FIELDS if field[0] != 'o2_storage']
+    dtype = record_dtype(fields)
+    rows = np.zeros(3, dtype=dtype)
+    rows['mission_time'] = [0.0, 1.0, 2.0]
+    rows['wall_time'] = 1_700_000_000.0
+    rows['heart_rate'] = 72
+    with open(path, 'wb') as file:
+        write_header(file, dtype)
+        file.write(rows.tobytes())
+
+    replay = TelemetryReplay(TelemetryState(), str(path))
+    snapshot = replay.snapshot_at(2)
+    assert snapshot['mission_time'] == 2.0
+    assert snapshot['vitals']['heart_rate'] == 72
+    assert 'o2_storage' not in snapshot['vitals']
+
+def test_speed_change_does_not_rush_the_backlog(tmp_path):
+    path = tmp_path / 'eva.bin'
+    record(path, 200)
+    state = TelemetryState()
+    published = []
+    state.subscribe(lambda snapshot: published.append(time.monotonic()))
+    replay = TelemetryReplay(state, str(path), speed=10).start()
+    try:
+        time.sleep(0.5)
+        changed = time.monotonic()
+        replay.set_speed(20)
+        time.sleep(0.2)
+    finally:
+        replay.stop()
+    # 40 ticks/s from the change on; without re-anchoring ~10 ticks arrive at once
+    assert sum(1 for t in published if changed <= t < changed + 0.05) <= 4
+    with pytest.raises(ValueError):
+        replay.set_speed(-1)
@@ -0,0 +1,69 @@
+import pytest
+
+from utils.timeline import ConsumableMonitor, MissionScheduler
+
+PLAN = [
+    {'id': 'egress', 'name': 'Egress', 'duration': 900},
+    {'id': 'walk', 'name': 'Walk', 'duration': 600, 'depends': ['egress']},
+    {'id': 'sample', 'name': 'Sample', 'duration': 1200, 'depends': ['walk']},
+    {'id': 'photos', 'name': 'Photos', 'duration': 300, 'depends': ['egress']},
+    {'id': 'ingress', 'name': 'Ingress', 'duration': 600, 'depends': ['sample', 'photos']},
+]
+
+def events(scheduler):
+    return {event['id']: event for event in scheduler.plan(0)['events']}
+
+def test_projects_times_and_critical_path():
+    scheduler = MissionScheduler(PLAN)
+    plan = scheduler.plan(0)
+    assert plan['projected_end'] == 900 + 600 + 1200 + 600
+    assert plan['critical_path'] == ['egress', 'walk', 'sample', 'ingress']
+    assert events(scheduler)['photos']['start'] == 900
+    assert not events(scheduler)['photos']['critical']
+
+def test_completing_early_pulls_successors_in():
+    scheduler = MissionScheduler(PLAN)
+    scheduler.start_task('egress', 0)
+    scheduler.complete_task('egress', 600)
+    assert events(scheduler)['walk']['start'] == 600
+    assert events(scheduler)['walk']['status'] == 'Upcoming'
+    assert scheduler.plan(600)['projected_end'] == 600 + 600 + 1200 + 600
+
+def test_overrunning_task_slips_once_per_step():
+    scheduler = MissionScheduler(PLAN, slip_step=60)
+    scheduler.start_task('egress', 0)
+    version = scheduler.version
+    for now in range(0, 900):
+        scheduler.advance(now)
+    assert scheduler.version == version
+    # Ten minutes of overrun polled every second
+    for now in range(900, 1500):
+        scheduler.advance(now)
+    assert scheduler.version - version <= 11
+    assert events(scheduler)['egress']['finish'] >= 1499
+    assert events(scheduler)['walk']['start'] == events(scheduler)['egress']['finish']
+
+def test_limits_are_quantised_to_minutes():
+    scheduler = MissionScheduler(PLAN)
+    scheduler.set_limit('O2', 7200)
+    version = scheduler.version
+    scheduler.set_limit('O2', 7210)
+    assert scheduler.version == version
+    scheduler.set_limit('O2', 7300)
+    assert scheduler.version == version + 1
+    assert scheduler.plan(0)['consumables']['O2'] == {'exhausted_at': 7320, 'margin': 7320 - 3300}
+
+def test_consumable_monitor_projects_a_steady_drain():
+    scheduler = MissionScheduler(PLAN)
+    monitor = ConsumableMonitor(scheduler, fields={'o2_storage': 'O2'}, reserve=10, min_interval=10)
+    # 1% per minute from 100%: reaches the 10% reserve at 5400 s
+    for now in range(0, 600, 5):
+        monitor({'mission_time': float(now), 'vitals': {'o2_storage': 100 - now / 60}})
+    assert scheduler.limits['O2'] == pytest.approx(5400, abs=60)
+
+def test_consumable_monitor_ignores_rising_levels():
+    scheduler = MissionScheduler(PLAN)
+    monitor = ConsumableMonitor(scheduler, fields={'battery_level': 'Battery'})
+    for now in range(0, 300, 10):
+        monitor({'mission_time': float(now), 'vitals': {'battery_level': 50 + now / 60}})
+    assert 'Battery' not in scheduler.limits
@@ -0,0 +1,198 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response
+
+from utils.metrics import record_cache
+
+try:
+    import brotli
+except ImportError:  # Brotli variants are skipped; gzip is always available
+    brotli = None
+
+# Long-lived caching for content-hashed URLs; the hash changes whenever the file does
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Page shells may be stored but must be revalidated (a conditional request) on every use
+REVALIDATE = 'no-cache'
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+def digest(data, length=12):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()[:length]
+
+def data_version(data):
+    """Content fingerprint of JSON-serialisable page data, for use as a cache version."""
+    return digest(json.dumps(data, sort_keys=True, default=str).encode('utf-8'), 16)
+
+def encode_variants(data, mimetype):
+    """
+    Precompress a payload once.
+
+    Args:
+        data (bytes): Uncompressed body
+        mimetype (str): Content type, used to skip already-compressed formats
+
+    Returns:
+        dict: {content-coding: bytes}, always including 'identity'
+    """
+    variants = {'identity': data}
+    if len(data) < 256 or not mimetype.startswith(COMPRESSIBLE_TYPES):
+        return variants
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        variants['gzip'] = compressed
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            variants['br'] = compressed
+    return variants
+
+def cached_response(request, variants, etag, mimetype, cache_control):
+    """
+    Serve precompressed variants with an ETag, answering If-None-Match with 304.
+
+    Args:
+        request: The current Flask request
+        variants (dict): {content-coding: bytes} from encode_variants
+        etag (str): Strong entity tag (without quotes) shared by all codings
+        mimetype (str): Response content type
+        cache_control (str): Cache-Control header value
+
+    Returns:
+        flask.Response
+    """
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+
+    coding = 'identity'
+    for candidate in ('br', 'gzip'):
+        if candidate in variants and request.accept_encodings[candidate]:
+            coding = candidate
+            break
+    response = Response(variants[coding], mimetype=mimetype, headers=headers)
+    if coding != 'identity':
+        response.headers['Content-Encoding'] = coding
+    return response
+
+class StaticAssets:
+    """
+    Content-hashed, precompressed static files.
+
+    Every file under `root` is read once, fingerprinted and compressed up
+    front. Templates link to assets through url() (exposed to Jinja as
+    asset_url), which returns a URL containing the content hash, so the
+    files can be served with an immutable Cache-Control header and a new
+    deployment is picked up as soon as a page references the new hash.
+
+    Args:
+        root (str): Directory containing the source assets
+        url_prefix (str): URL path the hashed files are served under
+    """
+
+    def __init__(self, root, url_prefix='/assets'):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip('/')
+        self.manifest = {}  # logical path -> hashed path
+        self.files = {}     # hashed path -> (mimetype, etag, variants)
+        self.load()
+
+    def load(self):
+        """(Re)scan the asset directory and rebuild the manifest."""
+        manifest, files = {}, {}
+        for directory, _, names in os.walk(self.root):
+            for name in sorted(names):
+                path = os.path.join(directory, name)
+                logical = os.path.relpath(path, self.root).replace(os.sep, '/')
+                with open(path, 'rb') as file:
+                    data = file.read()
+                etag = digest(data)
+                stem, extension = os.path.splitext(logical)
+                hashed = f"{stem}.{etag}{extension}"
+                mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                manifest[logical] = hashed
+                files[hashed] = (mimetype, etag, encode_variants(data, mimetype))
+        self.manifest, self.files = manifest, files
+        return self
+
+    def url(self, logical_path):
+        """Hashed URL for an asset, e.g. css/base.css -> /assets/css/base.3f2a91c04d1e.css"""
+        return f"{self.url_prefix}/{self.manifest[logical_path]}"
+
+    def response(self, request, hashed_path):
+        """Response for a hashed asset path, or None if it is unknown."""
+        entry = self.files.get(hashed_path)
+        if entry is None:
+            return None
+        mimetype, etag, variants = entry
+        return cached_response(request, variants, etag, mimetype, IMMUTABLE)
+
+class PageCache:
+    """
+    Rendered page shells keyed by template and data version.
+
+    A shell is rendered once per (template, version) and stored with its
+    precompressed variants. Its ETag is derived from the key and the build
+    (template sources plus asset manifest), not the rendered body, so a
+    conditional request for an unchanged page is answered with 304 without
+    rendering anything, and pages can embed their own ETag.
+
+    Args:
+        build_version (str): Identifies the deployed templates and assets
+        max_entries (int): Shells kept before the least recently used is evicted
+    """
+
+    def __init__(self, build_version, max_entries=64):
+        self.build_version = build_version
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def etag(self, template, version):
+        return digest(f"{self.build_version}:{template}:{version}".encode('utf-8'), 16)
+
+    def get(self, template, version, render):
+        """
+        Cached shell for (template, version), rendering it on a miss.
+
+        Args:
+            template (str): Template name
+            version: Hashable data version the rendered output depends on
+            render (callable): render(etag) -> str, called only on a miss
+
+        Returns:
+            tuple: (etag, variants)
+        """
+        key = (template, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        record_cache('page_cache', entry is not None)
+        if entry is not None:
+            return entry
+        etag = self.etag(template, version)
+        entry = (etag, encode_variants(render(etag).encode('utf-8'), 'text/html'))
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+def build_version(*directories):
+    """Fingerprint of every file under the given directories (templates, static assets)."""
+    hasher = hashlib.blake2b(digest_size=16)
+    for root in directories:
+        for directory, subdirectories, names in os.walk(root):
+            subdirectories.sort()
+            for name in sorted(names):
+                path = os.path.join(directory, name)
+                hasher.update(os.path.relpath(path, root).encode('utf-8'))
+                with open(path, 'rb') as file:
+                    hasher.update(file.read())
+    return hasher.hexdigest()[:16]
@@ -1,38 +1,83 @@
 import requests
 import json
-import os 
+import os
+import queue
+import threading
 from dotenv import load_dotenv
 import logging
 
+from utils.metrics import Counter, Gauge
+
 # Load environment variables
 load_dotenv()
 WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+QUEUE_SIZE = int(os.getenv('DISCORD_QUEUE_SIZE', '1000'))
+
+DISCORD_QUEUE_DEPTH = Gauge('suits_discord_queue_depth', 'Discord log messages waiting to be sent')
+DISCORD_MESSAGES = Counter('suits_discord_messages_total', 'Discord log messages by outcome (sent, failed, dropped)', ['outcome'])
 
 class DiscordLogger:
-    def __init__(self):
+    def __init__(self, queue_size=QUEUE_SIZE):
         self.webhook_url = WEBHOOK_URL
+        self.session = requests.Session()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        DISCORD_QUEUE_DEPTH.set_function(self.queue.qsize)
         if not self.webhook_url:
             logging.warning("Discord webhook URL not found in environment variables")
 
     def send_log(self, message, level="INFO"):
         """
-        Send a log message to Discord
+        Queue a log message for Discord without blocking the caller.
+        Messages are dropped (and counted) if the queue is full.
         Args:
             message (str): The message to send
             level (str): Log level (INFO, WARNING, ERROR, etc.)
         """
         if not self.webhook_url:
             return
-        
+
+        if self._worker is None:
+            self._start_worker()
+        try:
+            self.queue.put_nowait((message, level))
+        except queue.Full:
+            DISCORD_MESSAGES.labels('dropped').inc()
+
+    def _start_worker(self):
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._drain, name="DiscordLogger", daemon=True)
+                self._worker.start()
+
+    def _drain(self):
+        while True:
+            message, level = self.queue.get()
+            self._post(message, level)
+            self.queue.task_done()
+
+    def _post(self, message, level):
         try:
             payload = {
                 "content": f"[{level}] {message}"
             }
-            response = requests.post(self.webhook_url, json=payload)
+            response = self.session.post(self.webhook_url, json=payload, timeout=10)
             response.raise_for_status()
+            DISCORD_MESSAGES.labels('sent').inc()
+            return True
         except Exception as e:
+            DISCORD_MESSAGES.labels('failed').inc()
             logging.error(f"Failed to send Discord log: {str(e)}")
+            return False
+
+    def flush(self):
+        """Wait until every queued message has been sent."""
+        if self._worker is not None:
+            self.queue.join()
 
     def test_connection(self):
         """Test the Discord webhook connection"""
-        self.send_log("Test logging connection successful") 
\ No newline at end of file
+        if not self.webhook_url:
+            return False
+        return self._post("Test logging connection successful", "INFO")
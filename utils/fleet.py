@@ -0,0 +1,373 @@
+import math
+import random
+import sys
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+from utils.metrics import record_cache
+from utils.telemetry import format_timestamp
+
+# One telemetry channel. kind is 'int', 'float' or 'bool'; low/high bound the mock values.
+Field = namedtuple('Field', 'name group kind precision low high')
+
+def _formatter(kind, precision):
+    """JSON text for one stored value; NaN (never reported) becomes null."""
+    if kind == 'int':
+        return lambda value: 'null' if value != value else '%d' % round(value)
+    if kind == 'bool':
+        return lambda value: 'null' if value != value else ('true' if value else 'false')
+    pattern = f'%.{precision}f'
+    return lambda value: 'null' if value != value else pattern % value
+
+def _converter(kind, precision):
+    """Python value for one stored value; NaN becomes None."""
+    if kind == 'int':
+        return lambda value: None if value != value else int(round(value))
+    if kind == 'bool':
+        return lambda value: None if value != value else bool(value)
+    return lambda value: None if value != value else round(value, precision)
+
+def _number(name, value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = None
+    # float() also accepts "inf", "nan" and overflowing literals such as 1e400
+    if number is None or not math.isfinite(number):
+        raise ValueError(f"{name} must be a finite number, got {value!r}")
+    return number
+
+class AssetSchema:
+    """
+    Typed telemetry layout for one kind of asset.
+
+    Values live in a flat array of doubles in field order, so a sample costs
+    8 bytes per field regardless of content. For each group ('vitals',
+    'location', 'systems') the JSON output is compiled once into a format
+    string plus a list of per-field formatters, so serialising a group is a
+    single pass over its fields.
+
+    Args:
+        kind (str): Asset kind, e.g. 'ev', 'pr' or 'ltv'
+        fields (list): Field definitions, in storage order
+        composites (dict): group -> {output key: (field names, separator)} for values
+            the dashboards expect as one string (e.g. blood pressure "120/80")
+    """
+
+    def __init__(self, kind, fields, composites=None):
+        self.kind = kind
+        self.fields = list(fields)
+        self.index = {field.name: position for position, field in enumerate(self.fields)}
+        self.groups = list(dict.fromkeys(field.group for field in self.fields))
+        self.composites = composites or {}
+        self._compiled = {group: self._compile(group) for group in self.groups}
+
+    def _compile(self, group):
+        composed = {name for names, _ in self.composites.get(group, {}).values() for name in names}
+        template, json_plan, dict_plan = [], [], []
+        for position, field in enumerate(self.fields):
+            if field.group != group or field.name in composed:
+                continue
+            template.append(f'"{field.name}": %s')
+            json_plan.append((_formatter(field.kind, field.precision), position))
+            dict_plan.append((field.name, _converter(field.kind, field.precision), position))
+        composites = []
+        for key, (names, separator) in self.composites.get(group, {}).items():
+            template.append(f'"{key}": %s')
+            composites.append((key, tuple(self.index[name] for name in names), separator))
+        template.append('"last_updated": "%s"')
+        return '{' + ', '.join(template) + '}', json_plan, dict_plan, composites
+
+    def new_record(self):
+        return TelemetryRecord(len(self.fields))
+
+    def parse(self, group, data):
+        """
+        Convert readings from a dict without storing them.
+
+        Args:
+            group (str): Group the readings belong to
+            data (dict): Readings by field (or composite) name; unknown keys are ignored
+
+        Returns:
+            list: [(field position, value), ...]
+
+        Raises:
+            ValueError: If data isn't a dict or a reading isn't a finite number
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"{group} must be an object")
+        parsed = []
+        for key, (names, separator) in self.composites.get(group, {}).items():
+            if data.get(key):
+                for name, part in zip(names, str(data[key]).split(separator)):
+                    parsed.append((self.index[name], _number(key, part)))
+        for key, value in data.items():
+            position = self.index.get(key)
+            if position is not None and value is not None and self.fields[position].group == group:
+                parsed.append((position, _number(key, value)))
+        return parsed
+
+    def update(self, record, group, data):
+        """
+        Copy readings from a dict into the record; nothing is stored if any reading is invalid.
+
+        Args:
+            record (TelemetryRecord): Record to update
+            group (str): Group the readings belong to
+            data (dict): Readings by field (or composite) name; unknown keys are ignored
+        """
+        values = record.values
+        for position, value in self.parse(group, data):
+            values[position] = value
+
+    def to_json(self, record, group):
+        """Serialise one group of a record as JSON text."""
+        template, json_plan, _, composites = self._compiled[group]
+        values = record.values
+        parts = [format_value(values[position]) for format_value, position in json_plan]
+        for _, positions, separator in composites:
+            if any(values[p] != values[p] for p in positions):
+                parts.append('null')
+            else:
+                parts.append('"' + separator.join('%d' % round(values[p]) for p in positions) + '"')
+        parts.append(format_timestamp(record.wall_time))
+        return template % tuple(parts)
+
+    def to_dict(self, record, group):
+        """One group of a record as a dict (fields never reported are omitted)."""
+        _, _, dict_plan, composites = self._compiled[group]
+        values = record.values
+        result = {}
+        for name, convert, position in dict_plan:
+            value = convert(values[position])
+            if value is not None:
+                result[name] = value
+        for key, positions, separator in composites:
+            if all(values[p] == values[p] for p in positions):
+                result[key] = separator.join('%d' % round(values[p]) for p in positions)
+        result['last_updated'] = format_timestamp(record.wall_time)
+        return result
+
+    def mock(self, record, rng=random):
+        """Fill a record with uniformly distributed mock values."""
+        values = record.values
+        for position, field in enumerate(self.fields):
+            if field.kind == 'bool':
+                values[position] = float(rng.random() < field.high)
+            elif field.kind == 'int':
+                values[position] = float(rng.randint(int(field.low), int(field.high)))
+            else:
+                values[position] = round(rng.uniform(field.low, field.high), field.precision)
+        record.mission_time = None
+        record.wall_time = time.time()
+        return record
+
+class TelemetryRecord:
+    """Latest sample of one asset: field values in schema order plus its timestamps."""
+    __slots__ = ('values', 'mission_time', 'wall_time')
+
+    def __init__(self, size):
+        self.values = array('d', [float('nan')]) * size
+        self.mission_time = None
+        self.wall_time = time.time()
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.values)
+
+def _location_fields():
+    return [
+        Field('latitude', 'location', 'float', 6, 29.5574, 29.5594),
+        Field('longitude', 'location', 'float', 6, -95.0940, -95.0920),
+        Field('heading', 'location', 'int', 0, 0, 359),
+        Field('altitude', 'location', 'float', 2, 0, 10),
+        Field('speed', 'location', 'float', 2, 0, 2),
+    ]
+
+EV_SCHEMA = AssetSchema('ev', [
+    Field('heart_rate', 'vitals', 'int', 0, 60, 100),
+    Field('bp_systolic', 'vitals', 'int', 0, 110, 130),
+    Field('bp_diastolic', 'vitals', 'int', 0, 70, 90),
+    Field('o2_saturation', 'vitals', 'int', 0, 95, 100),
+    Field('suit_pressure', 'vitals', 'float', 2, 3.8, 4.2),
+    Field('battery_level', 'vitals', 'int', 0, 70, 100),
+    Field('co2_level', 'vitals', 'float', 2, 0, 2),
+    Field('temperature', 'vitals', 'float', 1, 98.0, 99.5),
+    Field('humidity', 'vitals', 'int', 0, 40, 60),
+    Field('fan_speed', 'vitals', 'int', 0, 2000, 3000),
+    Field('o2_storage', 'vitals', 'float', 1, 60, 100),
+    Field('o2_pressure', 'vitals', 'float', 1, 750, 850),
+    Field('helmet_co2', 'vitals', 'float', 2, 0, 0.2),
+    Field('scrubber_a_co2', 'vitals', 'float', 1, 0, 60),
+    Field('scrubber_b_co2', 'vitals', 'float', 1, 0, 60),
+    Field('coolant_level', 'vitals', 'float', 1, 80, 100),
+    *_location_fields(),
+], composites={'vitals': {'blood_pressure': (('bp_systolic', 'bp_diastolic'), '/')}})
+
+PR_SCHEMA = AssetSchema('pr', [
+    Field('cabin_pressure', 'systems', 'float', 2, 14.2, 14.9),
+    Field('cabin_temperature', 'systems', 'float', 1, 68, 75),
+    Field('oxygen_tank', 'systems', 'float', 1, 60, 100),
+    Field('battery_level', 'systems', 'float', 1, 60, 100),
+    Field('power_consumption', 'systems', 'float', 2, 2, 8),
+    Field('solar_efficiency', 'systems', 'float', 2, 0.7, 0.95),
+    Field('coolant_level', 'systems', 'float', 1, 80, 100),
+    Field('distance_traveled', 'systems', 'float', 1, 0, 5000),
+    Field('throttle', 'systems', 'float', 1, 0, 100),
+    Field('steering', 'systems', 'float', 2, -1, 1),
+    Field('pitch', 'systems', 'float', 1, -5, 5),
+    Field('roll', 'systems', 'float', 1, -5, 5),
+    Field('lights_on', 'systems', 'bool', 0, 0, 0.5),
+    Field('brakes', 'systems', 'bool', 0, 0, 0.5),
+    Field('in_sunlight', 'systems', 'bool', 0, 0, 0.8),
+    *_location_fields(),
+])
+
+LTV_SCHEMA = AssetSchema('ltv', [
+    Field('battery_level', 'systems', 'float', 1, 40, 100),
+    Field('signal_strength', 'systems', 'float', 1, -90, -40),
+    Field('motor_temperature', 'systems', 'float', 1, 10, 60),
+    Field('wheel_slip', 'systems', 'float', 2, 0, 0.3),
+    Field('tilt', 'systems', 'float', 1, 0, 15),
+    Field('payload_mass', 'systems', 'float', 1, 0, 50),
+    Field('beacon_active', 'systems', 'bool', 0, 0, 0.9),
+    Field('error_code', 'systems', 'int', 0, 0, 0),
+    *_location_fields(),
+])
+
+class Asset:
+    """
+    One tracked asset and its latest record.
+
+    JSON for each group is produced at most once per update and then served
+    from memory until the next update.
+    """
+    __slots__ = ('id', 'name', 'schema', 'record', 'version', 'fed_at', '_json', '_lock')
+
+    def __init__(self, asset_id, name, schema):
+        self.id = asset_id
+        self.name = name
+        self.schema = schema
+        self.record = schema.new_record()
+        self.version = 0
+        self.fed_at = None  # monotonic time of the last update from a real feed
+        self._json = {}
+        self._lock = threading.Lock()
+
+    def update(self, groups, mission_time=None, wall_time=None, fed=True):
+        """
+        Merge new readings.
+
+        Args:
+            groups (dict): group -> {field: value}
+            mission_time (float): Mission elapsed seconds of the reading
+            wall_time (float): Unix timestamp of the reading (defaults to now)
+            fed (bool): Whether this came from a real feed rather than mock data
+
+        Raises:
+            ValueError: If a reading isn't a finite number; the record is left unchanged
+        """
+        parsed = [pair for group, data in groups.items() if group in self.schema.groups and data
+                  for pair in self.schema.parse(group, data)]
+        with self._lock:
+            values = self.record.values
+            for position, value in parsed:
+                values[position] = value
+            self.record.mission_time = mission_time
+            self.record.wall_time = time.time() if wall_time is None else wall_time
+            self._touch(fed)
+
+    def mock(self, rng=random):
+        with self._lock:
+            self.schema.mock(self.record, rng)
+            self._touch(fed=False)
+
+    def _touch(self, fed):
+        self.version += 1
+        self._json = {}
+        if fed:
+            self.fed_at = time.monotonic()
+
+    def mark_fed(self):
+        """Count the latest record as real data, e.g. after feeding it through the shared state."""
+        with self._lock:
+            self.fed_at = time.monotonic()
+
+    def is_fed(self, timeout):
+        return self.fed_at is not None and time.monotonic() - self.fed_at < timeout
+
+    def json(self, group):
+        """JSON text for one group of the latest record."""
+        cached = self._json.get(group)
+        if cached is None:
+            with self._lock:
+                cached = self._json.get(group)
+                if cached is None:
+                    cached = self._json[group] = self.schema.to_json(self.record, group)
+                    record_cache('asset_json', False)
+                    return cached
+        record_cache('asset_json', True)
+        return cached
+
+    def to_dict(self, group):
+        with self._lock:
+            return self.schema.to_dict(self.record, group)
+
+    def describe(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'kind': self.schema.kind,
+            'groups': self.schema.groups,
+            'fields': len(self.schema.fields),
+            'record_bytes': self.record.nbytes(),
+            'version': self.version
+        }
+
+class AssetRegistry:
+    """
+    Assets by ID (EV1, EV2, PR, LTV, ...) for routing the telemetry APIs.
+
+    Args:
+        feed_timeout (float): Seconds after the last real update before an
+            asset is considered unfed and falls back to mock data
+    """
+
+    def __init__(self, feed_timeout=5.0):
+        self.feed_timeout = feed_timeout
+        self._assets = {}
+
+    def register(self, asset_id, name, schema):
+        asset = Asset(asset_id, name, schema)
+        self._assets[asset_id] = asset
+        return asset
+
+    def get(self, asset_id):
+        return self._assets.get(asset_id)
+
+    def __iter__(self):
+        return iter(self._assets.values())
+
+    def mirror(self, asset_id, fed=None):
+        """
+        Subscriber that copies TelemetryState snapshots into an asset.
+
+        Args:
+            asset_id (str): Asset to copy into
+            fed (callable): Whether the state is currently fed for real (e.g.
+                TelemetryState.has_source); snapshots count as a real feed if omitted
+
+        Returns:
+            callable: callback(snapshot) for TelemetryState.subscribe
+        """
+        asset = self._assets[asset_id]
+
+        def on_snapshot(snapshot):
+            asset.update(
+                {'vitals': snapshot.get('vitals'), 'location': snapshot.get('location')},
+                snapshot.get('mission_time'), snapshot.get('wall_time'),
+                fed=fed is None or fed()
+            )
+        return on_snapshot
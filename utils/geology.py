@@ -0,0 +1,372 @@
+import math
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+
+import numpy as np
+
+from utils.telemetry import METERS_PER_DEGREE
+
+# Oxides reported by the XRF spectrometer, in weight percent
+ELEMENTS = ('SiO2', 'TiO2', 'Al2O3', 'FeO', 'MnO', 'MgO', 'CaO', 'K2O', 'P2O5', 'other')
+
+# Reference library: rock type -> (mean composition, per-oxide standard deviation), in ELEMENTS order.
+# Values are representative lunar compositions; correlations are added from CORRELATION below.
+REFERENCE_LIBRARY = {
+    'Mare Basalt':          ((45.4, 2.9, 10.0, 19.6, 0.27, 8.7, 10.6, 0.09, 0.10, 2.3), (1.5, 1.0, 1.5, 1.8, 0.05, 1.5, 1.0, 0.05, 0.05, 1.0)),
+    'Ilmenite Basalt':      ((38.9, 12.0, 8.9, 19.1, 0.27, 8.0, 10.9, 0.07, 0.10, 1.8), (1.5, 1.5, 1.2, 1.5, 0.05, 1.5, 1.0, 0.04, 0.05, 1.0)),
+    'Olivine Basalt':       ((44.2, 2.5, 8.5, 21.3, 0.28, 13.6, 8.5, 0.05, 0.08, 1.0), (1.5, 0.8, 1.2, 1.5, 0.05, 2.0, 1.0, 0.03, 0.04, 0.8)),
+    'Vesicular Basalt':     ((46.1, 3.5, 9.8, 19.2, 0.26, 8.0, 11.0, 0.10, 0.12, 1.9), (1.5, 1.0, 1.5, 1.8, 0.05, 1.5, 1.0, 0.05, 0.05, 1.0)),
+    'Anorthosite':          ((44.3, 0.1, 34.0, 0.6, 0.01, 0.4, 19.0, 0.02, 0.01, 1.5), (1.0, 0.05, 1.5, 0.4, 0.01, 0.3, 1.0, 0.01, 0.01, 0.8)),
+    'Anorthositic Breccia': ((45.0, 0.4, 28.5, 4.2, 0.06, 4.5, 16.2, 0.05, 0.05, 1.0), (1.2, 0.3, 2.0, 1.2, 0.03, 1.5, 1.2, 0.03, 0.03, 0.8)),
+    'KREEP Breccia':        ((48.0, 1.8, 17.5, 10.5, 0.14, 9.5, 10.5, 0.65, 0.55, 0.9), (1.5, 0.6, 2.0, 1.5, 0.04, 1.5, 1.0, 0.20, 0.15, 0.8)),
+    'Highland Regolith':    ((45.0, 0.6, 26.5, 5.5, 0.07, 6.0, 15.3, 0.10, 0.10, 0.8), (1.0, 0.3, 1.8, 1.2, 0.03, 1.2, 1.0, 0.04, 0.04, 0.6)),
+    'Mare Regolith':        ((42.2, 7.5, 13.6, 15.8, 0.21, 9.6, 11.9, 0.10, 0.10, 1.0), (1.2, 1.5, 1.5, 1.5, 0.04, 1.2, 1.0, 0.04, 0.04, 0.8)),
+}
+
+# Shared oxide correlation applied to every reference class (FeO/MgO co-vary in mafic
+# minerals, Al2O3/CaO in plagioclase, and both groups trade off against each other)
+CORRELATION = np.eye(len(ELEMENTS))
+for _a, _b, _r in (('FeO', 'MgO', 0.4), ('Al2O3', 'CaO', 0.6), ('Al2O3', 'FeO', -0.5), ('TiO2', 'FeO', 0.3)):
+    _i, _j = ELEMENTS.index(_a), ELEMENTS.index(_b)
+    CORRELATION[_i, _j] = CORRELATION[_j, _i] = _r
+
+# Readings this unlikely under every reference class are flagged as odd (Look-ODD)
+ODD_THRESHOLD = 0.999
+
+def _chi2_sf(x, dof):
+    """Chi-square survival function (vectorized); exact closed form for even degrees of freedom."""
+    half = np.asarray(x, dtype=float) / 2
+    if dof % 2 == 0:
+        term = np.exp(-half)
+        total = term.copy()
+        for i in range(1, dof // 2):
+            term = term * half / i
+            total += term
+        return total
+    # Wilson-Hilferty normal approximation for odd degrees of freedom
+    z = ((2 * half / dof) ** (1 / 3) - (1 - 2 / (9 * dof))) / math.sqrt(2 / (9 * dof))
+    return 0.5 * np.vectorize(math.erfc)(z / math.sqrt(2))
+
+class XRFClassifier:
+    """
+    Classify XRF oxide compositions against a reference library by Mahalanobis distance.
+
+    Inverse covariance factors are precomputed once, so classifying a batch is
+    a handful of array operations regardless of its size.
+
+    Args:
+        library (dict): rock type -> (mean, std) sequences in ELEMENTS order
+        correlation (np.ndarray): Oxide correlation matrix shared by all classes
+    """
+
+    def __init__(self, library=REFERENCE_LIBRARY, correlation=CORRELATION):
+        self.types = list(library)
+        self.means = np.array([library[t][0] for t in self.types], dtype=float)
+        stds = np.array([library[t][1] for t in self.types], dtype=float)
+        covariance = stds[:, :, None] * correlation[None] * stds[:, None, :]
+        # Whitening: with cov = L L^T, distance^2 = |L^-1 (x - mean)|^2
+        cholesky = np.linalg.cholesky(covariance)
+        whiten = np.linalg.inv(cholesky)
+        self.log_det = 2 * np.log(np.diagonal(cholesky, axis1=1, axis2=2)).sum(axis=1)
+        # Stack every class's whitening matrix so a batch is whitened in one matrix product
+        self._whiten_stacked = whiten.reshape(-1, len(ELEMENTS)).T
+        self._whitened_means = np.einsum('kij,kj->ki', whiten, self.means).reshape(-1)
+
+    def distances(self, compositions):
+        """Squared Mahalanobis distance of each reading (n, d) to each class, shape (n, k)."""
+        x = np.atleast_2d(np.asarray(compositions, dtype=float))
+        whitened = x @ self._whiten_stacked - self._whitened_means
+        whitened *= whitened
+        return whitened.reshape(len(x), len(self.types), -1).sum(axis=2)
+
+    def classify(self, compositions):
+        """
+        Classify a batch of readings.
+
+        Args:
+            compositions: Array-like of shape (n, len(ELEMENTS))
+
+        Returns:
+            dict: 'type' (n,) rock type names, 'confidence' (n,) posterior of the
+            chosen class, 'distance' (n,) Mahalanobis distance to it, and
+            'odd_score' (n,) in [0, 1], how unlikely the reading is under every reference,
+            and 'odd' (n,) whether that exceeds ODD_THRESHOLD
+        """
+        d2 = self.distances(compositions)
+        log_likelihood = -0.5 * (d2 + self.log_det[None, :])
+        best = np.argmax(log_likelihood, axis=1)
+        shifted = np.exp(log_likelihood - log_likelihood.max(axis=1, keepdims=True))
+        posterior = shifted / shifted.sum(axis=1, keepdims=True)
+        rows = np.arange(len(best))
+        nearest = d2.min(axis=1)
+        odd_score = 1 - _chi2_sf(nearest, len(ELEMENTS))
+        return {
+            'type': np.array(self.types, dtype=object)[best],
+            'confidence': posterior[rows, best],
+            'distance': np.sqrt(d2[rows, best]),
+            'odd_score': odd_score,
+            'odd': odd_score >= ODD_THRESHOLD,
+        }
+
+def composition_vector(composition):
+    """
+    Convert an {oxide: wt%} mapping into an ELEMENTS-ordered list.
+
+    Every oxide must be reported. 'other' may be left out and then defaults
+    to the remainder up to 100 wt%.
+
+    Raises:
+        ValueError: For unknown or missing oxides, or values that aren't numbers
+    """
+    unknown = set(composition) - set(ELEMENTS)
+    if unknown:
+        raise ValueError(f"Unknown oxide(s) {sorted(unknown)}; expected {list(ELEMENTS)}")
+    missing = [element for element in ELEMENTS[:-1] if composition.get(element) is None]
+    if missing:
+        raise ValueError(f"Missing oxide(s) {missing}")
+    vector = [float(composition[element]) for element in ELEMENTS[:-1]]
+    other = composition.get('other')
+    vector.append(max(0.0, 100.0 - sum(vector)) if other is None else float(other))
+    return vector
+
+def _nearest_first(samples, lat, lng, radius):
+    """The samples within `radius` metres of (lat, lng), nearest first."""
+    scale = math.cos(math.radians(lat))
+    found = []
+    for sample in samples:
+        dy = (sample['lat'] - lat) * METERS_PER_DEGREE
+        dx = (sample['lng'] - lng) * METERS_PER_DEGREE * scale
+        distance = math.hypot(dx, dy)
+        if distance <= radius:
+            found.append((distance, sample))
+    return [sample for _, sample in sorted(found, key=lambda item: item[0])]
+
+class SampleCatalog:
+    """
+    Collected geology samples indexed by ID, rock type, collection time and location.
+
+    Location queries use a grid of `cell_size` metres of latitude by
+    `cell_size` metres of longitude at the equator (narrower in true metres
+    away from it), so a radius search touches only the cells that overlap
+    the circle.
+    """
+
+
+    def __init__(self, cell_size=25.0):
+        self.cell_size = cell_size
+        self._lock = threading.RLock()
+        self._samples = {}
+        self._by_type = {}
+        self._by_time = []  # sorted (timestamp, id)
+        self._grid = {}
+        self.version = 0  # bumped on every change, so readers can cache derived views
+
+    def __len__(self):
+        return len(self._samples)
+
+    def _cell(self, lat, lng):
+        # Longitude is not scaled by cos(latitude): that would shift a sample's
+        # column with its latitude and put nearby samples in distant cells
+        return int(lat * METERS_PER_DEGREE // self.cell_size), int(lng * METERS_PER_DEGREE // self.cell_size)
+
+    def add(self, sample):
+        """
+        Add or replace a sample.
+
+        Args:
+            sample (dict): Must have 'id', 'type', 'lat', 'lng' and 'timestamp' (unix seconds)
+        """
+        with self._lock:
+            if sample['id'] in self._samples:
+                self.remove(sample['id'])
+            self._samples[sample['id']] = sample
+            self._by_type.setdefault(sample['type'], set()).add(sample['id'])
+            insort(self._by_time, (sample['timestamp'], sample['id']))
+            self._grid.setdefault(self._cell(sample['lat'], sample['lng']), set()).add(sample['id'])
+            self.version += 1
+        return sample
+
+    def remove(self, sample_id):
+        with self._lock:
+            sample = self._samples.pop(sample_id, None)
+            if sample is None:
+                return None
+            self._by_type[sample['type']].discard(sample_id)
+            self._by_time.pop(bisect_left(self._by_time, (sample['timestamp'], sample_id)))
+            cell = self._cell(sample['lat'], sample['lng'])
+            self._grid[cell].discard(sample_id)
+            if not self._grid[cell]:
+                del self._grid[cell]
+            self.version += 1
+            return sample
+
+    def get(self, sample_id):
+        return self._samples.get(sample_id)
+
+    def by_type(self, rock_type):
+        with self._lock:
+            return [self._samples[i] for i in self._by_type.get(rock_type, ())]
+
+    def in_time_range(self, start=None, end=None):
+        """Samples collected in [start, end] (unix seconds), oldest first."""
+        with self._lock:
+            lo = 0 if start is None else bisect_left(self._by_time, (start, ''))
+            hi = len(self._by_time) if end is None else bisect_right(self._by_time, (end, '\uffff'))
+            return [self._samples[i] for _, i in self._by_time[lo:hi]]
+
+    def recent(self, limit=10):
+        """Most recently collected samples, newest first."""
+        with self._lock:
+            return [self._samples[i] for _, i in reversed(self._by_time[-limit:])]
+
+    def near(self, lat, lng, radius):
+        """
+        Samples within `radius` metres of (lat, lng), nearest first.
+
+        When the circle spans more grid cells than are occupied, every sample
+        is checked directly instead, so the cost is bounded by the catalog
+        size however large the radius.
+        """
+        with self._lock:
+            reach_y = radius / self.cell_size
+            # Columns are narrowest in true metres at the edge of the circle nearest a pole
+            edge = math.cos(math.radians(min(90.0, abs(lat) + radius / METERS_PER_DEGREE)))
+            reach_x = reach_y / edge if edge > 1e-9 else float('inf')
+            if (2 * reach_y + 1) * (2 * reach_x + 1) <= len(self._grid):
+                cy, cx = self._cell(lat, lng)
+                reach_y, reach_x = int(math.ceil(reach_y)), int(math.ceil(reach_x))
+                candidates = [
+                    self._samples[sample_id]
+                    for y in range(cy - reach_y, cy + reach_y + 1)
+                    for x in range(cx - reach_x, cx + reach_x + 1)
+                    for sample_id in self._grid.get((y, x), ())
+                ]
+            else:
+                candidates = self._samples.values()
+            return _nearest_first(candidates, lat, lng, radius)
+
+    def query(self, rock_type=None, start=None, end=None, lat=None, lng=None, radius=None):
+        """
+        Intersect the type, time and location filters that are given.
+
+        A type filter starts from that type's samples rather than the grid or
+        the time index. Results are nearest first for location queries,
+        otherwise oldest first.
+        """
+        located = lat is not None and lng is not None and radius is not None
+        with self._lock:
+            if rock_type is not None:
+                samples = [self._samples[i] for i in self._by_type.get(rock_type, ())]
+                if not located:
+                    samples.sort(key=lambda s: (s['timestamp'], s['id']))
+            elif located:
+                samples = self.near(lat, lng, radius)
+            else:
+                return self.in_time_range(start, end)
+            samples = [
+                s for s in samples
+                if (start is None or s['timestamp'] >= start)
+                and (end is None or s['timestamp'] <= end)
+            ]
+            if rock_type is not None and located:
+                samples = _nearest_first(samples, lat, lng, radius)
+            return samples
+
+    def samples_of_interest(self, limit=5):
+        """
+        Rank samples for the Look-ODD process: readings least like any reference
+        rock come first, then low-confidence classifications.
+        """
+        with self._lock:
+            ranked = sorted(
+                self._samples.values(),
+                key=lambda s: (s.get('odd_score', 0.0), 1 - s.get('confidence', 1.0)),
+                reverse=True
+            )
+            return ranked[:limit]
+
+class GeologySubsystem:
+    """XRF classification feeding a sample catalog."""
+
+    def __init__(self, classifier=None, catalog=None):
+        self.classifier = classifier or XRFClassifier()
+        self.catalog = catalog or SampleCatalog()
+        self._counter = 100
+        self._lock = threading.Lock()
+
+    def _next_id(self):
+        with self._lock:
+            self._counter += 1
+            return f"SAMPLE-{self._counter}"
+
+    def ingest(self, readings):
+        """
+        Classify a batch of XRF readings and add them to the catalog.
+
+        Args:
+            readings (list): Dicts with 'composition' ({oxide: wt%}), 'lat' and 'lng',
+                and optional 'id', 'timestamp', 'mass' and 'status'
+
+        Returns:
+            list: The catalogued sample dicts, in input order
+
+        Raises:
+            ValueError: For readings without a finite position or with an invalid composition
+        """
+        if not readings:
+            return []
+        for index, reading in enumerate(readings):
+            # A sample without a position would otherwise be filed at (0, 0)
+            if not all(isinstance(reading.get(key), (int, float)) and math.isfinite(reading[key]) for key in ('lat', 'lng')):
+                raise ValueError(f"Reading {index} needs numeric 'lat' and 'lng'")
+        result = self.classifier.classify([composition_vector(r['composition']) for r in readings])
+        samples = []
+        for index, reading in enumerate(readings):
+            timestamp = reading.get('timestamp') or datetime.now().timestamp()
+            sample = {
+                'id': reading.get('id') or self._next_id(),
+                'type': str(result['type'][index]),
+                'confidence': round(float(result['confidence'][index]), 3),
+                'distance': round(float(result['distance'][index]), 2),
+                'odd_score': round(float(result['odd_score'][index]), 4),
+                'odd': bool(result['odd'][index]),
+                'composition': dict(reading['composition']),
+                'lat': float(reading['lat']),
+                'lng': float(reading['lng']),
+                'mass': reading.get('mass'),
+                'status': reading.get('status', 'Analyzed'),
+                'timestamp': timestamp,
+                'collection_time': datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            samples.append(self.catalog.add(sample))
+        return samples
+
+def synthetic_readings(count, rng=None, lat=29.5584, lng=-95.0930, odd_fraction=0.05, library=REFERENCE_LIBRARY):
+    """
+    Draw XRF readings from the reference library, with a fraction of off-library outliers.
+
+    Returns:
+        list: Reading dicts accepted by GeologySubsystem.ingest
+    """
+    rng = rng or np.random.default_rng()
+    types = list(library)
+    chosen = rng.integers(len(types), size=count)
+    means = np.array([library[t][0] for t in types])[chosen]
+    stds = np.array([library[t][1] for t in types])[chosen]
+    correlated = rng.standard_normal((count, len(ELEMENTS))) @ np.linalg.cholesky(CORRELATION).T
+    compositions = means + correlated * stds
+    odd = rng.random(count) < odd_fraction
+    compositions[odd] += rng.normal(0, 6, size=(odd.sum(), len(ELEMENTS)))
+    compositions = np.clip(compositions, 0, None)
+    offsets = rng.uniform(-0.001, 0.001, size=(count, 2))
+    masses = rng.uniform(0.1, 2.0, size=count)
+    return [
+        {
+            'composition': dict(zip(ELEMENTS, np.round(row, 2).tolist())),
+            'lat': lat + offset[0],
+            'lng': lng + offset[1],
+            'mass': round(float(mass), 2),
+        }
+        for row, offset, mass in zip(compositions, offsets, masses)
+    ]
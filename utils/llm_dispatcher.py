@@ -0,0 +1,459 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError
+from email.utils import parsedate_to_datetime
+
+from utils.llm_usage import DOWNGRADES, MODEL_PRICES
+from utils.llm_utils import get_llm_completion, last_usage
+from utils.metrics import Counter, Gauge
+
+# Lower value = served first
+PRIORITIES = {'crew': 0, 'ground': 1}
+
+# Equivalent models tried in order when the requested one keeps failing
+DEFAULT_FAILOVER_MODELS = ['claude-3-sonnet-20240229', 'gpt-4o', 'sonar-pro']
+
+# Default per-provider limits: (max concurrent calls, requests per second, burst)
+DEFAULT_LIMITS = {
+    'openai': (4, 5.0, 5),
+    'anthropic': (4, 5.0, 5),
+    'perplexity': (2, 2.0, 2),
+}
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+LLM_QUEUE_DEPTH = Gauge('suits_llm_queue_depth', 'LLM requests waiting in the dispatcher', ['state'])
+LLM_RETRIES = Counter('suits_llm_retries_total', 'LLM call attempts that were retried, by model', ['model'])
+LLM_FAILOVERS = Counter('suits_llm_failovers_total', 'LLM requests moved to the next equivalent model', ['from_model', 'to_model'])
+LLM_REJECTED = Counter('suits_llm_rejected_total', 'LLM requests rejected because the dispatcher queue was full')
+
+class DispatcherBusy(Exception):
+    """Raised when the dispatcher queue is full; retry_after is a hint in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__("LLM dispatcher queue is full")
+        self.retry_after = retry_after
+
+def provider_for(model):
+    """Map a model identifier to the provider get_llm_completion routes it to."""
+    if model.startswith("claude"):
+        return 'anthropic'
+    if model.startswith("sonar"):
+        return 'perplexity'
+    return 'openai'
+
+def _pricier(model, ceiling):
+    """Whether a model's (input, output) price exceeds `ceiling` on either side; unknown prices never do."""
+    price = MODEL_PRICES.get(model)
+    return price is not None and (price[0] > ceiling[0] or price[1] > ceiling[1])
+
+def retry_after_seconds(error):
+    """Extract a Retry-After hint (seconds) from a provider SDK exception, if any."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    if headers.get('retry-after-ms'):
+        try:
+            return float(headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def is_client_error(error):
+    """A 4xx the request itself caused (bad input, auth); another model won't fare better."""
+    status = getattr(error, 'status_code', None)
+    return status is not None and 400 <= status < 500 and not is_retryable(error)
+
+def is_retryable(error):
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        # Connection and timeout errors carry no status code
+        return 'Connection' in type(error).__name__ or 'Timeout' in type(error).__name__
+    return status in RETRYABLE_STATUS or status >= 500
+
+class TokenBucket:
+    """Rate limiter refilled continuously at `rate` tokens per second up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now):
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now):
+        """Seconds until the next token is available."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+class PendingJobs:
+    """
+    Futures from LLMDispatcher.submit() by job ID, for clients that poll for the result.
+
+    Request handlers return the job ID straight away instead of waiting on
+    the future, so no web server thread is held while a completion runs.
+    Finished jobs are kept for `ttl` seconds so the client can collect
+    them, and at most `max_jobs` are tracked (oldest dropped first).
+
+    Args:
+        ttl (float): Seconds a finished job stays available
+        max_jobs (int): Jobs tracked at once
+    """
+
+    def __init__(self, ttl=300.0, max_jobs=1024):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()  # job ID -> [future, info, finished_at]
+        self._lock = threading.Lock()
+
+    def add(self, future, **info):
+        """
+        Track a future.
+
+        Args:
+            future (concurrent.futures.Future): From LLMDispatcher.submit()
+            **info: Extra values returned with the future by get()
+
+        Returns:
+            str: Job ID
+        """
+        job_id = uuid.uuid4().hex
+        entry = [future, info, None]
+        with self._lock:
+            self._prune(time.monotonic())
+            self._jobs[job_id] = entry
+        future.add_done_callback(lambda _: entry.__setitem__(2, time.monotonic()))
+        return job_id
+
+    def get(self, job_id):
+        """
+        Returns:
+            tuple: (future, info), or None if the job is unknown or expired
+        """
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        return (entry[0], entry[1]) if entry is not None else None
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def _prune(self, now):
+        """Drop expired finished jobs, then the oldest over max_jobs; caller holds the lock."""
+        for job_id in [job_id for job_id, entry in self._jobs.items()
+                       if entry[2] is not None and now - entry[2] >= self.ttl]:
+            del self._jobs[job_id]
+        while len(self._jobs) >= self.max_jobs:
+            self._jobs.popitem(last=False)
+
+class _Job:
+    __slots__ = ('messages', 'models', 'model_index', 'attempts', 'priority', 'deadline', 'future', 'last_error',
+                 'session', 'reservation')
+
+    def __init__(self, messages, models, priority, deadline, session=None, reservation=None):
+        self.messages = messages
+        self.models = models
+        self.model_index = 0
+        self.attempts = 0
+        self.priority = priority
+        self.deadline = deadline
+        self.future = Future()
+        self.last_error = None
+        self.session = session
+        self.reservation = reservation
+
+class LLMDispatcher:
+    """
+    Admission control, priority queueing, retries and failover for LLM calls.
+
+    Requests are queued by priority and executed on the dispatcher's own
+    worker threads, each call holding one of its provider's concurrency
+    slots and one token from the provider's rate bucket. Retryable errors
+    back off with full jitter (never sooner than the provider's Retry-After)
+    and, once `max_retries` is exhausted, move to the next equivalent model;
+    other 4xx errors fail the request at once. Provider calls are given the
+    time left before the request's deadline, and a watchdog fails the request
+    if a call is still running when it passes. A full queue rejects
+    immediately instead of tying up request threads.
+
+    Args:
+        limits (dict): provider -> (concurrency, requests/second, burst)
+        failover_models (list): Ordered equivalent models appended after the requested one
+        queue_size (int): Maximum queued requests before DispatcherBusy is raised
+        max_retries (int): Retries per model before failing over
+        base_delay (float): Initial backoff in seconds
+        max_delay (float): Backoff cap in seconds
+        completion (callable): Function with get_llm_completion's signature, including timeout (for tests/benchmarks)
+        ledger (UsageLedger): Receives the token usage and latency of every attempt
+    """
+
+    def __init__(self, limits=None, failover_models=None, queue_size=64, max_retries=2,
+                 base_delay=0.5, max_delay=8.0, completion=get_llm_completion, ledger=None):
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.failover_models = list(DEFAULT_FAILOVER_MODELS if failover_models is None else failover_models)
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.completion = completion
+        self.ledger = ledger
+
+        self._buckets = {p: TokenBucket(rate, burst) for p, (_, rate, burst) in self.limits.items()}
+        self._in_flight = {p: 0 for p in self.limits}
+        self._ready = []    # (priority, seq, job)
+        self._delayed = []  # (ready_at, seq, job)
+        self._running = set()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._workers = []
+        LLM_QUEUE_DEPTH.labels('ready').set_function(lambda: len(self._ready))
+        LLM_QUEUE_DEPTH.labels('delayed').set_function(lambda: len(self._delayed))
+
+    @classmethod
+    def from_env(cls, ledger=None):
+        """Build a dispatcher from LLM_* environment variables."""
+        limits = {}
+        for provider, (concurrency, rate, burst) in DEFAULT_LIMITS.items():
+            prefix = f"LLM_{provider.upper()}_"
+            limits[provider] = (
+                int(os.getenv(prefix + 'CONCURRENCY', concurrency)),
+                float(os.getenv(prefix + 'RPS', rate)),
+                int(os.getenv(prefix + 'BURST', burst)),
+            )
+        failover = os.getenv('LLM_FAILOVER_MODELS')
+        return cls(
+            limits=limits,
+            failover_models=[m.strip() for m in failover.split(',') if m.strip()] if failover is not None else None,
+            queue_size=int(os.getenv('LLM_QUEUE_SIZE', '64')),
+            max_retries=int(os.getenv('LLM_MAX_RETRIES', '2')),
+            ledger=ledger,
+        )
+
+    def start(self):
+        """Start one worker per provider concurrency slot (idempotent)."""
+        with self._cond:
+            if self._workers:
+                return self
+            count = sum(concurrency for concurrency, _, _ in self.limits.values())
+            for index in range(count):
+                worker = threading.Thread(target=self._work, name=f"LLMDispatcher-{index}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            watchdog = threading.Thread(target=self._watch, name="LLMDispatcher-watchdog", daemon=True)
+            watchdog.start()
+            self._workers.append(watchdog)
+        return self
+
+    def models_for(self, model):
+        """
+        The requested model followed by equivalent models from other providers.
+
+        Failing over never costs more than the requested model, so a budget
+        downgrade isn't undone: a pricier failover model is stepped down
+        through DOWNGRADES, or dropped if no step is cheap enough. Models
+        without a known price are not filtered.
+        """
+        requested = provider_for(model)
+        ceiling = MODEL_PRICES.get(model)
+        models = [model]
+        for candidate in self.failover_models:
+            if provider_for(candidate) == requested:
+                continue
+            while candidate is not None and ceiling is not None and _pricier(candidate, ceiling):
+                candidate = DOWNGRADES.get(candidate)
+            if candidate is not None and candidate not in models:
+                models.append(candidate)
+        return models
+
+    def submit(self, messages, model="gpt-4o", priority='ground', timeout=60.0, session=None, reservation=None):
+        """
+        Queue a completion request.
+
+        Args:
+            messages (list or str): Messages as accepted by get_llm_completion
+            model (str): Preferred model
+            priority (str): 'crew' or 'ground'
+            timeout (float): Seconds before the request gives up
+            session (str): Chat session the usage is accounted to
+            reservation (Reservation): From BudgetPolicy.plan(); settled by the first recorded
+                attempt, or released if the request ends without one
+
+        Returns:
+            concurrent.futures.Future: Resolves to (success, response, model_used)
+        """
+        if not self._workers:
+            self.start()
+        job = _Job(messages, self.models_for(model), PRIORITIES.get(priority, PRIORITIES['ground']),
+                   time.monotonic() + timeout, session, reservation)
+        with self._cond:
+            if len(self._ready) + len(self._delayed) >= self.queue_size:
+                LLM_REJECTED.inc()
+                self._release(job)
+                raise DispatcherBusy(retry_after=self._estimate_wait())
+            heapq.heappush(self._ready, (job.priority, next(self._seq), job))
+            self._cond.notify()
+        if reservation is not None:
+            job.future.add_done_callback(lambda _: self._release(job))
+        return job.future
+
+    def _release(self, job):
+        if job.reservation is not None and self.ledger is not None:
+            self.ledger.release(job.reservation)
+
+    def complete(self, messages, model="gpt-4o", priority='ground', timeout=60.0, session=None):
+        """
+        Blocking wrapper around submit(); returns (success, response, model_used).
+
+        Holds the calling thread until the request finishes, so request
+        handlers should use submit() with PendingJobs instead.
+        """
+        future = self.submit(messages, model, priority, timeout, session)
+        try:
+            return future.result(timeout=timeout + 1)
+        except TimeoutError:
+            return False, "LLM request timed out", model
+
+    def _estimate_wait(self):
+        rate = sum(bucket.rate for bucket in self._buckets.values()) or 1.0
+        return max(1, int(round(self.queue_size / rate)))
+
+    def _next_job(self):
+        """Pop the highest-priority job that has a free provider slot; caller holds the lock."""
+        while True:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, seq, job = heapq.heappop(self._delayed)
+                heapq.heappush(self._ready, (job.priority, seq, job))
+
+            skipped, chosen = [], None
+            while self._ready:
+                entry = heapq.heappop(self._ready)
+                job = entry[2]
+                if now >= job.deadline:
+                    self._fail(job, "LLM request timed out waiting for provider capacity")
+                    continue
+                provider = provider_for(job.models[job.model_index])
+                concurrency = self.limits.get(provider, (1, 1.0, 1))[0]
+                if self._in_flight[provider] < concurrency and self._buckets[provider].try_take(now):
+                    self._in_flight[provider] += 1
+                    self._running.add(job)
+                    self._cond.notify_all()
+                    chosen = job
+                    break
+                skipped.append(entry)
+            for entry in skipped:
+                heapq.heappush(self._ready, entry)
+            if chosen is not None:
+                return chosen
+
+            # Nothing runnable: sleep until a delayed job is due or a token refills
+            waits = [self._delayed[0][0] - now] if self._delayed else []
+            waits += [self._buckets[provider_for(e[2].models[e[2].model_index])].wait_time(now) for e in skipped]
+            self._cond.wait(timeout=max(0.005, min(waits)) if waits else None)
+
+    def _fail(self, job, message):
+        self._resolve(job, (False, job.last_error or message, job.models[job.model_index]))
+
+    @staticmethod
+    def _resolve(job, result):
+        # The watchdog may already have failed a job whose provider call overran
+        try:
+            job.future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _watch(self):
+        """Fail jobs whose deadline passes while their provider call is still running."""
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                expired = [job for job in self._running if now >= job.deadline]
+                self._running.difference_update(expired)
+                if not expired:
+                    deadline = min((job.deadline for job in self._running), default=None)
+                    self._cond.wait(timeout=None if deadline is None else max(0.005, deadline - now))
+            # Outside the lock: done callbacks run when the future is resolved
+            for job in expired:
+                self._fail(job, "LLM request timed out")
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+            model = job.models[job.model_index]
+            provider = provider_for(model)
+            started = time.perf_counter()
+            try:
+                success, response = self.completion(job.messages, model=model, raise_errors=True,
+                                                     timeout=max(0.001, job.deadline - time.monotonic()))
+                error = None
+            except Exception as e:
+                success, response, error = False, str(e), e
+            finally:
+                with self._cond:
+                    self._in_flight[provider] -= 1
+                    self._running.discard(job)
+                    self._cond.notify_all()
+            if self.ledger is not None:
+                self.ledger.record(model, job.session, last_usage(), time.perf_counter() - started, success,
+                                   reservation=job.reservation)
+
+            if success:
+                self._resolve(job, (True, response, model))
+                continue
+            job.last_error = response
+            self._reschedule(job, error)
+
+    def _reschedule(self, job, error):
+        model = job.models[job.model_index]
+        delay = 0.0
+        if job.future.done():
+            return
+        if error is not None and is_client_error(error):
+            self._fail(job, job.last_error)
+            return
+        if error is not None and is_retryable(error) and job.attempts < self.max_retries:
+            job.attempts += 1
+            LLM_RETRIES.labels(model).inc()
+            backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** job.attempts))
+            delay = max(backoff, retry_after_seconds(error) or 0.0)
+        elif job.model_index + 1 < len(job.models):
+            job.model_index += 1
+            job.attempts = 0
+            LLM_FAILOVERS.labels(model, job.models[job.model_index]).inc()
+        else:
+            self._fail(job, job.last_error)
+            return
+
+        ready_at = time.monotonic() + delay
+        if ready_at >= job.deadline:
+            self._fail(job, job.last_error)
+            return
+        with self._cond:
+            heapq.heappush(self._delayed, (ready_at, next(self._seq), job))
+            self._cond.notify()
@@ -0,0 +1,467 @@
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from utils.metrics import Counter
+
+# List prices in USD per million tokens: (input, output). Cached input tokens
+# are billed at CACHED_INPUT_RATE of the input price.
+MODEL_PRICES = {
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4o-mini': (0.15, 0.60),
+    'o1-preview': (15.00, 60.00),
+    'o1-mini': (3.00, 12.00),
+    'sonar-pro': (3.00, 15.00),
+    'sonar': (1.00, 1.00),
+    'sonar-reasoning': (1.00, 5.00),
+    'claude-3-opus-20240229': (15.00, 75.00),
+    'claude-3-sonnet-20240229': (3.00, 15.00),
+    'claude-3-haiku-20240307': (0.25, 1.25),
+}
+CACHED_INPUT_RATE = 0.5
+
+# Cheaper/faster model to fall back to when a session nears its budget
+DOWNGRADES = {
+    'gpt-4o': 'gpt-4o-mini',
+    'o1-preview': 'o1-mini',
+    'o1-mini': 'gpt-4o-mini',
+    'sonar-pro': 'sonar',
+    'sonar-reasoning': 'sonar',
+    'claude-3-opus-20240229': 'claude-3-sonnet-20240229',
+    'claude-3-sonnet-20240229': 'claude-3-haiku-20240307',
+}
+
+# Tokens held back for the completion when fitting a prompt into a budget
+COMPLETION_RESERVE = 1024
+
+LLM_TOKENS = Counter('suits_llm_tokens_total', 'LLM tokens by model and kind (prompt, completion, cached)', ['model', 'kind'])
+LLM_COST = Counter('suits_llm_cost_usd_total', 'Estimated LLM spend in USD by model', ['model'])
+LLM_BUDGET_ACTIONS = Counter('suits_llm_budget_actions_total', 'Requests changed by the budget policy, by action', ['action'])
+
+class BudgetExceeded(Exception):
+    """Raised when a chat session has used up its token or cost budget."""
+
+def usage_from_response(response):
+    """
+    Token usage from an OpenAI/Perplexity or Anthropic response object.
+
+    Returns:
+        dict: prompt_tokens (including cached), completion_tokens and cached_tokens, or None
+    """
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return None
+    if hasattr(usage, 'input_tokens'):
+        # Anthropic reports cache reads and writes separately from input_tokens
+        cached = getattr(usage, 'cache_read_input_tokens', None) or 0
+        written = getattr(usage, 'cache_creation_input_tokens', None) or 0
+        return {
+            'prompt_tokens': (usage.input_tokens or 0) + cached + written,
+            'completion_tokens': usage.output_tokens or 0,
+            'cached_tokens': cached,
+        }
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return {
+        'prompt_tokens': usage.prompt_tokens or 0,
+        'completion_tokens': usage.completion_tokens or 0,
+        'cached_tokens': (getattr(details, 'cached_tokens', None) or 0) if details else 0,
+    }
+
+def estimate_tokens(messages):
+    """Rough prompt size (about four characters per token plus per-message overhead)."""
+    if isinstance(messages, str):
+        return len(messages) // 4 + 4
+    return sum(len(str(message.get('content', ''))) // 4 + 4 for message in messages)
+
+def request_cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    """Estimated USD cost of one call (0 for models without a known price)."""
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * input_price + cached_tokens * input_price * CACHED_INPUT_RATE
+            + completion_tokens * output_price) / 1e6
+
+class UsageTotals:
+    __slots__ = ('calls', 'errors', 'prompt_tokens', 'completion_tokens', 'cached_tokens', 'cost', 'latency')
+
+    def __init__(self, calls=0, errors=0, prompt_tokens=0, completion_tokens=0, cached_tokens=0, cost=0.0, latency=0.0):
+        self.calls = calls
+        self.errors = errors
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.cached_tokens = cached_tokens
+        self.cost = cost
+        self.latency = latency
+
+    @property
+    def tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, success, prompt_tokens, completion_tokens, cached_tokens, cost, latency):
+        self.calls += 1
+        self.errors += 0 if success else 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_tokens += cached_tokens
+        self.cost += cost
+        self.latency += latency
+
+    def to_dict(self):
+        result = {name: getattr(self, name) for name in self.__slots__}
+        result['cost'] = round(self.cost, 6)
+        result['latency'] = round(self.latency, 3)
+        result['mean_latency'] = round(self.latency / self.calls, 3) if self.calls else None
+        return result
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data.get(name, 0) for name in cls.__slots__})
+
+class Reservation:
+    """Tokens and cost held against a session for a request that hasn't been accounted yet."""
+    __slots__ = ('session', 'tokens', 'cost', 'settled')
+
+    def __init__(self, session, tokens, cost):
+        self.session = session
+        self.tokens = tokens
+        self.cost = cost
+        self.settled = False
+
+class UsageLedger:
+    """
+    LLM usage aggregated per model and per chat session.
+
+    Every call adds to a fixed set of counters for its model and session, so
+    memory grows with the number of models and (capped) sessions, not with
+    traffic. Latency is also bucketed by prompt size (powers of two of 1k
+    tokens) to show how it scales with context length. The ledger is
+    written to `path` every `flush_interval` seconds and reloaded on start.
+    Requests that are queued but not yet accounted hold a Reservation
+    against their session until their first call is recorded.
+
+    Args:
+        path (str): JSON file for persistence, or None to keep usage in memory only
+        flush_interval (float): Seconds between writes when there is new usage
+        max_sessions (int): Sessions kept; the least recently active are dropped
+    """
+
+    def __init__(self, path=None, flush_interval=60.0, max_sessions=1000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_sessions = max_sessions
+        self.models = {}
+        self.sessions = OrderedDict()
+        self.context_latency = {}  # model -> {bucket: [calls, latency]}
+        self.reserved = {}  # session -> [reservations, tokens, cost]
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread = None
+        if path and os.path.exists(path):
+            self.load()
+
+    @classmethod
+    def from_env(cls):
+        """Build a ledger from LLM_USAGE_* environment variables."""
+        return cls(
+            path=os.getenv('LLM_USAGE_PATH', os.path.join('usage', 'llm_usage.json')) or None,
+            flush_interval=float(os.getenv('LLM_USAGE_FLUSH_SECONDS', '60')),
+            max_sessions=int(os.getenv('LLM_USAGE_MAX_SESSIONS', '1000')),
+        )
+
+    @staticmethod
+    def context_bucket(prompt_tokens):
+        """Upper bound (in tokens) of the prompt-size bucket: 1024, 2048, 4096, ..."""
+        return 1024 * 2 ** max(0, math.ceil(math.log2(max(prompt_tokens, 1) / 1024)))
+
+    def reserve(self, session, tokens, cost):
+        """
+        Hold an estimated amount against a session until it is settled.
+
+        Returns:
+            Reservation: Pass to record() or release()
+        """
+        reservation = Reservation(session, tokens, cost)
+        with self._lock:
+            held = self.reserved.setdefault(session, [0, 0, 0.0])
+            held[0] += 1
+            held[1] += tokens
+            held[2] += cost
+        return reservation
+
+    def release(self, reservation):
+        """Drop a reservation without recording usage (a no-op once it is settled)."""
+        with self._lock:
+            self._settle(reservation)
+
+    def _settle(self, reservation):
+        # Caller holds the lock
+        if reservation is None or reservation.settled:
+            return
+        reservation.settled = True
+        held = self.reserved.get(reservation.session)
+        if held is None:
+            return
+        held[0] -= 1
+        held[1] -= reservation.tokens
+        held[2] -= reservation.cost
+        if held[0] <= 0:
+            del self.reserved[reservation.session]
+
+    def committed(self, session):
+        """(tokens, cost) a session has used plus what its outstanding reservations hold."""
+        with self._lock:
+            totals = self.sessions.get(session)
+            _, tokens, cost = self.reserved.get(session, (0, 0, 0.0))
+            if totals is not None:
+                tokens += totals.tokens
+                cost += totals.cost
+            return tokens, cost
+
+    def record(self, model, session, usage, latency, success=True, reservation=None):
+        """
+        Add one provider call.
+
+        Args:
+            model (str): Model that served the call
+            session (str): Chat session ID, or None
+            usage (dict): From usage_from_response(), or None if the provider reported none
+            latency (float): Seconds the call took
+            success (bool): Whether the call succeeded
+            reservation (Reservation): Settled in the same step, so the session is never counted twice
+        """
+        usage = usage or {}
+        prompt = usage.get('prompt_tokens', 0)
+        completion = usage.get('completion_tokens', 0)
+        cached = usage.get('cached_tokens', 0)
+        cost = request_cost(model, prompt, completion, cached)
+        with self._lock:
+            self._settle(reservation)
+            self.models.setdefault(model, UsageTotals()).add(success, prompt, completion, cached, cost, latency)
+            if session:
+                totals = self.sessions.pop(session, None) or UsageTotals()
+                totals.add(success, prompt, completion, cached, cost, latency)
+                self.sessions[session] = totals
+                while len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+            if usage:
+                bucket = self.context_latency.setdefault(model, {}).setdefault(self.context_bucket(prompt), [0, 0.0])
+                bucket[0] += 1
+                bucket[1] += latency
+            self._dirty = True
+
+        LLM_TOKENS.labels(model, 'prompt').inc(prompt)
+        LLM_TOKENS.labels(model, 'completion').inc(completion)
+        LLM_TOKENS.labels(model, 'cached').inc(cached)
+        LLM_COST.labels(model).inc(cost)
+
+    def session(self, session):
+        """Totals for one session (zeros if it has no usage)."""
+        with self._lock:
+            totals = self.sessions.get(session)
+            return UsageTotals.from_dict(totals.to_dict()) if totals else UsageTotals()
+
+    def snapshot(self, sessions=True):
+        with self._lock:
+            result = {
+                'models': {model: totals.to_dict() for model, totals in self.models.items()},
+                'context_latency': {
+                    model: {str(bucket): {'calls': calls, 'mean_latency': round(total / calls, 3)}
+                            for bucket, (calls, total) in sorted(buckets.items())}
+                    for model, buckets in self.context_latency.items()
+                }
+            }
+            if sessions:
+                result['sessions'] = {session: totals.to_dict() for session, totals in self.sessions.items()}
+            return result
+
+    def load(self):
+        """
+        Replace the ledger with the contents of `path`.
+
+        An unreadable or corrupt file leaves the ledger empty rather than
+        stopping the app; it is overwritten by the next flush.
+
+        Returns:
+            bool: Whether the file was loaded
+        """
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+            if not isinstance(data, dict):
+                raise ValueError("usage file must contain a JSON object")
+            models = {model: UsageTotals.from_dict(totals) for model, totals in data.get('models', {}).items()}
+            sessions = OrderedDict(
+                (session, UsageTotals.from_dict(totals)) for session, totals in data.get('sessions', {}).items()
+            )
+            context_latency = {
+                model: {int(bucket): list(value) for bucket, value in buckets.items()}
+                for model, buckets in data.get('context_latency', {}).items()
+            }
+        except (OSError, ValueError, TypeError, AttributeError):
+            models, sessions, context_latency = {}, OrderedDict(), {}
+            loaded = False
+        else:
+            loaded = True
+        with self._lock:
+            self.models = models
+            self.sessions = sessions
+            self.context_latency = context_latency
+        return loaded
+
+    def flush(self):
+        """Write the ledger to disk if anything changed since the last write."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                'models': {model: totals.to_dict() for model, totals in self.models.items()},
+                'sessions': {session: totals.to_dict() for session, totals in self.sessions.items()},
+                'context_latency': {model: {str(bucket): value for bucket, value in buckets.items()}
+                                    for model, buckets in self.context_latency.items()},
+            }
+            self._dirty = False
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w') as file:
+            json.dump(data, file)
+        os.replace(temporary, self.path)
+
+    def start(self):
+        """Flush periodically on a daemon thread (idempotent)."""
+        if self.path and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="UsageLedger", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+class BudgetPolicy:
+    """
+    Per-session token and cost budgets, applied before a request is sent.
+
+    Once a session has used `downgrade_at` of either budget (or the next
+    request would not fit in what is left), the request moves to the
+    cheaper/faster model in DOWNGRADES. The oldest non-system messages are
+    trimmed when the prompt would exceed `max_context_tokens` or the
+    session's remaining tokens. A session with nothing left is refused.
+    Requests still in flight count against the budget through the
+    reservation each plan() takes, so a burst of queued requests can't all
+    pass the same check.
+
+    Args:
+        ledger (UsageLedger): Source of per-session usage
+        session_tokens (int): Token budget per session, or None for no limit
+        session_cost (float): USD budget per session, or None for no limit
+        downgrade_at (float): Fraction of a budget after which requests are downgraded
+        max_context_tokens (int): Prompt size limit for every request, or None
+    """
+
+    def __init__(self, ledger, session_tokens=None, session_cost=None, downgrade_at=0.8, max_context_tokens=None):
+        self.ledger = ledger
+        self.session_tokens = session_tokens
+        self.session_cost = session_cost
+        self.downgrade_at = downgrade_at
+        self.max_context_tokens = max_context_tokens
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, ledger):
+        """Build a policy from LLM_SESSION_* / LLM_MAX_CONTEXT_TOKENS environment variables."""
+        tokens = os.getenv('LLM_SESSION_TOKEN_BUDGET')
+        cost = os.getenv('LLM_SESSION_COST_BUDGET')
+        context = os.getenv('LLM_MAX_CONTEXT_TOKENS')
+        return cls(
+            ledger,
+            session_tokens=int(tokens) if tokens else None,
+            session_cost=float(cost) if cost else None,
+            downgrade_at=float(os.getenv('LLM_BUDGET_DOWNGRADE_AT', '0.8')),
+            max_context_tokens=int(context) if context else None,
+        )
+
+    def plan(self, session, model, messages):
+        """
+        Adjust a request to fit the session's budget.
+
+        Args:
+            session (str): Chat session ID
+            model (str): Requested model
+            messages (list): Chat messages
+
+        Returns:
+            tuple: (model, messages, adjustments, reservation) where adjustments lists what
+            was changed and reservation (or None without a budget) is held until the request
+            is recorded or released
+
+        Raises:
+            BudgetExceeded: If the session has no budget left
+        """
+        # Checking and reserving in one step keeps concurrent requests from passing together
+        with self._lock:
+            return self._plan(session, model, messages)
+
+    def _plan(self, session, model, messages):
+        spent_tokens, spent_cost = self.ledger.committed(session)
+        used = 0.0
+        if self.session_tokens:
+            used = max(used, spent_tokens / self.session_tokens)
+        if self.session_cost:
+            used = max(used, spent_cost / self.session_cost)
+        if used >= 1:
+            LLM_BUDGET_ACTIONS.labels('rejected').inc()
+            raise BudgetExceeded(f"Session budget used up ({used:.0%})")
+
+        adjustments = []
+        estimate = estimate_tokens(messages)
+        over_cost = (self.session_cost is not None
+                     and spent_cost + request_cost(model, estimate, COMPLETION_RESERVE) > self.session_cost)
+        if (used >= self.downgrade_at or over_cost) and model in DOWNGRADES:
+            adjustments.append(f"downgraded {model} -> {DOWNGRADES[model]}")
+            model = DOWNGRADES[model]
+            LLM_BUDGET_ACTIONS.labels('downgraded').inc()
+
+        limit = self.max_context_tokens
+        if self.session_tokens:
+            remaining = self.session_tokens - spent_tokens - COMPLETION_RESERVE
+            limit = remaining if limit is None else min(limit, remaining)
+        if limit is not None and estimate > limit and isinstance(messages, list):
+            messages, dropped = self.trim(messages, limit)
+            if dropped:
+                adjustments.append(f"trimmed {dropped} earlier messages")
+                LLM_BUDGET_ACTIONS.labels('trimmed').inc()
+                estimate = estimate_tokens(messages)
+
+        reservation = None
+        if self.session_tokens or self.session_cost:
+            reservation = self.ledger.reserve(session, estimate + COMPLETION_RESERVE,
+                                              request_cost(model, estimate, COMPLETION_RESERVE))
+        return model, messages, adjustments, reservation
+
+    @staticmethod
+    def trim(messages, limit):
+        """Drop the oldest non-system messages (never the last one) until the prompt fits in `limit` tokens."""
+        kept = list(messages)
+        dropped = 0
+        size = estimate_tokens(kept)
+        index = 0
+        while size > limit and index < len(kept) - 1:
+            if kept[index].get('role') == 'system':
+                index += 1
+                continue
+            size -= estimate_tokens([kept.pop(index)])
+            dropped += 1
+        return kept, dropped
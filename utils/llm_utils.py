@@ -1,31 +1,111 @@
-from openai import OpenAI
 from dotenv import load_dotenv
-from rich.markdown import Markdown
-from rich.console import Console
-from anthropic import Anthropic
 import base64
 import httpx
 import os
+import threading
+import time
+
+from utils.llm_usage import usage_from_response
+from utils.metrics import Counter, Histogram
 
 # Load environment variables
 load_dotenv()
 
-# Initialize clients and console
-openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-perplexity_client = OpenAI(
-    api_key=os.getenv('PERPLEXITY_API_KEY'), 
-    base_url="https://api.perplexity.ai"
+# Provider clients are created on first use; importing the SDKs alone takes
+# over a second, which would otherwise be paid by every process at startup
+_clients = {}
+_clients_lock = threading.Lock()
+
+PROVIDER_KEYS = {
+    'openai': 'OPENAI_API_KEY',
+    'anthropic': 'ANTHROPIC_API_KEY',
+    'perplexity': 'PERPLEXITY_API_KEY',
+}
+
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+LLM_REQUESTS = Counter('suits_llm_requests_total', 'LLM completions by model and outcome', ['model', 'outcome'])
+LLM_LATENCY = Histogram('suits_llm_request_seconds', 'Total LLM completion time by model', ['model'], buckets=LLM_BUCKETS)
+LLM_FIRST_TOKEN = Histogram(
+    'suits_llm_time_to_first_token_seconds',
+    'Time until the first token is available (equals total time for non-streaming calls)',
+    ['model'],
+    buckets=LLM_BUCKETS
 )
-claude_client = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
-console = Console()
 
-def get_openai_completion(messages, model="gpt-4o"):
+# Token usage of the last completion made on each thread (see last_usage())
+_usage = threading.local()
+
+def last_usage():
+    """
+    Token usage reported by the provider for this thread's last get_llm_completion call.
+
+    Returns:
+        dict: prompt_tokens, completion_tokens and cached_tokens, or None if not reported
+            (e.g. streamed responses, or the call failed)
+    """
+    return getattr(_usage, 'value', None)
+
+def _create_client(provider):
+    if provider == 'anthropic':
+        from anthropic import Anthropic
+        return Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+    from openai import OpenAI
+    if provider == 'perplexity':
+        return OpenAI(
+            api_key=os.getenv('PERPLEXITY_API_KEY'),
+            base_url=os.getenv('PERPLEXITY_BASE_URL', "https://api.perplexity.ai")
+        )
+    return OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+
+def get_client(provider):
+    """
+    SDK client for a provider, created on first use.
+
+    Args:
+        provider (str): 'openai', 'anthropic' or 'perplexity'
+
+    Returns:
+        The provider's SDK client (shared by all threads)
+    """
+    client = _clients.get(provider)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(provider)
+            if client is None:
+                client = _clients[provider] = _create_client(provider)
+    return client
+
+def _client(provider, raise_errors, timeout):
+    """Shared client with per-call options: no SDK retries for callers that retry themselves, and a request timeout."""
+    client = get_client(provider)
+    options = {}
+    if raise_errors:
+        options['max_retries'] = 0
+    if timeout is not None:
+        options['timeout'] = timeout
+    return client.with_options(**options) if options else client
+
+def _timed_stream(stream, model, started):
+    """Wrap a streaming response so first-token and total times are recorded as it is consumed."""
+    first = True
+    try:
+        for chunk in stream:
+            if first:
+                LLM_FIRST_TOKEN.labels(model).observe(time.perf_counter() - started)
+                first = False
+            yield chunk
+    finally:
+        LLM_LATENCY.labels(model).observe(time.perf_counter() - started)
+
+def get_openai_completion(messages, model="gpt-4o", raise_errors=False, timeout=None):
     """
     Get completion from OpenAI models.
     
     Args:
         messages (list or str): List of message dictionaries or a single string query
         model (str): OpenAI model identifier
+        raise_errors (bool): Re-raise provider exceptions instead of returning them
+        timeout (float): Seconds before the request is abandoned (SDK default if None)
         
     Returns:
         tuple: (updated_messages, success, response/error_message)
@@ -37,10 +117,13 @@ def get_openai_completion(messages, model="gpt-4o"):
         if model != "gpt-4o":
             messages = [msg for msg in messages if msg["role"] != "system"]
 
-        response = openai_client.chat.completions.create(
+        # Callers that handle their own retries (the dispatcher) disable the SDK's built-in retries
+        client = _client('openai', raise_errors, timeout)
+        response = client.chat.completions.create(
             model=model,
             messages=messages
         )
+        _usage.value = usage_from_response(response)
         
         ai_response = response.choices[0].message.content
         messages.append({"role": "assistant", "content": ai_response})
@@ -48,9 +131,11 @@ def get_openai_completion(messages, model="gpt-4o"):
         return messages, True, ai_response
         
     except Exception as e:
+        if raise_errors:
+            raise
         return messages, False, str(e)
 
-def get_perplexity_completion(messages, model="sonar-pro", stream=False):
+def get_perplexity_completion(messages, model="sonar-pro", stream=False, raise_errors=False, timeout=None):
     """
     Get completion from Perplexity models.
     
@@ -58,6 +143,8 @@ def get_perplexity_completion(messages, model="sonar-pro", stream=False):
         messages (list or str): List of message dictionaries or a single string query
         model (str): Perplexity model name
         stream (bool): Whether to stream the response
+        raise_errors (bool): Re-raise provider exceptions instead of returning them
+        timeout (float): Seconds before the request is abandoned (SDK default if None)
         
     Returns:
         tuple: (updated_messages, success, response/error_message)
@@ -76,23 +163,29 @@ def get_perplexity_completion(messages, model="sonar-pro", stream=False):
     }
 
     try:
-        response = perplexity_client.chat.completions.create(**params)
+        client = _client('perplexity', raise_errors, timeout)
+        response = client.chat.completions.create(**params)
         if stream:
             return messages, True, response
+        _usage.value = usage_from_response(response)
         
         ai_response = response.choices[0].message.content
         messages.append({"role": "assistant", "content": ai_response})
         return messages, True, ai_response
     except Exception as e:
+        if raise_errors:
+            raise
         return messages, False, str(e)
 
-def get_claude_completion(messages, model="claude-3-sonnet-20240229"):
+def get_claude_completion(messages, model="claude-3-sonnet-20240229", raise_errors=False, timeout=None):
     """
     Get completion from Claude models.
     
     Args:
         messages (list or str): List of message dictionaries or a single string query
         model (str): Claude model identifier
+        raise_errors (bool): Re-raise provider exceptions instead of returning them
+        timeout (float): Seconds before the request is abandoned (SDK default if None)
         
     Returns:
         tuple: (updated_messages, success, response/error_message)
@@ -101,11 +194,13 @@ def get_claude_completion(messages, model="claude-3-sonnet-20240229"):
         messages = [{"role": "user", "content": messages}]
     
     try:
-        response = claude_client.messages.create(
+        client = _client('anthropic', raise_errors, timeout)
+        response = client.messages.create(
             model=model,
             max_tokens=1024,
             messages=[msg for msg in messages if msg["role"] != "system"]
         )
+        _usage.value = usage_from_response(response)
         
         ai_response = response.content[0].text
         messages.append({"role": "assistant", "content": ai_response})
@@ -113,9 +208,11 @@ def get_claude_completion(messages, model="claude-3-sonnet-20240229"):
         return messages, True, ai_response
         
     except Exception as e:
+        if raise_errors:
+            raise
         return messages, False, str(e)
 
-def get_llm_completion(query, model="gpt-4o", stream=False):
+def get_llm_completion(query, model="gpt-4o", stream=False, raise_errors=False, timeout=None):
     """
     Unified interface for getting completions from OpenAI, Perplexity, or Claude models.
     
@@ -123,24 +220,40 @@ def get_llm_completion(query, model="gpt-4o", stream=False):
         query (str or list): User query or message list
         model (str): Model identifier (e.g., "gpt-4o", "sonar-pro", "claude-3-sonnet")
         stream (bool): Whether to stream the response (Perplexity only)
+        raise_errors (bool): Re-raise provider exceptions (so callers can inspect status codes)
+        timeout (float): Seconds before the provider request is abandoned (SDK default if None)
         
     Returns:
         tuple: (success, response/error_message)
     """
-    # Claude models
-    if model.startswith("claude"):
-        messages, success, response = get_claude_completion(query, model)
-        return success, response
-    
-    # Perplexity models
-    elif model.startswith("sonar"):
-        messages, success, response = get_perplexity_completion(query, model, stream)
-        return success, response
-    
-    # OpenAI models
-    else:
-        messages, success, response = get_openai_completion(query, model)
-        return success, response
+    started = time.perf_counter()
+    _usage.value = None
+
+    try:
+        # Claude models
+        if model.startswith("claude"):
+            messages, success, response = get_claude_completion(query, model, raise_errors, timeout)
+
+        # Perplexity models
+        elif model.startswith("sonar"):
+            messages, success, response = get_perplexity_completion(query, model, stream, raise_errors, timeout)
+
+        # OpenAI models
+        else:
+            messages, success, response = get_openai_completion(query, model, raise_errors, timeout)
+    except Exception:
+        LLM_REQUESTS.labels(model, 'error').inc()
+        LLM_LATENCY.labels(model).observe(time.perf_counter() - started)
+        raise
+
+    LLM_REQUESTS.labels(model, 'success' if success else 'error').inc()
+    if success and not isinstance(response, str):
+        return success, _timed_stream(response, model, started)
+    elapsed = time.perf_counter() - started
+    LLM_LATENCY.labels(model).observe(elapsed)
+    if success:
+        LLM_FIRST_TOKEN.labels(model).observe(elapsed)
+    return success, response
 
 def process_image_claude(image_url, message_text="Describe this image."): 
     """
@@ -164,7 +277,7 @@ def process_image_claude(image_url, message_text="Describe this image."):
         # Encode image data
         image_data = base64.standard_b64encode(image_response.content).decode("utf-8")
 
-        response = claude_client.messages.create(
+        response = get_client('anthropic').messages.create(
             model="claude-3-sonnet-20240229",
             max_tokens=1024,
             messages=[
@@ -203,7 +316,7 @@ def process_image_openai(image_url, message_text="What's in this image?"):
         tuple: (success, response/error_message)
     """
     try:
-        response = openai_client.chat.completions.create(
+        response = get_client('openai').chat.completions.create(
             model="gpt-4o",
             messages=[
                 {
@@ -247,6 +360,10 @@ def process_image(image_url, message_text=None, model="gpt-4o"):
 
 def interactive_chat():
     """Interactive chat interface supporting OpenAI, Perplexity, and Claude models."""
+    from rich.console import Console
+    from rich.markdown import Markdown
+
+    console = Console()
     models = {
         "1": "gpt-4o",
         "2": "o1-preview",
@@ -0,0 +1,287 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+from utils.telemetry import METERS_PER_DEGREE
+
+class PositionKalmanFilter:
+    """
+    Constant-velocity Kalman filter over local east/north coordinates.
+
+    State is [east, north, v_east, v_north] in metres and m/s relative to the
+    first fix. Position fixes and speed/heading readings are fused as separate
+    measurements, so each update is a fixed number of 4x4/2x2 operations.
+
+    Args:
+        position_std (float): Standard deviation of a position fix in metres
+        velocity_std (float): Standard deviation of a speed/heading derived velocity in m/s
+        acceleration_std (float): Process noise, how hard the EV can change velocity (m/s^2)
+        gate (float): Reject fixes whose squared innovation distance exceeds this (chi-square, 2 dof)
+        inflation (float): Factor the covariance grows by on each rejected fix, widening the gate
+        max_rejections (int): Consecutive rejected fixes after which the track restarts at the
+            latest fix (a genuine jump, such as a replay seek or a re-acquired fix)
+    """
+
+    def __init__(self, position_std=8.0, velocity_std=0.3, acceleration_std=0.5, gate=25.0,
+                 inflation=1.5, max_rejections=5):
+        self.position_var = position_std ** 2
+        self.velocity_var = velocity_std ** 2
+        self.acceleration_var = acceleration_std ** 2
+        self.gate = gate
+        self.inflation = inflation
+        self.max_rejections = max_rejections
+        self.origin = None
+        self.timestamp = None
+        self.x = np.zeros(4)
+        self.P = np.eye(4)
+        self.rejected = 0
+        self.consecutive_rejections = 0
+        self.resets = 0
+        self._H_pos = np.array([[1.0, 0, 0, 0], [0, 1.0, 0, 0]])
+        self._H_vel = np.array([[0, 0, 1.0, 0], [0, 0, 0, 1.0]])
+
+    def _to_local(self, lat, lng):
+        lat0, lng0 = self.origin
+        return np.array([
+            (lng - lng0) * METERS_PER_DEGREE * math.cos(math.radians(lat0)),
+            (lat - lat0) * METERS_PER_DEGREE,
+        ])
+
+    def _to_geodetic(self, east, north):
+        lat0, lng0 = self.origin
+        return lat0 + north / METERS_PER_DEGREE, lng0 + east / (METERS_PER_DEGREE * math.cos(math.radians(lat0)))
+
+    def _predict(self, dt):
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+        # Discrete white-noise acceleration model
+        q = self.acceleration_var
+        dt2, dt3, dt4 = dt * dt, dt ** 3, dt ** 4
+        Q = np.array([
+            [dt4 / 4, 0, dt3 / 2, 0],
+            [0, dt4 / 4, 0, dt3 / 2],
+            [dt3 / 2, 0, dt2, 0],
+            [0, dt3 / 2, 0, dt2],
+        ]) * q
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + Q
+
+    def _restart(self, position):
+        self.x = np.concatenate((position, [0.0, 0.0]))
+        self.P = np.diag([self.position_var, self.position_var, 1.0, 1.0])
+        self.consecutive_rejections = 0
+
+    def _correct(self, z, H, variance, gated):
+        innovation = z - H @ self.x
+        S = H @ self.P @ H.T + np.eye(2) * variance
+        S_inv = np.linalg.inv(S)
+        if gated and innovation @ S_inv @ innovation > self.gate:
+            self.rejected += 1
+            self.consecutive_rejections += 1
+            if self.consecutive_rejections >= self.max_rejections:
+                # Persistently rejected: the EV really is somewhere else
+                self.resets += 1
+                self._restart(z)
+                return True
+            self.P = self.P * self.inflation
+            return False
+        if gated:
+            self.consecutive_rejections = 0
+        K = self.P @ H.T @ S_inv
+        self.x = self.x + K @ innovation
+        self.P = (np.eye(4) - K @ H) @ self.P
+        return True
+
+    def update(self, lat, lng, speed=None, heading=None, timestamp=None):
+        """
+        Fuse one reading and return the filtered estimate.
+
+        Args:
+            lat (float): Measured latitude
+            lng (float): Measured longitude
+            speed (float): Measured ground speed in m/s, if available
+            heading (float): Measured heading in degrees from north, if available
+            timestamp (float): Reading time in seconds (defaults to time.monotonic())
+
+        Returns:
+            dict: latitude, longitude, speed, heading and accuracy (1-sigma metres)
+        """
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        if self.origin is None:
+            self.origin = (lat, lng)
+            self._restart(np.zeros(2))
+        elif timestamp < self.timestamp:
+            # Clock went backwards (e.g. a replay looped): restart the track in place
+            self._restart(self._to_local(lat, lng))
+        else:
+            dt = timestamp - self.timestamp
+            if dt > 0:
+                self._predict(dt)
+            self._correct(self._to_local(lat, lng), self._H_pos, self.position_var, gated=True)
+        self.timestamp = timestamp
+
+        if speed is not None and heading is not None:
+            rad = math.radians(heading)
+            velocity = np.array([speed * math.sin(rad), speed * math.cos(rad)])
+            self._correct(velocity, self._H_vel, self.velocity_var, gated=False)
+        return self.estimate()
+
+    def estimate(self):
+        """Current filtered position, velocity and 1-sigma position accuracy."""
+        if self.origin is None:
+            return None
+        lat, lng = self._to_geodetic(self.x[0], self.x[1])
+        v_east, v_north = self.x[2], self.x[3]
+        return {
+            'latitude': lat,
+            'longitude': lng,
+            'speed': math.hypot(v_east, v_north),
+            'heading': math.degrees(math.atan2(v_east, v_north)) % 360,
+            'accuracy': math.sqrt(max(self.P[0, 0], self.P[1, 1])),
+        }
+
+def _point_segment_distance(p, a, b):
+    """Distance in metres from p to segment ab; points are (east, north)."""
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    length2 = dx * dx + dy * dy
+    if length2 == 0:
+        return math.hypot(p[0] - a[0], p[1] - a[1])
+    t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / length2))
+    return math.hypot(p[0] - a[0] - t * dx, p[1] - a[1] - t * dy)
+
+def douglas_peucker(points, tolerance):
+    """
+    Simplify a polyline with the Douglas-Peucker algorithm (iterative, no recursion limit).
+
+    Args:
+        points (list): [(east, north, ...), ...] in metres; extra fields are carried through
+        tolerance (float): Maximum allowed deviation in metres
+
+    Returns:
+        list: The retained points
+    """
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        worst, worst_index = 0.0, None
+        for index in range(start + 1, end):
+            distance = _point_segment_distance(points[index], points[start], points[end])
+            if distance > worst:
+                worst, worst_index = distance, index
+        if worst_index is not None and worst > tolerance:
+            keep[worst_index] = True
+            stack.append((start, worst_index))
+            stack.append((worst_index, end))
+    return [point for point, kept in zip(points, keep) if kept]
+
+class BreadcrumbTrail:
+    """
+    Online-compressed track of filtered positions.
+
+    Uses the opening-window form of Douglas-Peucker: points since the last
+    kept breadcrumb are buffered, and when the straight line to the newest
+    point would stray more than `tolerance` metres from any of them, the
+    previous point is committed. The window is capped at `max_window`
+    points, which bounds the work per sample.
+
+    Args:
+        tolerance (float): Maximum deviation of the stored path in metres
+        max_window (int): Maximum buffered points before one is committed regardless
+    """
+
+    def __init__(self, tolerance=2.0, max_window=64):
+        self.tolerance = tolerance
+        self.max_window = max_window
+        self.points = []   # committed (east, north, timestamp)
+        self._window = []  # buffered points after the last committed one
+        self.received = 0
+
+    def add(self, east, north, timestamp):
+        point = (east, north, timestamp)
+        self.received += 1
+        if not self.points:
+            self.points.append(point)
+            return
+        anchor = self.points[-1]
+        if self._window and (
+            len(self._window) >= self.max_window
+            or any(_point_segment_distance(p, anchor, point) > self.tolerance for p in self._window)
+        ):
+            self.points.append(self._window[-1])
+            self._window = []
+        self._window.append(point)
+
+    def path(self):
+        """Committed breadcrumbs plus the newest point."""
+        return self.points + self._window[-1:]
+
+class PositionTracker:
+    """
+    Filters incoming EV positions and keeps the compressed breadcrumb trail.
+
+    Subscribe an instance to a TelemetryState; each new location snapshot is
+    filtered once, however many clients are polling.
+    """
+
+    def __init__(self, kalman=None, trail=None):
+        self.kalman = kalman or PositionKalmanFilter()
+        self.trail = trail or BreadcrumbTrail()
+        self._lock = threading.Lock()
+        self._last_location = None
+        self._estimate = None
+
+    def __call__(self, snapshot):
+        location = snapshot.get('location')
+        if location is None or location is self._last_location:
+            return
+        self.update(location, snapshot.get('mission_time'))
+
+    def update(self, location, timestamp=None):
+        """
+        Filter one raw location reading.
+
+        Args:
+            location (dict): Reading with 'latitude', 'longitude' and optionally 'speed' and 'heading'
+            timestamp (float): Reading time in seconds
+
+        Returns:
+            dict: Filtered estimate (see PositionKalmanFilter.estimate)
+        """
+        with self._lock:
+            self._last_location = location
+            estimate = self.kalman.update(
+                location['latitude'], location['longitude'],
+                location.get('speed'), location.get('heading'), timestamp
+            )
+            east, north = self.kalman.x[0], self.kalman.x[1]
+            self.trail.add(float(east), float(north), self.kalman.timestamp)
+            self._estimate = estimate
+            return estimate
+
+    def estimate(self):
+        return self._estimate
+
+    def track(self, tolerance=None):
+        """
+        Breadcrumb trail as [{'lat', 'lng'}], optionally simplified further for transmission.
+
+        Args:
+            tolerance (float): Extra Douglas-Peucker tolerance in metres, or None for the stored trail
+        """
+        with self._lock:
+            if self.kalman.origin is None:
+                return []
+            points = self.trail.path()
+            if tolerance:
+                points = douglas_peucker(points, tolerance)
+            result = []
+            for east, north, _ in points:
+                lat, lng = self.kalman._to_geodetic(east, north)
+                result.append({'lat': round(lat, 7), 'lng': round(lng, 7)})
+            return result
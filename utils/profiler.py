@@ -0,0 +1,193 @@
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+from flask import abort, g, jsonify, request, send_from_directory
+
+PROFILE_FORMATS = ('collapsed', 'speedscope')
+
+class SamplingProfiler:
+    """
+    Periodically sample one thread's Python stack from a background thread.
+
+    The profiled thread runs unmodified (no sys.setprofile hooks), so the
+    overhead is one sys._current_frames() call per interval.
+
+    Args:
+        thread_id (int): Identifier of the thread to sample
+        interval (float): Seconds between samples
+    """
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and return {stack tuple: sample count}."""
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = tuple(reversed(stack))
+            self.samples[key] = self.samples.get(key, 0) + 1
+
+def write_collapsed(samples, path):
+    """Write samples in Brendan Gregg's collapsed-stack format (one 'a;b;c count' per line)."""
+    with open(path, 'w') as file:
+        for stack, count in samples.items():
+            file.write(f"{';'.join(frame.replace(';', ':') for frame in stack)} {count}\n")
+
+def write_speedscope(samples, path, name, interval):
+    """Write samples as a speedscope 'sampled' profile."""
+    frames, frame_index, stacks, weights = [], {}, [], []
+    for stack, count in samples.items():
+        indexes = []
+        for frame in stack:
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                frames.append({'name': frame})
+            indexes.append(frame_index[frame])
+        stacks.append(indexes)
+        weights.append(count * interval)
+    document = {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': stacks,
+            'weights': weights,
+        }],
+        'name': name,
+        'exporter': 'suits-profiler',
+    }
+    with open(path, 'w') as file:
+        json.dump(document, file)
+
+class RequestProfiler:
+    """
+    Opt-in per-request sampling profiler for a Flask app.
+
+    Requests are profiled when they carry the admin secret in the
+    X-Profile header or `profile` query parameter, or at random for
+    `sample_percent` percent of requests. Nothing is registered on the app
+    unless a secret is configured, so a disabled profiler costs nothing.
+
+    Args:
+        secret (str): Admin secret (PROFILE_SECRET); profiling is disabled when empty
+        directory (str): Where profiles are written (PROFILE_DIR)
+        sample_percent (float): Percentage of requests profiled at random (PROFILE_SAMPLE_PERCENT)
+        interval (float): Seconds between stack samples (PROFILE_INTERVAL_MS / 1000)
+        output_format (str): 'collapsed' or 'speedscope' (PROFILE_FORMAT)
+        keep (int): Number of most recent profiles to keep on disk (PROFILE_KEEP)
+    """
+
+    def __init__(self, secret=None, directory=None, sample_percent=None, interval=None, output_format=None, keep=None):
+        self.secret = secret if secret is not None else os.getenv('PROFILE_SECRET', '')
+        self.directory = directory or os.getenv('PROFILE_DIR', 'profiles')
+        self.sample_percent = sample_percent if sample_percent is not None else float(os.getenv('PROFILE_SAMPLE_PERCENT', '0'))
+        self.interval = interval if interval is not None else float(os.getenv('PROFILE_INTERVAL_MS', '1')) / 1000
+        self.output_format = output_format or os.getenv('PROFILE_FORMAT', 'collapsed')
+        self.keep = keep if keep is not None else int(os.getenv('PROFILE_KEEP', '50'))
+        if self.output_format not in PROFILE_FORMATS:
+            raise ValueError(f"PROFILE_FORMAT must be one of {PROFILE_FORMATS}")
+
+    @property
+    def enabled(self):
+        return bool(self.secret)
+
+    def init_app(self, app):
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._start)
+        app.teardown_request(self._finish)
+        app.add_url_rule('/admin/profiles', 'list_profiles', self.list_profiles)
+        app.add_url_rule('/admin/profiles/<path:name>', 'download_profile', self.download_profile)
+
+    def _requested(self):
+        flag = request.headers.get('X-Profile') or request.args.get('profile')
+        if flag is not None:
+            return self._matches(flag)
+        return self.sample_percent > 0 and random.random() * 100 < self.sample_percent
+
+    def _start(self):
+        if request.path.startswith('/admin/profiles') or not self._requested():
+            return
+        g.profiler = SamplingProfiler(threading.get_ident(), self.interval).start()
+
+    def _finish(self, exc=None):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return
+        samples = profiler.stop()
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'index'
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        name = f"{stamp}-{request.method.lower()}-{slug}-{profiler.elapsed * 1000:.0f}ms"
+        if self.output_format == 'speedscope':
+            write_speedscope(samples, os.path.join(self.directory, f"{name}.speedscope.json"), name, self.interval)
+        else:
+            write_collapsed(samples, os.path.join(self.directory, f"{name}.collapsed"))
+        self._prune()
+
+    def _profiles(self):
+        entries = [entry for entry in os.scandir(self.directory) if entry.is_file()]
+        return sorted(entries, key=lambda entry: entry.stat().st_mtime, reverse=True)
+
+    def _prune(self):
+        for entry in self._profiles()[self.keep:]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _matches(self, supplied):
+        """Constant-time comparison against the admin secret."""
+        return bool(supplied) and hmac.compare_digest(supplied.encode('utf-8'), self.secret.encode('utf-8'))
+
+    def _authorize(self):
+        if not self._matches(request.headers.get('X-Admin-Secret') or request.args.get('secret')):
+            abort(403)
+
+    def list_profiles(self):
+        self._authorize()
+        return jsonify([
+            {
+                'name': entry.name,
+                'size': entry.stat().st_size,
+                'created': datetime.fromtimestamp(entry.stat().st_mtime).strftime("%Y-%m-%d %H:%M:%S")
+            }
+            for entry in self._profiles()
+        ])
+
+    def download_profile(self, name):
+        self._authorize()
+        return send_from_directory(os.path.abspath(self.directory), name, as_attachment=True)
@@ -0,0 +1,254 @@
+import argparse
+import time
+
+import numpy as np
+
+from utils.telemetry import METERS_PER_DEGREE, TelemetrySource, format_timestamp, row_to_snapshot
+from utils.telemetry_recorder import record_dtype, write_header, INDEX_DTYPE, INDEX_STRIDE
+
+# Traverse from base camp out to the collection sites and back again
+DEFAULT_WAYPOINTS = [
+    {'name': 'Base Camp', 'lat': 29.5584, 'lng': -95.0930},
+    {'name': 'Collection Site A', 'lat': 29.5590, 'lng': -95.0935},
+    {'name': 'Collection Site B', 'lat': 29.5580, 'lng': -95.0925},
+    {'name': 'Base Camp', 'lat': 29.5584, 'lng': -95.0930},
+]
+
+# Fault types and the peak effect each has on the timeline
+FAULT_TYPES = {
+    'co2_spike': {'co2_level': 2.5, 'heart_rate': 15},
+    'fan_failure': {'fan_speed': -2400, 'co2_level': 1.5, 'temperature': 1.2},
+    'suit_leak': {'suit_pressure': -0.6, 'o2_drain': 3.0},
+    'battery_drain': {'battery_drain': 4.0},
+    'tachycardia': {'heart_rate': 45, 'bp_systolic': 20, 'bp_diastolic': 10},
+}
+
+def _ou_process(rng, n, dt, tau, sigma, noise=None):
+    """
+    Zero-mean Ornstein-Uhlenbeck series computed in one FFT convolution.
+
+    Args:
+        rng (np.random.Generator): Random source
+        n (int): Number of samples
+        dt (float): Sample spacing in seconds
+        tau (float): Mean-reversion time constant in seconds
+        sigma (float): Stationary standard deviation
+        noise (np.ndarray): Optional standard-normal innovations (for correlated series)
+    """
+    if noise is None:
+        noise = rng.standard_normal(n)
+    phi = np.exp(-dt / tau)
+    # Truncate the AR(1) impulse response once it has decayed below 1e-6
+    kernel_len = min(n, int(np.ceil(np.log(1e-6) / np.log(phi))) + 1)
+    kernel = phi ** np.arange(kernel_len)
+    size = 1 << int(np.ceil(np.log2(n + kernel_len)))
+    series = np.fft.irfft(np.fft.rfft(noise, size) * np.fft.rfft(kernel, size), size)[:n]
+    return series * sigma * np.sqrt(1 - phi * phi)
+
+def _low_pass(series, dt, tau):
+    """First-order low-pass filter (time constant `tau` seconds), starting from the first sample."""
+    n = len(series)
+    phi = np.exp(-dt / tau)
+    kernel_len = min(n, int(np.ceil(np.log(1e-6) / np.log(phi))) + 1)
+    kernel = (1 - phi) * phi ** np.arange(kernel_len)
+    size = 1 << int(np.ceil(np.log2(n + kernel_len)))
+    filtered = np.fft.irfft(np.fft.rfft(series, size) * np.fft.rfft(kernel, size), size)[:n]
+    # Without this the output would ramp up from zero rather than start at the first sample
+    return filtered + series[0] * phi ** (np.arange(n) + 1)
+
+def _check_waypoints(waypoints):
+    """
+    Drop consecutive duplicate waypoints and check there is a path to walk.
+
+    Raises:
+        ValueError: If fewer than two distinct waypoints remain
+    """
+    path = [w for i, w in enumerate(waypoints)
+            if i == 0 or (w['lat'], w['lng']) != (waypoints[i - 1]['lat'], waypoints[i - 1]['lng'])]
+    if len(path) < 2:
+        raise ValueError("a scenario needs at least two distinct waypoints")
+    return path
+
+def _path_positions(waypoints, distance):
+    """Interpolate lat/lng and heading at each cumulative distance along the waypoint path."""
+    lat = np.array([w['lat'] for w in waypoints])
+    lng = np.array([w['lng'] for w in waypoints])
+    north = (lat - lat[0]) * METERS_PER_DEGREE
+    east = (lng - lng[0]) * METERS_PER_DEGREE * np.cos(np.radians(lat[0]))
+    legs = np.hypot(np.diff(north), np.diff(east))
+    ends = np.concatenate(([0.0], np.cumsum(legs)))
+
+    distance = np.clip(distance, 0, ends[-1])
+    leg = np.clip(np.searchsorted(ends, distance, side='right') - 1, 0, len(legs) - 1)
+    frac = np.where(legs[leg] > 0, (distance - ends[leg]) / np.where(legs[leg] > 0, legs[leg], 1), 0)
+    latitude = lat[leg] + frac * (lat[leg + 1] - lat[leg])
+    longitude = lng[leg] + frac * (lng[leg + 1] - lng[leg])
+    heading = np.degrees(np.arctan2(np.diff(east), np.diff(north)))[leg] % 360
+    return latitude, longitude, heading, ends
+
+def _fault_envelope(t, start, duration):
+    """0..1 envelope that ramps up over the first quarter of a fault, holds, and eases off as fast once it clears."""
+    ramp = max(duration / 4, 1e-9)
+    return np.clip((t - start) / ramp, 0, 1) * np.clip((start + duration + ramp - t) / ramp, 0, 1)
+
+def generate_scenario(seed=None, hours=1.0, rate=10.0, waypoints=None, faults=None,
+                      fault_rate=0.5, walking_speed=1.0, dwell=600.0, start_time=None):
+    """
+    Generate a complete, physically continuous EVA timeline in one batch.
+
+    Heart rate and CO2 follow correlated mean-reverting random walks driven by
+    a shared workload term, battery and O2 storage deplete with load, and the
+    EV walks the waypoint path with a dwell at each site. Workload follows a
+    low-passed walking speed, so physiology eases up and down around stops.
+
+    Args:
+        seed (int): Seed for reproducible timelines
+        hours (float): Length of the scenario
+        rate (float): Samples per second
+        waypoints (list): Path as [{'name', 'lat', 'lng'}, ...]
+        faults (list): Faults as [{'type', 'start', 'duration'}, ...]; None injects random ones
+        fault_rate (float): Expected random faults per hour when `faults` is None
+        walking_speed (float): Mean traverse speed in m/s
+        dwell (float): Seconds spent at each intermediate waypoint
+        start_time (float): Unix timestamp of the first sample (defaults to now)
+
+    Returns:
+        tuple: (numpy structured array in the recorder's record format, list of faults)
+
+    Raises:
+        ValueError: If the waypoints don't include two distinct positions
+    """
+    rng = np.random.default_rng(seed)
+    waypoints = _check_waypoints(waypoints or DEFAULT_WAYPOINTS)
+    n = max(1, int(hours * 3600 * rate))
+    dt = 1.0 / rate
+    t = np.arange(n) * dt
+    records = np.zeros(n, dtype=record_dtype())
+    records['mission_time'] = t
+    records['wall_time'] = (time.time() if start_time is None else start_time) + t
+
+    if faults is None:
+        count = rng.poisson(fault_rate * hours)
+        kinds = rng.choice(sorted(FAULT_TYPES), size=count)
+        starts = rng.uniform(0, max(n * dt - 300, 1), size=count)
+        durations = rng.uniform(120, 900, size=count)
+        faults = [{'type': str(k), 'start': float(s), 'duration': float(d)}
+                  for k, s, d in sorted(zip(kinds, starts, durations), key=lambda f: f[1])]
+    effects = {}
+    for fault in faults:
+        envelope = _fault_envelope(t, fault['start'], fault['duration'])
+        for key, peak in FAULT_TYPES[fault['type']].items():
+            effects[key] = effects.get(key, 0) + peak * envelope
+
+    # Movement: walk the path at a slowly varying speed, pausing `dwell` seconds
+    # at each intermediate site by repeating the sample where the site is reached
+    speed_noise = _ou_process(rng, n, dt, tau=30, sigma=0.15)
+    walk_speed = np.clip(walking_speed * (1 + speed_noise), 0.05, None)
+    walk_distance = np.cumsum(walk_speed) * dt
+    ends = _path_positions(waypoints, np.zeros(1))[3]
+    path_length = max(ends[-1], 1e-9)
+    laps = int(walk_distance[-1] // path_length) + 1
+    sites = (ends[1:-1][None, :] + path_length * np.arange(laps)[:, None]).ravel()
+    stops = np.searchsorted(walk_distance, sites)
+    repeats = np.ones(n, dtype=np.int64)
+    np.add.at(repeats, stops[stops < n], int(dwell * rate))
+    walk_index = np.repeat(np.arange(n), repeats)[:n]
+    dwelling = np.concatenate(([False], walk_index[1:] == walk_index[:-1]))
+    speed = np.where(dwelling, 0.0, walk_speed[walk_index])
+    latitude, longitude, heading, _ = _path_positions(waypoints, walk_distance[walk_index] % path_length)
+    records['latitude'] = latitude
+    records['longitude'] = longitude
+    records['heading'] = heading
+    records['speed'] = speed
+    records['altitude'] = 5 + _ou_process(rng, n, dt, tau=120, sigma=1.5)
+
+    # Physiology: a shared workload term correlates heart rate, CO2 and fan load
+    # (site work keeps some load on even while the EV is standing still). The
+    # body responds to exertion over about a minute, not to each step.
+    exertion = _low_pass(speed / max(walking_speed, 1e-9), dt, tau=60)
+    workload = 0.3 + 0.5 * exertion + _ou_process(rng, n, dt, tau=180, sigma=0.2)
+    workload = np.clip(workload, 0, None)
+    shared = rng.standard_normal(n)
+    hr_noise = 0.7 * shared + np.sqrt(1 - 0.49) * rng.standard_normal(n)
+    co2_noise = 0.7 * shared + np.sqrt(1 - 0.49) * rng.standard_normal(n)
+    heart_rate = 65 + 30 * workload + _ou_process(rng, n, dt, tau=20, sigma=4, noise=hr_noise)
+    heart_rate += effects.get('heart_rate', 0)
+    records['heart_rate'] = np.clip(heart_rate, 45, 190)
+    records['bp_systolic'] = np.clip(
+        115 + 0.3 * (heart_rate - 72) + _ou_process(rng, n, dt, tau=60, sigma=3) + effects.get('bp_systolic', 0), 90, 190)
+    records['bp_diastolic'] = np.clip(
+        75 + 0.15 * (heart_rate - 72) + _ou_process(rng, n, dt, tau=60, sigma=2) + effects.get('bp_diastolic', 0), 55, 120)
+    records['o2_saturation'] = np.clip(98 + _ou_process(rng, n, dt, tau=90, sigma=0.6), 90, 100)
+    co2 = 0.5 + 0.4 * workload + _ou_process(rng, n, dt, tau=45, sigma=0.12, noise=co2_noise)
+    records['co2_level'] = np.clip(co2 + effects.get('co2_level', 0), 0, None)
+    records['temperature'] = 98.6 + 0.4 * workload + _ou_process(rng, n, dt, tau=300, sigma=0.2) + effects.get('temperature', 0)
+    records['humidity'] = np.clip(50 + 5 * workload + _ou_process(rng, n, dt, tau=240, sigma=3), 20, 90)
+    records['fan_speed'] = np.clip(2400 + 400 * workload + _ou_process(rng, n, dt, tau=30, sigma=50) + effects.get('fan_speed', 0), 0, 4000)
+    records['suit_pressure'] = 4.0 + _ou_process(rng, n, dt, tau=120, sigma=0.03) + effects.get('suit_pressure', 0)
+
+    # Consumables: depletion rate (percent per hour) scales with load and faults
+    battery_rate = 9 + 4 * workload + effects.get('battery_drain', 0) * 9
+    records['battery_level'] = np.clip(100 - np.cumsum(battery_rate) * dt / 3600, 0, 100)
+    o2_rate = 7 * (heart_rate / 72) + effects.get('o2_drain', 0) * 7
+    records['o2_storage'] = np.clip(100 - np.cumsum(o2_rate) * dt / 3600, 0, 100)
+    return records, faults
+
+class ScenarioSource(TelemetrySource):
+    """
+    Play a generated scenario into a TelemetryState.
+
+    Args:
+        state (TelemetryState): State to publish into
+        speed (float): Playback rate relative to real time (0 = unthrottled)
+        loop (bool): Restart from the beginning when the scenario ends
+        **scenario: Keyword arguments for generate_scenario
+    """
+
+    def __init__(self, state, speed=1.0, loop=True, **scenario):
+        super().__init__(state, speed=speed, loop=loop)
+        self.records, self.faults = generate_scenario(**scenario)
+        self._times = self.records['mission_time']
+        self._names = self.records.dtype.names
+
+    def __len__(self):
+        return len(self.records)
+
+    def mission_time_at(self, index):
+        return float(self._times[index])
+
+    def snapshot_at(self, index):
+        snapshot = row_to_snapshot(dict(zip(self._names, self.records[index].tolist())))
+        # Wall clock follows playback rather than the generated start time
+        last_updated = format_timestamp(time.time())
+        snapshot['vitals']['last_updated'] = last_updated
+        snapshot['location']['last_updated'] = last_updated
+        return snapshot
+
+    def index_at(self, mission_time):
+        return int(np.searchsorted(self._times, mission_time, side='left'))
+
+def save_scenario(records, path):
+    """Write generated records as a recording that TelemetryReplay can memory-map."""
+    with open(path, 'wb') as file:
+        write_header(file, records.dtype)
+        records.tofile(file)
+    index = np.zeros((len(records) + INDEX_STRIDE - 1) // INDEX_STRIDE, dtype=INDEX_DTYPE)
+    index['record'] = np.arange(len(index)) * INDEX_STRIDE
+    index['mission_time'] = records['mission_time'][index['record']]
+    index.tofile(f"{path}.idx")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic EVA telemetry recording")
+    parser.add_argument('output', help="Recording path")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--hours', type=float, default=1.0)
+    parser.add_argument('--rate', type=float, default=10.0)
+    parser.add_argument('--fault-rate', type=float, default=0.5)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    records, faults = generate_scenario(seed=args.seed, hours=args.hours, rate=args.rate, fault_rate=args.fault_rate)
+    save_scenario(records, args.output)
+    print(f"Generated {len(records)} samples in {time.perf_counter() - started:.2f}s -> {args.output}")
+    for fault in faults:
+        print(f"  {fault['type']} at {fault['start']:.0f}s for {fault['duration']:.0f}s")
@@ -0,0 +1,140 @@
+import threading
+import time
+
+from utils.metrics import Gauge
+
+DEPENDENCY_READY = Gauge('suits_dependency_ready', 'Whether each startup dependency is ready (1) or not (0)', ['dependency'])
+DEPENDENCY_WARMUP = Gauge('suits_dependency_warmup_seconds', 'Time each startup dependency took to warm up', ['dependency'])
+
+PENDING = 'pending'
+READY = 'ready'
+FAILED = 'failed'
+DISABLED = 'disabled'
+
+class _Check:
+    __slots__ = ('name', 'warm', 'required', 'status', 'detail', 'seconds', 'attempts')
+
+    def __init__(self, name, warm, required, enabled):
+        self.name = name
+        self.warm = warm
+        self.required = required
+        self.status = PENDING if enabled else DISABLED
+        self.detail = None
+        self.seconds = None
+        self.attempts = 0
+
+class Readiness:
+    """
+    Background warm-up of the app's dependencies, reported by /healthz and /readyz.
+
+    Each dependency has a warm-up function that is run on its own daemon
+    thread once start() is called, so slow or unreachable services (LLM
+    SDKs, the Discord webhook) never delay serving requests. The app is
+    ready when every required dependency has warmed up; optional ones are
+    reported but don't affect readiness. A failed warm-up is retried with
+    exponential backoff until it succeeds, so a dependency that was down at
+    startup becomes ready once it recovers.
+
+    Args:
+        retry_delay (float): Seconds before the first retry of a failed warm-up
+        max_retry_delay (float): Backoff cap in seconds
+    """
+
+    def __init__(self, retry_delay=1.0, max_retry_delay=60.0):
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.started_at = time.monotonic()
+        self._checks = {}
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def add(self, name, warm, required=True, enabled=True):
+        """
+        Register a dependency.
+
+        Args:
+            name (str): Dependency name as reported by /readyz
+            warm (callable): Does the warm-up; may return a detail string, raises on failure
+            required (bool): Whether the app is unready until this dependency is
+            enabled (bool): False if the dependency isn't configured (reported as disabled)
+        """
+        check = _Check(name, warm, required, enabled)
+        self._checks[name] = check
+        DEPENDENCY_READY.labels(name).set_function(lambda: 1 if check.status == READY else 0)
+        return self
+
+    def start(self):
+        """Start warming up every enabled dependency (idempotent)."""
+        with self._cond:
+            if self._threads:
+                return self
+            # Uptime counts from when the app starts serving, not from import
+            self.started_at = time.monotonic()
+            for check in self._checks.values():
+                if check.status != PENDING:
+                    continue
+                thread = threading.Thread(target=self._run, args=(check,), name=f"Warmup-{check.name}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def stop(self):
+        """Stop retrying failed warm-ups."""
+        self._stop.set()
+
+    def _run(self, check):
+        delay = self.retry_delay
+        while True:
+            started = time.perf_counter()
+            try:
+                detail = check.warm()
+                status = READY
+            except Exception as e:
+                detail, status = str(e), FAILED
+            with self._cond:
+                check.attempts += 1
+                check.seconds = time.perf_counter() - started
+                check.detail = detail
+                check.status = status
+                self._cond.notify_all()
+            DEPENDENCY_WARMUP.labels(check.name).set(check.seconds)
+            if status == READY or self._stop.wait(delay):
+                return
+            delay = min(self.max_retry_delay, delay * 2)
+
+    def wait(self, timeout=None):
+        """
+        Block until every warm-up has finished its first attempt (for scripts and benchmarks).
+
+        Returns:
+            bool: False if the timeout passed first
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: all(check.status != PENDING for check in self._checks.values()), timeout)
+
+    def ready(self):
+        return all(check.status == READY for check in self._checks.values() if check.required)
+
+    def snapshot(self):
+        """
+        Per-dependency readiness.
+
+        Returns:
+            dict: ready, uptime (seconds) and dependencies -> {status, required, detail, seconds, attempts}
+        """
+        return {
+            'ready': self.ready(),
+            'uptime': round(time.monotonic() - self.started_at, 3),
+            'dependencies': {
+                name: {
+                    'status': check.status,
+                    'required': check.required,
+                    'detail': check.detail,
+                    'seconds': round(check.seconds, 3) if check.seconds is not None else None,
+                    'attempts': check.attempts
+                }
+                for name, check in self._checks.items()
+            }
+        }
@@ -0,0 +1,292 @@
+import threading
+import time
+from datetime import datetime
+
+# Metres per degree of latitude (and of longitude at the equator), for
+# converting positions to local east/north metres
+METERS_PER_DEGREE = 111320.0
+
+# Numeric telemetry fields shared by the recorder, replay and synthetic sources.
+# Each entry is (column, group, key, dtype); blood pressure is stored as two
+# columns and re-joined into the "120/80" string the dashboards expect.
+TELEMETRY_FIELDS = [
+    ('mission_time', None, None, '<f8'),
+    ('wall_time', None, None, '<f8'),
+    ('heart_rate', 'vitals', 'heart_rate', '<f4'),
+    ('bp_systolic', 'vitals', None, '<f4'),
+    ('bp_diastolic', 'vitals', None, '<f4'),
+    ('o2_saturation', 'vitals', 'o2_saturation', '<f4'),
+    ('suit_pressure', 'vitals', 'suit_pressure', '<f4'),
+    ('battery_level', 'vitals', 'battery_level', '<f4'),
+    ('co2_level', 'vitals', 'co2_level', '<f4'),
+    ('temperature', 'vitals', 'temperature', '<f4'),
+    ('humidity', 'vitals', 'humidity', '<f4'),
+    ('fan_speed', 'vitals', 'fan_speed', '<f4'),
+    ('o2_storage', 'vitals', 'o2_storage', '<f4'),
+    ('latitude', 'location', 'latitude', '<f8'),
+    ('longitude', 'location', 'longitude', '<f8'),
+    ('heading', 'location', 'heading', '<f4'),
+    ('altitude', 'location', 'altitude', '<f4'),
+    ('speed', 'location', 'speed', '<f4'),
+]
+
+NAN = float('nan')
+
+# Fields the dashboards display as integers, and the precision of the rest
+INTEGER_FIELDS = {'heart_rate', 'o2_saturation', 'battery_level', 'humidity', 'fan_speed', 'heading'}
+FIELD_PRECISION = {'suit_pressure': 2, 'co2_level': 2, 'temperature': 1, 'o2_storage': 1, 'altitude': 2, 'speed': 2}
+
+def format_timestamp(wall_time):
+    """Format a unix timestamp the way the dashboards display `last_updated`."""
+    return datetime.fromtimestamp(wall_time).strftime("%Y-%m-%d %H:%M:%S")
+
+def snapshot_to_row(snapshot):
+    """
+    Flatten a telemetry snapshot into a tuple of column values.
+
+    Args:
+        snapshot (dict): Snapshot with 'mission_time', 'wall_time', 'vitals' and 'location'
+
+    Returns:
+        tuple: Values in TELEMETRY_FIELDS order (missing values become NaN)
+    """
+    vitals = snapshot.get('vitals') or {}
+    location = snapshot.get('location') or {}
+    systolic, diastolic = float('nan'), float('nan')
+    if vitals.get('blood_pressure'):
+        systolic, diastolic = (float(v) for v in str(vitals['blood_pressure']).split('/'))
+
+    row = []
+    for column, group, key, _ in TELEMETRY_FIELDS:
+        if group is None:
+            value = snapshot.get(column)
+        elif column == 'bp_systolic':
+            value = systolic
+        elif column == 'bp_diastolic':
+            value = diastolic
+        else:
+            value = (vitals if group == 'vitals' else location).get(key)
+        row.append(float('nan') if value is None else float(value))
+    return tuple(row)
+
+def row_to_snapshot(row):
+    """
+    Rebuild a telemetry snapshot from a record produced by snapshot_to_row.
+
+    Recordings carry their own schema, so columns added since a file was
+    written are simply missing from its rows and treated as never reported.
+
+    Args:
+        row (dict): Column name -> value
+
+    Returns:
+        dict: Snapshot with 'mission_time', 'vitals' and 'location'
+    """
+    vitals, location = {}, {}
+    for column, group, key, _ in TELEMETRY_FIELDS:
+        if key is None:
+            continue
+        value = float(row.get(column, NAN))
+        if value != value:  # NaN marks a field the source never reported
+            continue
+        if column in INTEGER_FIELDS:
+            value = int(round(value))
+        elif column in FIELD_PRECISION:
+            value = round(value, FIELD_PRECISION[column])
+        (vitals if group == 'vitals' else location)[key] = value
+
+    systolic, diastolic = float(row.get('bp_systolic', NAN)), float(row.get('bp_diastolic', NAN))
+    if systolic == systolic and diastolic == diastolic:
+        vitals['blood_pressure'] = f"{int(round(systolic))}/{int(round(diastolic))}"
+
+    last_updated = format_timestamp(float(row['wall_time']))
+    vitals['last_updated'] = last_updated
+    location['last_updated'] = last_updated
+    return {
+        'mission_time': float(row['mission_time']),
+        'vitals': vitals,
+        'location': location,
+    }
+
+class TelemetryState:
+    """
+    Latest telemetry snapshot shared by the API routes, recorders and sources.
+
+    Sources call publish() on every tick; subscribers (such as the recorder)
+    are notified synchronously with the merged snapshot.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._snapshot = {'mission_time': 0.0, 'wall_time': time.time(), 'vitals': None, 'location': None}
+        self._subscribers = []
+        self.source = None
+
+    def mission_time(self):
+        """Seconds elapsed since the state was created."""
+        return time.monotonic() - self._started
+
+    def has_source(self):
+        """Whether a telemetry source is currently feeding this state."""
+        return self.source is not None and self.source.is_running()
+
+    def subscribe(self, callback):
+        """Register callback(snapshot) to be called after every publish."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def publish(self, vitals=None, location=None, mission_time=None, wall_time=None):
+        """
+        Merge new readings into the shared snapshot and notify subscribers.
+
+        Args:
+            vitals (dict): Suit vitals, or None to keep the previous values
+            location (dict): EV location, or None to keep the previous values
+            mission_time (float): Mission elapsed seconds (defaults to live clock)
+            wall_time (float): Unix timestamp of the reading (defaults to now)
+
+        Returns:
+            dict: The merged snapshot
+        """
+        with self._lock:
+            snapshot = dict(self._snapshot)
+            snapshot['mission_time'] = self.mission_time() if mission_time is None else mission_time
+            snapshot['wall_time'] = time.time() if wall_time is None else wall_time
+            if vitals is not None:
+                snapshot['vitals'] = vitals
+            if location is not None:
+                snapshot['location'] = location
+            self._snapshot = snapshot
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            callback(snapshot)
+        return snapshot
+
+    def snapshot(self):
+        """Return the most recent merged snapshot."""
+        with self._lock:
+            return self._snapshot
+
+class TelemetrySource:
+    """
+    Base class for sources that play a timeline of telemetry into a TelemetryState.
+
+    Subclasses implement __len__, mission_time_at(index) and snapshot_at(index).
+    Playback runs on a daemon thread at `speed` times real time; a speed of 0
+    publishes as fast as possible.
+    """
+
+    def __init__(self, state, speed=1.0, loop=False):
+        self.state = state
+        self.speed = speed
+        self.loop = loop
+        self._cursor = 0
+        self._cursor_lock = threading.Lock()
+        self._reanchor = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def mission_time_at(self, index):
+        raise NotImplementedError
+
+    def snapshot_at(self, index):
+        raise NotImplementedError
+
+    def index_at(self, mission_time):
+        """Index of the first tick at or after mission_time (linear scan fallback)."""
+        for index in range(len(self)):
+            if self.mission_time_at(index) >= mission_time:
+                return index
+        return len(self)
+
+    def set_speed(self, speed):
+        """
+        Change the playback rate from the current position on.
+
+        Playback is re-anchored, so speeding up doesn't rush through the
+        ticks that were due at the old rate.
+
+        Raises:
+            ValueError: If speed is negative or not finite
+        """
+        if not 0 <= speed < float('inf'):
+            raise ValueError("speed must be a non-negative number")
+        self.speed = speed
+        self._reanchor.set()
+
+    def seek(self, mission_time):
+        """Move playback to the first tick at or after mission_time."""
+        with self._cursor_lock:
+            self._cursor = self.index_at(mission_time)
+        self._reanchor.set()
+
+    def position(self):
+        """Mission time of the next tick to be published."""
+        with self._cursor_lock:
+            cursor = self._cursor
+        if cursor >= len(self):
+            return None
+        return self.mission_time_at(cursor)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Attach to the shared state and start playback in the background."""
+        if self.is_running():
+            return self
+        self._stop.clear()
+        self.state.source = self
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop playback and detach from the shared state."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self.state.source is self:
+            self.state.source = None
+
+    def _run(self):
+        anchor_wall = anchor_mission = None
+        while not self._stop.is_set():
+            with self._cursor_lock:
+                if self._cursor >= len(self):
+                    if not self.loop or len(self) == 0:
+                        break
+                    self._cursor = 0
+                    anchor_wall = None
+                index = self._cursor
+                self._cursor += 1
+
+            mission_time = self.mission_time_at(index)
+            if self._reanchor.is_set() or anchor_wall is None:
+                self._reanchor.clear()
+                anchor_wall, anchor_mission = time.monotonic(), mission_time
+            elif self.speed:
+                delay = anchor_wall + (mission_time - anchor_mission) / self.speed - time.monotonic()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+                if self._reanchor.is_set():
+                    continue
+
+            snapshot = self.snapshot_at(index)
+            self.state.publish(
+                vitals=snapshot.get('vitals'),
+                location=snapshot.get('location'),
+                mission_time=mission_time,
+            )
+        if self.state.source is self:
+            self.state.source = None
@@ -0,0 +1,187 @@
+import json
+import os
+import struct
+import threading
+
+import numpy as np
+
+from utils.telemetry import TELEMETRY_FIELDS, TelemetrySource, row_to_snapshot, snapshot_to_row
+
+# File layout:
+#   header  - MAGIC, u4 version, u4 header length, JSON schema, zero padded
+#   records - fixed-width little-endian records, one per telemetry tick
+# The sidecar "<path>.idx" holds (mission_time f8, record number i8) pairs
+# written every INDEX_STRIDE records so replays can seek without a scan.
+MAGIC = b'SUITSTLM'
+FORMAT_VERSION = 1
+HEADER_ALIGN = 64
+INDEX_STRIDE = 256
+INDEX_DTYPE = np.dtype([('mission_time', '<f8'), ('record', '<i8')])
+STRUCT_CODES = {'<f4': 'f', '<f8': 'd'}
+
+def record_dtype(fields=TELEMETRY_FIELDS):
+    """Numpy structured dtype for one on-disk telemetry record."""
+    return np.dtype([(column, dtype) for column, _, _, dtype in fields])
+
+class TelemetryRecorder:
+    """
+    Append every telemetry tick to a fixed-width binary file.
+
+    Subscribe an instance to a TelemetryState (or call record() directly).
+    Records are packed with struct, so appending costs one write of
+    dtype.itemsize bytes and never re-reads the file.
+    """
+
+    def __init__(self, path, flush_every=INDEX_STRIDE):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.flush_every = flush_every
+        self.dtype = record_dtype()
+        self._struct = struct.Struct('<' + ''.join(STRUCT_CODES[dtype] for _, _, _, dtype in TELEMETRY_FIELDS))
+        self._lock = threading.Lock()
+        self._last_time = float('-inf')
+
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        if exists:
+            header_length, dtype = read_header(self._file)
+            if dtype != self.dtype:
+                self._file.close()
+                raise ValueError(f"Recording {path} was written with a different telemetry schema")
+            self._file.seek(0, os.SEEK_END)
+            data_bytes = self._file.tell() - header_length
+            self.count = data_bytes // self.dtype.itemsize
+            # Drop a torn trailing record left by a crash mid-write
+            self._file.truncate(header_length + self.count * self.dtype.itemsize)
+            if self.count:
+                self._file.seek(header_length + (self.count - 1) * self.dtype.itemsize)
+                self._last_time = struct.unpack('<d', self._file.read(8))[0]
+            self._file.seek(0, os.SEEK_END)
+        else:
+            write_header(self._file, self.dtype)
+            self.count = 0
+        self._index = open(self.index_path, 'ab')
+
+    def __call__(self, snapshot):
+        self.record(snapshot)
+
+    def record(self, snapshot):
+        """
+        Append one snapshot.
+
+        Args:
+            snapshot (dict): Snapshot as published by TelemetryState
+        """
+        row = snapshot_to_row(snapshot)
+        with self._lock:
+            if self._file.closed:
+                return
+            # Replay seeks on mission_time, so keep it monotonic on disk
+            mission_time = max(row[0], self._last_time)
+            self._last_time = mission_time
+            if mission_time != row[0]:
+                row = (mission_time,) + row[1:]
+            if self.count % INDEX_STRIDE == 0:
+                self._index.write(struct.pack('<dq', mission_time, self.count))
+            self._file.write(self._struct.pack(*row))
+            self.count += 1
+            if self.count % self.flush_every == 0:
+                self.flush()
+
+    def flush(self):
+        self._file.flush()
+        self._index.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self.flush()
+                self._file.close()
+                self._index.close()
+
+def write_header(file, dtype):
+    schema = json.dumps({'fields': [[name, dtype.fields[name][0].str] for name in dtype.names]}).encode('utf-8')
+    length = len(MAGIC) + 8 + len(schema)
+    length += -length % HEADER_ALIGN
+    file.write(MAGIC + struct.pack('<II', FORMAT_VERSION, length) + schema)
+    file.write(b'\0' * (length - len(MAGIC) - 8 - len(schema)))
+    file.flush()
+
+def read_header(file):
+    """
+    Read a recording header.
+
+    Returns:
+        tuple: (header length in bytes, numpy record dtype)
+    """
+    file.seek(0)
+    prefix = file.read(len(MAGIC) + 8)
+    if prefix[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"Not a telemetry recording: {getattr(file, 'name', file)}")
+    version, length = struct.unpack('<II', prefix[len(MAGIC):])
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported telemetry recording version {version}")
+    schema = json.loads(file.read(length - len(prefix)).rstrip(b'\0'))
+    return length, np.dtype([tuple(field) for field in schema['fields']])
+
+class TelemetryReplay(TelemetrySource):
+    """
+    Replay a recording into a TelemetryState.
+
+    The file is memory-mapped, so opening an hour-long recording costs the
+    same as opening an empty one; records are decoded only as they are played.
+    Each column is available without copying via `replay.records[column]`.
+
+    Args:
+        state (TelemetryState): State to publish into
+        path (str): Recording produced by TelemetryRecorder
+        speed (float): Playback rate relative to real time (0 = unthrottled)
+        loop (bool): Restart from the beginning when the recording ends
+    """
+
+    def __init__(self, state, path, speed=1.0, loop=False):
+        super().__init__(state, speed=speed, loop=loop)
+        self.path = path
+        with open(path, 'rb') as file:
+            header_length, dtype = read_header(file)
+            file.seek(0, os.SEEK_END)
+            count = (file.tell() - header_length) // dtype.itemsize
+        if count:
+            self.records = np.memmap(path, dtype=dtype, mode='r', offset=header_length, shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=dtype)
+        self._times = self.records['mission_time']
+
+        index_path = f"{path}.idx"
+        if os.path.exists(index_path) and os.path.getsize(index_path) >= INDEX_DTYPE.itemsize:
+            self.index = np.fromfile(index_path, dtype=INDEX_DTYPE)
+            self.index = self.index[self.index['record'] < count]
+        else:
+            self.index = np.empty(0, dtype=INDEX_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def mission_time_at(self, index):
+        return float(self._times[index])
+
+    def snapshot_at(self, index):
+        # tolist() converts the whole record at once, far cheaper than per-field numpy scalars
+        return row_to_snapshot(dict(zip(self.records.dtype.names, self.records[index].tolist())))
+
+    def index_at(self, mission_time):
+        """Binary search the sparse index, then the memory-mapped block it points to."""
+        lo, hi = 0, len(self.records)
+        if len(self.index):
+            block = np.searchsorted(self.index['mission_time'], mission_time, side='left') - 1
+            if block >= 0:
+                lo = int(self.index['record'][block])
+            if block + 1 < len(self.index):
+                hi = int(self.index['record'][block + 1])
+        return lo + int(np.searchsorted(self._times[lo:hi], mission_time, side='left'))
+
+    def duration(self):
+        """Mission seconds covered by the recording."""
+        if not len(self.records):
+            return 0.0
+        return float(self._times[-1] - self._times[0])
@@ -0,0 +1,309 @@
+import heapq
+import json
+import threading
+
+def format_duration(seconds):
+    """Format seconds as HH:MM:SS."""
+    seconds = max(0, int(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def format_clock(seconds):
+    """Format a mission elapsed time as HH:MM, the way timeline events are displayed."""
+    seconds = max(0, int(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+class Task:
+    __slots__ = ('id', 'name', 'duration', 'depends', 'successors', 'order',
+                 'actual_start', 'actual_finish', 'start', 'finish', 'driver')
+
+    def __init__(self, task_id, name, duration, depends, order):
+        self.id = task_id
+        self.name = name
+        self.duration = duration
+        self.depends = list(depends)
+        self.successors = []
+        self.order = order
+        self.actual_start = None
+        self.actual_finish = None
+        self.start = None
+        self.finish = None
+        self.driver = None  # predecessor whose finish sets this task's start
+
+    @property
+    def status(self):
+        if self.actual_finish is not None:
+            return 'Completed'
+        if self.actual_start is not None:
+            return 'In Progress'
+        return None
+
+class MissionScheduler:
+    """
+    EVA plan kept as a dependency graph of tasks with duration estimates.
+
+    Projected start/finish times are maintained incrementally: a change
+    (a task starting or completing, a new duration estimate, the mission
+    clock passing an overdue task) re-evaluates that task and walks its
+    successors in topological order, stopping wherever the times do not
+    move. The critical path is the chain of driving predecessors back from
+    the latest-finishing task. The serialised plan is rebuilt only after a
+    change, so polling it costs O(1).
+
+    Times are mission elapsed seconds. Tasks must be added after the tasks
+    they depend on, which keeps insertion order topological (and acyclic).
+    The clock that overdue tasks slip against moves in steps of
+    `slip_step` seconds, so an overrunning task changes the plan (and its
+    version) once per step rather than on every tick.
+
+    Args:
+        tasks (list): Task dicts with 'id', 'name', 'duration' (seconds) and optional 'depends'
+        slip_step (int): Granularity in seconds of clock-driven slip
+    """
+
+    def __init__(self, tasks=(), slip_step=60):
+        self._tasks = {}
+        self._active = set()  # not completed, and running or with every dependency completed
+        self._lock = threading.Lock()
+        self.limits = {}  # consumable -> mission time it runs out
+        self.slip_step = slip_step
+        self.now = 0  # the slip clock: mission time rounded up to a whole step
+        self.version = 0
+        self.updates = 0  # task re-evaluations, for profiling the incremental passes
+        for task in tasks:
+            self.add_task(task['id'], task['name'], task['duration'], task.get('depends', ()))
+
+    def add_task(self, task_id, name, duration, depends=()):
+        with self._lock:
+            if task_id in self._tasks:
+                raise ValueError(f"Duplicate task {task_id}")
+            for dependency in depends:
+                if dependency not in self._tasks:
+                    raise ValueError(f"Task {task_id} depends on unknown task {dependency}")
+            task = Task(task_id, name, float(duration), depends, len(self._tasks))
+            self._tasks[task_id] = task
+            for dependency in depends:
+                self._tasks[dependency].successors.append(task_id)
+            self._refresh_active(task)
+            self._propagate([task_id])
+            self._rebuild()
+
+    def _refresh_active(self, task):
+        if task.actual_finish is None and (
+            task.actual_start is not None
+            or all(self._tasks[d].actual_finish is not None for d in task.depends)
+        ):
+            self._active.add(task.id)
+        else:
+            self._active.discard(task.id)
+
+    def _propagate(self, changed):
+        """Recompute projected times from the changed tasks downstream; caller holds the lock."""
+        heap = [(self._tasks[task_id].order, task_id) for task_id in changed]
+        heapq.heapify(heap)
+        seen = set()
+        moved = False
+        while heap:
+            _, task_id = heapq.heappop(heap)
+            if task_id in seen:
+                continue
+            seen.add(task_id)
+            task = self._tasks[task_id]
+            self.updates += 1
+
+            start, driver = 0.0, None
+            for dependency in task.depends:
+                finish = self._tasks[dependency].finish
+                if finish > start:
+                    start, driver = finish, dependency
+            if task.actual_start is not None:
+                start, driver = task.actual_start, None
+            if task.actual_finish is not None:
+                finish = task.actual_finish
+            elif task.actual_start is not None:
+                # Running long: it finishes no earlier than now
+                finish = max(task.actual_start + task.duration, self.now)
+            else:
+                start = max(start, self.now)
+                finish = start + task.duration
+
+            if (start, finish, driver) != (task.start, task.finish, task.driver):
+                task.start, task.finish, task.driver = start, finish, driver
+                moved = True
+                for successor in task.successors:
+                    heapq.heappush(heap, (self._tasks[successor].order, successor))
+        return moved
+
+    def start_task(self, task_id, at):
+        """Record that a task actually started at mission time `at`."""
+        with self._lock:
+            task = self._tasks[task_id]
+            task.actual_start = float(at)
+            self._refresh_active(task)
+            self._propagate([task_id])
+            self._rebuild()
+
+    def complete_task(self, task_id, at):
+        """Record that a task actually finished at mission time `at`."""
+        with self._lock:
+            task = self._tasks[task_id]
+            task.actual_finish = float(at)
+            if task.actual_start is None:
+                task.actual_start = min(task.start, task.actual_finish)
+            self._refresh_active(task)
+            for successor in task.successors:
+                self._refresh_active(self._tasks[successor])
+            self._propagate([task_id])
+            self._rebuild()
+
+    def update_duration(self, task_id, duration):
+        """Replace a task's duration estimate (seconds)."""
+        with self._lock:
+            self._tasks[task_id].duration = float(duration)
+            if self._propagate([task_id]):
+                self._rebuild()
+
+    def set_limit(self, consumable, exhausted_at):
+        """
+        Record when a consumable is projected to run out.
+
+        Quantised to whole minutes so that small fluctuations in the estimate
+        don't invalidate the cached plan.
+        """
+        exhausted_at = round(exhausted_at / 60) * 60
+        with self._lock:
+            if self.limits.get(consumable) != exhausted_at:
+                self.limits[consumable] = exhausted_at
+                self._rebuild()
+
+    def advance(self, now):
+        """
+        Move the mission clock forward.
+
+        Only tasks that are running or ready to start can fall behind the
+        clock; those that have are slipped and their successors re-evaluated.
+        The clock is rounded up to the next whole `slip_step`, so projections
+        never fall behind the actual time and change at most once per step.
+        """
+        step = self.slip_step
+        now = -(-int(now) // step) * step
+        with self._lock:
+            if now <= self.now:
+                return
+            self.now = now
+            overdue = []
+            for task_id in self._active:
+                task = self._tasks[task_id]
+                if (task.finish if task.actual_start is not None else task.start) < now:
+                    overdue.append(task_id)
+            if overdue and self._propagate(overdue):
+                self._rebuild()
+
+    def _rebuild(self):
+        """Serialise the plan once per change; caller holds the lock."""
+        tasks = list(self._tasks.values())
+        end_task = max(tasks, key=lambda task: task.finish, default=None)
+        projected_end = end_task.finish if end_task else 0.0
+        critical = []
+        task = end_task
+        while task is not None:
+            critical.append(task.id)
+            task = self._tasks[task.driver] if task.driver else None
+        critical.reverse()
+        critical_set = set(critical)
+
+        events = []
+        for task in tasks:
+            status = task.status or ('Upcoming' if task.id in self._active else 'Scheduled')
+            events.append({
+                'id': task.id,
+                'event': task.name,
+                'time': format_clock(task.start),
+                'start': round(task.start),
+                'finish': round(task.finish),
+                'duration': round(task.duration),
+                'status': status,
+                'critical': task.id in critical_set
+            })
+        self.version += 1
+        plan = {
+            'version': self.version,
+            'events': events,
+            'critical_path': critical,
+            'projected_end': round(projected_end),
+            'consumables': {
+                name: {'exhausted_at': round(limit), 'margin': round(limit - projected_end)}
+                for name, limit in self.limits.items()
+            }
+        }
+        # Readers take both without the lock, so swap them in as one tuple
+        self._cached = (plan, json.dumps(plan)[1:].encode('utf-8'))
+
+    def plan(self, now):
+        """
+        The cached plan with the mission clock fields for `now`.
+
+        Returns:
+            dict: mission_time, remaining_time, events, critical_path, projected_end, consumables, version
+        """
+        plan = self._cached[0]
+        return {
+            'mission_time': format_duration(now),
+            'remaining_time': format_duration(plan['projected_end'] - now),
+            **plan
+        }
+
+    def plan_json(self, now):
+        """plan(now) as JSON bytes, splicing the clock fields onto the cached serialisation."""
+        plan, fragment = self._cached
+        clock = (f'{{"mission_time": "{format_duration(now)}", '
+                 f'"remaining_time": "{format_duration(plan["projected_end"] - now)}", ')
+        return clock.encode('utf-8') + fragment
+
+class ConsumableMonitor:
+    """
+    Projects when each suit consumable runs out and feeds the limit to a scheduler.
+
+    Subscribe an instance to a TelemetryState. The depletion rate is an
+    exponentially weighted average of the level change between readings
+    at least `min_interval` seconds apart.
+
+    Args:
+        scheduler (MissionScheduler): Receives set_limit() updates
+        fields (dict): Vitals field -> consumable name
+        reserve (float): Level (same units as the field) treated as empty
+        min_interval (float): Minimum seconds between rate samples
+        smoothing (float): EWMA weight of the newest rate sample
+    """
+
+    def __init__(self, scheduler, fields=None, reserve=10.0, min_interval=10.0, smoothing=0.2):
+        self.scheduler = scheduler
+        self.fields = fields or {'o2_storage': 'O2', 'battery_level': 'Battery'}
+        self.reserve = reserve
+        self.min_interval = min_interval
+        self.smoothing = smoothing
+        self._last = {}
+        self._rates = {}
+
+    def __call__(self, snapshot):
+        vitals = snapshot.get('vitals')
+        if not vitals:
+            return
+        now = snapshot.get('mission_time') or 0.0
+        for field, name in self.fields.items():
+            level = vitals.get(field)
+            if level is None:
+                continue
+            last = self._last.get(field)
+            if last is None or now < last[0]:
+                self._last[field] = (now, level)
+                continue
+            elapsed = now - last[0]
+            if elapsed < self.min_interval:
+                continue
+            rate = (last[1] - level) / elapsed
+            previous = self._rates.get(field)
+            rate = rate if previous is None else previous + self.smoothing * (rate - previous)
+            self._rates[field] = rate
+            self._last[field] = (now, level)
+            if rate > 0:
+                self.scheduler.set_limit(name, now + max(0.0, level - self.reserve) / rate)